@@ -1,4 +1,4 @@
-from .imageformat import OpenCVImageFormat
+from .imageformat import OpenCVImageFormat, EncodedImageFormat, PackedMaskFormat
 
 from . import (
     colornodes,
@@ -7,6 +7,7 @@ from . import (
     drawing,
     segmentation,
     misc_nodes,
+    image_io,
 )
 import funcnodes as fn
 import funcnodes_numpy as fnnp  # noqa: F401 # for type hinting
@@ -14,6 +15,8 @@ import funcnodes_numpy as fnnp  # noqa: F401 # for type hinting
 
 __all__ = [
     "OpenCVImageFormat",
+    "EncodedImageFormat",
+    "PackedMaskFormat",
     "NODE_SHELF",
     "image_operations",
     "image_processing",
@@ -21,6 +24,7 @@ __all__ = [
     "drawing",
     "segmentation",
     "misc_nodes",
+    "image_io",
 ]
 
 
@@ -37,6 +41,7 @@ NODE_SHELF = fn.Shelf(
         drawing.NODE_SHELF,
         segmentation.NODE_SHELF,
         misc_nodes.NODE_SHELF,
+        image_io.NODE_SHELF,
     ],
     nodes=[],
 )
@@ -0,0 +1,424 @@
+import asyncio
+import glob
+import os
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+import cv2
+import numpy as np
+import funcnodes as fn
+from funcnodes_core.node import TriggerStack
+from .imageformat import (
+    OpenCVImageFormat,
+    EncodedImageFormat,
+    ImageFormat,
+    cv2_encode,
+)
+from .utils import assert_opencvimg
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class DecodeReductions(fn.DataEnum):
+    """
+    Decode-time size reduction.
+    JPEG images are decoded directly at the reduced size (DCT scaling), other formats are
+    downscaled by the decoder right after decoding.
+
+    Attributes:
+        NONE: full resolution
+        HALF: 1/2 of the width and height
+        QUARTER: 1/4 of the width and height
+        EIGHTH: 1/8 of the width and height
+    """
+
+    NONE = 1
+    HALF = 2
+    QUARTER = 4
+    EIGHTH = 8
+
+
+def imread_flags(reduction: int = 1, grayscale: bool = False) -> int:
+    """Returns the cv2.IMREAD_* flags for the given reduction factor and color mode.
+    Full resolution images keep their bit depth, reduced images are always decoded as 8 bit.
+    """
+    reduction = int(reduction)
+    if reduction == 1:
+        if grayscale:
+            return cv2.IMREAD_GRAYSCALE | cv2.IMREAD_ANYDEPTH
+        return cv2.IMREAD_UNCHANGED
+    mode = "GRAYSCALE" if grayscale else "COLOR"
+    try:
+        return getattr(cv2, f"IMREAD_REDUCED_{mode}_{reduction}")
+    except AttributeError:
+        raise ValueError(f"Unsupported reduction factor {reduction}")
+
+
+def crop_to_roi(
+    data: np.ndarray,
+    roi: Optional[Tuple[int, int, int, int]],
+    scale: int = 1,
+) -> np.ndarray:
+    """Crops the data to roi=(x, y, w, h), given in full resolution pixel coordinates.
+    The result is a compact copy, so the full decoded buffer can be released.
+    """
+    if roi is None:
+        return data
+    x, y, w, h = (int(v) // scale for v in roi)
+    if w <= 0 or h <= 0:
+        raise ValueError(f"Invalid roi {roi}")
+    return np.ascontiguousarray(data[y : y + h, x : x + w])
+
+
+def decode_image(
+    buf: np.ndarray,
+    reduction: int = 1,
+    grayscale: bool = False,
+    roi: Optional[Tuple[int, int, int, int]] = None,
+) -> np.ndarray:
+    """Decodes an encoded image buffer (cv2.imdecode releases the GIL)."""
+    data = cv2.imdecode(buf, imread_flags(reduction, grayscale))
+    if data is None:
+        raise ValueError("Could not decode image")
+    return crop_to_roi(data, roi, int(reduction))
+
+
+def read_image_file(
+    path: str,
+    reduction: int = 1,
+    grayscale: bool = False,
+    roi: Optional[Tuple[int, int, int, int]] = None,
+) -> OpenCVImageFormat:
+    # reading the raw bytes and decoding them keeps all the work inside the GIL-free
+    # sections of numpy/cv2, which is what makes the thread pool in load_images scale
+    try:
+        data = decode_image(
+            np.fromfile(path, dtype=np.uint8), reduction, grayscale, roi
+        )
+    except ValueError as exc:
+        raise ValueError(f"Could not read image '{path}': {exc}") from exc
+    return OpenCVImageFormat(data)
+
+
+def read_image_page(
+    path: str,
+    page: int,
+    reduction: int = 1,
+    grayscale: bool = False,
+    roi: Optional[Tuple[int, int, int, int]] = None,
+) -> OpenCVImageFormat:
+    """Reads a single page of a multi-page image (e.g. a TIFF stack)."""
+    ok, mats = cv2.imreadmulti(path, page, 1, flags=imread_flags(1, grayscale))
+    if not ok or len(mats) == 0:
+        raise ValueError(f"Could not read page {page} of '{path}'")
+    data = crop_to_roi(mats[0], roi)
+    reduction = int(reduction)
+    if reduction > 1:
+        # imreadmulti ignores the IMREAD_REDUCED_* flags (apart from the
+        # conversion to 8 bit), so the pages are reduced after decoding
+        data = cv2.resize(
+            data,
+            (max(1, data.shape[1] // reduction), max(1, data.shape[0] // reduction)),
+            interpolation=cv2.INTER_AREA,
+        )
+    return OpenCVImageFormat(data)
+
+
+def ordered_futures(
+    executor: Executor,
+    items: Iterable[T],
+    func: Callable[[T], R],
+    prefetch: int = 4,
+) -> Iterator[Tuple[T, "Future[R]"]]:
+    """Submits func(item) for each item and yields (item, future) in input order,
+    keeping at most `prefetch` further items in flight.
+    """
+    prefetch = max(0, int(prefetch))
+    pending: deque = deque()
+    for item in items:
+        pending.append((item, executor.submit(func, item)))
+        if len(pending) > prefetch:
+            yield pending.popleft()
+    while pending:
+        yield pending.popleft()
+
+
+class Prefetcher:
+    """Maps func over items on a thread pool, returning the results in order.
+
+    At most `prefetch` results are computed ahead of the consumer, so the memory
+    footprint stays bounded independently of the number of items.
+    Supports both plain and async iteration.
+    """
+
+    def __init__(
+        self,
+        items: Iterable[T],
+        func: Callable[[T], R],
+        prefetch: int = 4,
+        max_workers: Optional[int] = None,
+    ):
+        self.items = items
+        self.func = func
+        self.prefetch = prefetch
+        self.max_workers = max_workers or None
+
+    def __iter__(self) -> Iterator[Tuple[T, R]]:
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            for item, fut in ordered_futures(
+                executor, self.items, self.func, self.prefetch
+            ):
+                yield item, fut.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __aiter__(self) -> AsyncIterator[Tuple[T, R]]:
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            for item, fut in ordered_futures(
+                executor, self.items, self.func, self.prefetch
+            ):
+                yield item, await asyncio.wrap_future(fut)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def emit(node: Optional[fn.Node], **values: Any):
+    """Sets the given outputs of a running node and triggers the first one,
+    so connected nodes are executed once per emitted value.
+    """
+    if node is None:
+        return
+    names = list(values)
+    for name in names:
+        node.outputs[name].set_value(values[name], does_trigger=False)
+    await node.outputs[names[0]].trigger(TriggerStack())
+
+
+@fn.NodeDecorator(
+    node_id="cv2.load_images",
+    name="Load Images",
+    outputs=[
+        {"name": "out", "description": "The images, emitted one after another."},
+        {"name": "path", "description": "The path of the emitted image."},
+        {"name": "paths", "description": "All loaded paths, set when done."},
+    ],
+    default_io_options={
+        "prefetch": {"value_options": {"min": 0}},
+        "max_workers": {"value_options": {"min": 1}},
+    },
+    default_render_options={"data": {"src": "out"}},
+    description="Loads all images matching a glob pattern, decoding them in parallel and emitting them in order.",
+)
+async def load_images(
+    pattern: str,
+    recursive: bool = False,
+    prefetch: int = 4,
+    max_workers: Optional[int] = None,
+    reduction: DecodeReductions = DecodeReductions.NONE,
+    grayscale: bool = False,
+    roi: Optional[Tuple[int, int, int, int]] = None,
+    node: fn.Node = None,
+) -> Tuple[OpenCVImageFormat, str, List[str]]:
+    """
+    Loads all images matching a glob pattern.
+    The files are decoded on a thread pool while the images are emitted in sorted path
+    order, each emission triggering the connected nodes.
+
+    Args:
+        pattern: str: The glob pattern, e.g. "data/**/*.png".
+        recursive: bool: Whether "**" matches any files and zero or more directories.
+        prefetch: int: The number of images decoded ahead of the one being processed.
+        max_workers: int: The number of decoding threads, defaults to the number of CPUs.
+        reduction: DecodeReductions: Decode-time downscaling factor.
+        grayscale: bool: Decode the images as grayscale.
+        roi: Tuple[int, int, int, int]: Optional (x, y, w, h) region, in full resolution
+            pixels, each image is cropped to directly after decoding.
+    Returns:
+        out: OpenCVImageFormat: The images, one per emission.
+        path: str: The path of the emitted image.
+        paths: List[str]: All loaded paths.
+    """
+    reduction = DecodeReductions.v(reduction)
+    paths = sorted(
+        p for p in glob.glob(pattern, recursive=recursive) if os.path.isfile(p)
+    )
+
+    def _load(path: str) -> OpenCVImageFormat:
+        return read_image_file(path, reduction, grayscale, roi)
+
+    img = fn.NoValue
+    path = fn.NoValue
+    async for _path, _img in Prefetcher(paths, _load, prefetch, max_workers):
+        # the last image is not emitted here but returned, so the regular
+        # output handling triggers the connected nodes exactly once for it
+        if img is not fn.NoValue:
+            await emit(node, out=img, path=path)
+        path, img = _path, _img
+    return img, path, paths
+
+
+@fn.NodeDecorator(
+    node_id="cv2.read_pages",
+    name="Read Pages",
+    outputs=[
+        {"name": "out", "description": "The pages, emitted one after another."},
+        {"name": "page", "description": "The index of the emitted page."},
+        {"name": "count", "description": "The total number of pages in the file."},
+    ],
+    default_io_options={
+        "prefetch": {"value_options": {"min": 0}},
+        "max_workers": {"value_options": {"min": 1}},
+    },
+    default_render_options={"data": {"src": "out"}},
+    description="Streams the pages of a multi-page image (e.g. a TIFF stack) one by one.",
+)
+async def read_pages(
+    path: str,
+    start: int = 0,
+    stop: Optional[int] = None,
+    step: int = 1,
+    prefetch: int = 2,
+    max_workers: Optional[int] = None,
+    reduction: DecodeReductions = DecodeReductions.NONE,
+    grayscale: bool = False,
+    roi: Optional[Tuple[int, int, int, int]] = None,
+    node: fn.Node = None,
+) -> Tuple[OpenCVImageFormat, int, int]:
+    """
+    Streams the pages of a multi-page image file.
+    Only the pages in flight are held in memory, so arbitrarily large stacks can be
+    processed page by page. Each emission triggers the connected nodes.
+
+    Args:
+        path: str: The file to read.
+        start: int: The first page, negative values count from the end.
+        stop: int: The page to stop before, defaults to the end of the file.
+        step: int: The page step.
+        prefetch: int: The number of pages decoded ahead of the one being processed.
+        max_workers: int: The number of decoding threads, defaults to the number of CPUs.
+        reduction: DecodeReductions: Downscaling factor applied to each page.
+        grayscale: bool: Read the pages as grayscale.
+        roi: Tuple[int, int, int, int]: Optional (x, y, w, h) region, in full resolution
+            pixels, each page is cropped to.
+    Returns:
+        out: OpenCVImageFormat: The pages, one per emission.
+        page: int: The index of the emitted page.
+        count: int: The total number of pages in the file.
+    """
+    reduction = DecodeReductions.v(reduction)
+    count = cv2.imcount(path)
+    if count <= 0:
+        raise ValueError(f"Could not read pages of '{path}'")
+    pages = range(count)[slice(start, stop, step)]
+
+    def _read(page: int) -> OpenCVImageFormat:
+        return read_image_page(path, page, reduction, grayscale, roi)
+
+    img = fn.NoValue
+    page = fn.NoValue
+    async for _page, _img in Prefetcher(pages, _read, prefetch, max_workers):
+        # see load_images, the last page is emitted by returning it
+        if img is not fn.NoValue:
+            await emit(node, out=img, page=page)
+        page, img = _page, _img
+    return img, page, count
+
+
+class EncodeFormats(fn.DataEnum):
+    """
+    Formats images can be encoded to.
+
+    Attributes:
+        PNG: lossless, 16 bit
+        JPEG: lossy, 8 bit
+        WEBP: lossy, 8 bit
+        TIFF: lossless, 16 bit
+    """
+
+    PNG = ".png"
+    JPEG = ".jpg"
+    WEBP = ".webp"
+    TIFF = ".tiff"
+
+
+# EncodeFormats value -> ImageHeader.format
+_HEADER_FORMATS = {".png": "png", ".jpg": "jpeg"}
+
+
+@fn.NodeDecorator(
+    node_id="cv2.encoded_image",
+    name="Encoded Image",
+    default_render_options={"data": {"src": "out"}},
+    description="Wraps encoded image bytes (e.g. JPEG or PNG) without decoding them.",
+)
+def encoded_image(data: bytes) -> EncodedImageFormat:
+    return EncodedImageFormat(data)
+
+
+@fn.NodeDecorator(
+    node_id="cv2.imencode",
+    default_io_options={
+        "quality": {"value_options": {"min": 0.0, "max": 1.0}},
+    },
+    default_render_options={"data": {"src": "out"}},
+    description="Encodes an image, e.g. to JPEG or PNG.",
+)
+def imencode(
+    img: ImageFormat,
+    format: EncodeFormats = EncodeFormats.PNG,
+    quality: float = 0.95,
+) -> EncodedImageFormat:
+    ext = EncodeFormats.v(format)
+    header_format = _HEADER_FORMATS.get(ext)
+    if (
+        isinstance(img, EncodedImageFormat)
+        and header_format is not None
+        and img.format == header_format
+    ):
+        # already encoded in the requested format, keep the original bytes
+        return img
+
+    params = []
+    if ext == ".jpg":
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), int(quality * 100)]
+    elif ext == ".webp":
+        params = [int(cv2.IMWRITE_WEBP_QUALITY), max(1, int(quality * 100))]
+    return EncodedImageFormat(cv2_encode(assert_opencvimg(img), ext, params))
+
+
+@fn.NodeDecorator(
+    node_id="cv2.image_info",
+    outputs=[
+        {"name": "width"},
+        {"name": "height"},
+        {"name": "channels"},
+        {"name": "depth", "description": "Bits per sample."},
+    ],
+    description="Returns the size of an image. Encoded images are not decoded for this.",
+)
+def image_info(img: ImageFormat) -> Tuple[int, int, int, int]:
+    if isinstance(img, EncodedImageFormat):
+        return img.width(), img.height(), img.channels(), img.depth()
+    data = assert_opencvimg(img)._data
+    return data.shape[1], data.shape[0], data.shape[2], data.dtype.itemsize * 8
+
+
+NODE_SHELF = fn.Shelf(
+    name="Image I/O",
+    nodes=[load_images, read_pages, encoded_image, imencode, image_info],
+    subshelves=[],
+    description="Nodes for loading and encoding images.",
+)
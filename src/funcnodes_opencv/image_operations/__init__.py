@@ -2,6 +2,7 @@ import funcnodes as fn
 from .arithmetic_operations import NODE_SHELF as ARITHMETIC_OPERATIONS_NODE_SHELF
 from .matrix_operations import NODE_SHELF as MATRIX_OPERATIONS_NODE_SHELF
 from .bitwise_operations import NODE_SHELF as BITWISE_OPERATIONS_NODE_SHELF
+from .packed_masks import NODE_SHELF as PACKED_MASKS_NODE_SHELF
 from .normalization_equalization import (
     NODE_SHELF as NORMALIZATION_EQUALIZATION_NODE_SHELF,
 )
@@ -13,6 +14,7 @@ NODE_SHELF = fn.Shelf(
     subshelves=[
         ARITHMETIC_OPERATIONS_NODE_SHELF,
         BITWISE_OPERATIONS_NODE_SHELF,
+        PACKED_MASKS_NODE_SHELF,
         MATRIX_OPERATIONS_NODE_SHELF,
         NORMALIZATION_EQUALIZATION_NODE_SHELF,
     ],
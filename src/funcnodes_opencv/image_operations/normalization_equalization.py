@@ -1,10 +1,10 @@
-from typing import Tuple
+from typing import Literal, Optional, Tuple
 import cv2
 import numpy as np
 import funcnodes as fn
 
-from ..imageformat import OpenCVImageFormat, ImageFormat
-from ..utils import assert_opencvdata
+from ..imageformat import OpenCVImageFormat, ImageFormat, _assert_image_channels
+from ..utils import assert_opencvdata, assert_opencvimg
 
 
 @fn.NodeDecorator(
@@ -30,6 +30,112 @@ def normalize(
     return OpenCVImageFormat(result), result
 
 
+def calc_histogram(
+    data: np.ndarray, bins: int = 256, mask: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Histogram of float data (h, w, c) in [0, 1] with `bins` bins per channel, as
+    float64 counts of shape (bins, c). Bin i is centered at i / (bins - 1), so 256
+    bins count the values of 8 bit data exactly. The float data is binned directly
+    by cv2.calcHist, without quantizing it first.
+    """
+    if bins < 2:
+        raise ValueError(f"A histogram needs at least 2 bins, got {bins}")
+    if data.ndim == 2:
+        data = data[..., None]
+    half = 0.5 / (bins - 1)
+    return np.concatenate(
+        [
+            cv2.calcHist([data], [i], mask, [bins], [-half, 1 + half])
+            for i in range(data.shape[2])
+        ],
+        axis=1,
+    ).astype(np.float64)
+
+
+def image_histogram(
+    img: ImageFormat, bins: int = 256, channel: Literal[1, 3, None] = None
+) -> np.ndarray:
+    """
+    The histogram (see calc_histogram) of an image, cached on the image. With
+    channel=1 it is the histogram of the grayscale image.
+    """
+    return assert_opencvimg(img).derived(
+        ("histogram", int(bins), channel),
+        lambda data: calc_histogram(_assert_image_channels(data, channel), int(bins)),
+    )
+
+
+@fn.NodeDecorator(
+    node_id="cv2.calcHist",
+    outputs=[{"name": "hist", "description": "The counts of shape (bins, c)."}],
+    default_io_options={
+        "bins": {"value_options": {"min": 2, "max": 65536}},
+        "decay": {"value_options": {"min": 0.0, "max": 1.0}},
+    },
+    description="Calculates the histogram of each channel of an image.",
+)
+def calcHist(
+    img: ImageFormat,
+    bins: int = 256,
+    mask: Optional[ImageFormat] = None,
+    accumulate: Optional[np.ndarray] = None,
+    decay: float = 1.0,
+) -> np.ndarray:
+    """
+    Calculates the histogram of each channel, bin i is centered at i / (bins - 1).
+    Unmasked histograms are cached on the image, so nodes that take a histogram
+    (e.g. equalizeHist) can reuse it instead of scanning the image again. For
+    running histograms over video frames, pass the previous result as accumulate.
+
+    Args:
+        img: ImageFormat: The image.
+        bins: int: The number of bins per channel.
+        mask: ImageFormat: Only counts pixels where the mask is non-zero.
+        accumulate: np.ndarray: A histogram to add the counts to.
+        decay: float: The factor applied to accumulate first, e.g. 0.9 to let old
+            frames fade out.
+    Returns:
+        np.ndarray: The counts of shape (bins, c).
+    """
+    if mask is None:
+        hist = image_histogram(img, bins)
+    else:
+        mask = (assert_opencvdata(mask, channel=1) > 0).astype(np.uint8)
+        hist = calc_histogram(assert_opencvdata(img), bins, mask)
+    if accumulate is not None:
+        accumulate = np.asarray(accumulate, dtype=np.float64)
+        if accumulate.shape != hist.shape:
+            raise ValueError(
+                f"Cannot accumulate a histogram of shape {accumulate.shape} "
+                f"into one of shape {hist.shape}"
+            )
+        hist = accumulate * decay + hist
+    return hist
+
+
+def equalization_lut(hist: np.ndarray) -> np.ndarray:
+    """
+    The lookup table of the histogram equalization of a single channel histogram,
+    mapping bin i to [0, 1] like cv2.equalizeHist does for 256 bins.
+    """
+    hist = np.asarray(hist, dtype=np.float64).reshape(len(hist), -1)
+    if hist.shape[1] != 1:
+        raise ValueError("The equalization needs a single channel histogram")
+    hist = hist[:, 0]
+    bins = len(hist)
+    first = int(np.argmax(hist > 0))
+    total = hist.sum()
+    lut = np.zeros(bins, dtype=np.float32)
+    if hist[first] == total:
+        lut[:] = first / (bins - 1)
+        return lut
+    scale = (bins - 1) / (total - hist[first])
+    cum = np.cumsum(hist[first + 1 :])
+    lut[first + 1 :] = np.minimum(np.round(cum * scale), bins - 1) / (bins - 1)
+    return lut
+
+
 @fn.NodeDecorator(
     node_id="cv2.equalizeHist",
     outputs=[{"name": "out", "type": OpenCVImageFormat}],
@@ -38,10 +144,29 @@ def normalize(
 )
 def equalizeHist(
     img: ImageFormat,
+    hist: Optional[np.ndarray] = None,
 ) -> OpenCVImageFormat:
-    data = (assert_opencvdata(img, channel=1) * 255).astype(np.uint8)
-    result = cv2.equalizeHist(data)
-    return OpenCVImageFormat(result)
+    """
+    Equalizes the histogram of the grayscale image.
+
+    Args:
+        img: ImageFormat: The image.
+        hist: np.ndarray: A precomputed single channel histogram (e.g. from calcHist
+            of the grayscale image or accumulated over frames) to equalize with,
+            defaults to the histogram of the image.
+    Returns:
+        OpenCVImageFormat: The equalized image.
+    """
+    data = assert_opencvdata(img, channel=1)
+    if hist is None:
+        data = (data * 255).astype(np.uint8)
+        return OpenCVImageFormat(cv2.equalizeHist(data))
+
+    lut = equalization_lut(hist)
+    bins = len(lut)
+    if bins == 256:
+        return OpenCVImageFormat(cv2.LUT((data * 255 + 0.5).astype(np.uint8), lut))
+    return OpenCVImageFormat(lut[(data * (bins - 1) + 0.5).astype(np.int32)])
 
 
 @fn.NodeDecorator(
@@ -64,6 +189,6 @@ def CLAHE(
 NODE_SHELF = fn.Shelf(
     name="Normalization & Equalization",
     description="OpenCV image normalization and equalization nodes.",
-    nodes=[normalize, equalizeHist, CLAHE],
+    nodes=[normalize, calcHist, equalizeHist, CLAHE],
     subshelves=[],
 )
@@ -0,0 +1,293 @@
+from typing import Optional, Tuple, Union
+import cv2
+import numpy as np
+import funcnodes as fn
+from ..imageformat import ImageFormat, PackedMaskFormat
+from ..utils import assert_opencvdata
+from ..image_processing.kernels import resolve_kernel
+from ..image_processing.morphological_operations import (
+    MorphologicalOperations,
+    rect_offsets,
+)
+
+
+def assert_packedmask(img, thresh: float = 0) -> PackedMaskFormat:
+    """
+    Returns the image as PackedMaskFormat, other images are converted to grayscale
+    and pixels above thresh are set.
+    """
+    if isinstance(img, PackedMaskFormat):
+        return img
+    return PackedMaskFormat.pack(assert_opencvdata(img, channel=1)[..., 0] > thresh)
+
+
+def _valid_bits(width: int, words: int) -> np.ndarray:
+    # the words with all bits inside the width set
+    valid = np.full(words, np.iinfo(np.uint64).max, dtype=np.uint64)
+    if width % 64:
+        valid[-1] = np.uint64((1 << (width % 64)) - 1)
+    return valid
+
+
+def _similar_masks(
+    mask1: PackedMaskFormat, mask2: PackedMaskFormat
+) -> Tuple[np.ndarray, np.ndarray]:
+    if (mask1.width(), mask1.height()) != (mask2.width(), mask2.height()):
+        raise ValueError(
+            f"The masks have different sizes {mask1.width()}x{mask1.height()} "
+            f"and {mask2.width()}x{mask2.height()}"
+        )
+    return mask1._data, mask2._data
+
+
+def _shift(words: np.ndarray, offset: int) -> np.ndarray:
+    # bit x of the result is bit x + offset of the words, zero outside
+    out = np.zeros_like(words)
+    n = words.shape[1]
+    q, r = divmod(abs(offset), 64)
+    if q >= n:
+        return out
+    if offset >= 0:
+        out[:, : n - q] = words[:, q:] >> np.uint64(r)
+        if r:
+            out[:, : n - q - 1] |= words[:, q + 1 :] << np.uint64(64 - r)
+    else:
+        out[:, q:] = words[:, : n - q] << np.uint64(r)
+        if r:
+            out[:, q + 1 :] |= words[:, : n - q - 1] >> np.uint64(64 - r)
+    return out
+
+
+def _or_window(words: np.ndarray, lo: int, hi: int, axis: int) -> np.ndarray:
+    # OR over the window [x + lo, x + hi] along axis, with zeros outside, from
+    # log2(hi - lo + 1) shifted copies
+    k = hi - lo + 1
+    if axis == 1:
+        # room for the window on both sides, so the final shift loses no bits
+        margin = -(-max(abs(lo), abs(hi)) // 64)
+        acc = np.pad(words, ((0, 0), (margin, margin)))
+        length = 1
+        while length < k:
+            step = min(length, k - length)
+            acc |= _shift(acc, step)
+            length += step
+        return _shift(acc, lo)[:, margin : margin + words.shape[1]]
+
+    margin = max(abs(lo), abs(hi))
+    acc = np.pad(words, ((margin, margin), (0, 0)))
+    length = 1
+    while length < k:
+        step = min(length, k - length)
+        acc[:-step] |= acc[step:]
+        length += step
+    start = margin + lo
+    return acc[start : start + words.shape[0]]
+
+
+def packed_dilate(
+    mask: PackedMaskFormat, offsets: Tuple[int, int, int, int]
+) -> PackedMaskFormat:
+    """
+    Dilates the mask with the rectangle window (x0, x1, y0, y1) (see rect_offsets)
+    word-wise, in O(log(window size)) word operations per 64 pixels.
+    """
+    x0, x1, y0, y1 = offsets
+    words = mask._data
+    if (x0, x1) != (0, 0):
+        words = _or_window(words, x0, x1, axis=1)
+        words &= _valid_bits(mask.width(), words.shape[1])
+    if (y0, y1) != (0, 0):
+        words = _or_window(words, y0, y1, axis=0)
+    return PackedMaskFormat(words, mask.width())
+
+
+def packed_not(mask: PackedMaskFormat) -> PackedMaskFormat:
+    """The inverted mask."""
+    words = ~mask._data & _valid_bits(mask.width(), mask._data.shape[1])
+    return PackedMaskFormat(words, mask.width())
+
+
+def packed_erode(
+    mask: PackedMaskFormat, offsets: Tuple[int, int, int, int]
+) -> PackedMaskFormat:
+    """
+    Erodes the mask with the rectangle window (x0, x1, y0, y1) word-wise, pixels
+    outside of the image count as set like the cv2 default border.
+    """
+    return packed_not(packed_dilate(packed_not(mask), offsets))
+
+
+def packed_morphology(
+    mask: PackedMaskFormat,
+    op: int,
+    kernel: Optional[np.ndarray] = None,
+    iterations: int = 1,
+) -> PackedMaskFormat:
+    """
+    cv2.morphologyEx (op is a cv2.MORPH_* flag) of a packed mask, word-wise for
+    rectangle and line structuring elements, other kernels run with cv2 on the
+    unpacked mask.
+    """
+    offsets = None if op == cv2.MORPH_HITMISS else rect_offsets(kernel, iterations)
+    if offsets is None:
+        data = mask.unpack().astype(np.uint8)
+        res = cv2.morphologyEx(data, op=op, kernel=kernel, iterations=iterations)
+        return PackedMaskFormat.pack(res)
+
+    def _dilate(m):
+        return packed_dilate(m, offsets)
+
+    def _erode(m):
+        return packed_erode(m, offsets)
+
+    def _and_not(m1, m2):
+        return PackedMaskFormat(m1._data & ~m2._data, m1.width())
+
+    if op == cv2.MORPH_DILATE:
+        return _dilate(mask)
+    if op == cv2.MORPH_ERODE:
+        return _erode(mask)
+    if op == cv2.MORPH_OPEN:
+        return _dilate(_erode(mask))
+    if op == cv2.MORPH_CLOSE:
+        return _erode(_dilate(mask))
+    if op == cv2.MORPH_GRADIENT:
+        return _and_not(_dilate(mask), _erode(mask))
+    if op == cv2.MORPH_TOPHAT:
+        return _and_not(mask, _dilate(_erode(mask)))
+    if op == cv2.MORPH_BLACKHAT:
+        return _and_not(_erode(_dilate(mask)), mask)
+    raise ValueError(f"Unknown morphological operation {op}")
+
+
+@fn.NodeDecorator(
+    node_id="cv2.pack_mask",
+    name="Pack Mask",
+    outputs=[{"name": "out", "type": PackedMaskFormat}],
+    default_io_options={"thresh": {"value_options": {"min": 0.0, "max": 1.0}}},
+    default_render_options={"data": {"src": "out"}},
+    description="Converts an image to a bit-packed binary mask.",
+)
+def pack_mask(img: ImageFormat, thresh: float = 0) -> PackedMaskFormat:
+    """
+    Converts the image to a binary mask with one bit per pixel, which the mask
+    nodes process word-wise. Any node taking images also accepts packed masks.
+
+    Args:
+        img: ImageFormat: The image, converted to grayscale.
+        thresh: float: Pixels above thresh are set.
+    Returns:
+        PackedMaskFormat: The packed mask.
+    """
+    return assert_packedmask(img, thresh)
+
+
+@fn.NodeDecorator(
+    node_id="cv2.mask_and",
+    name="Mask AND",
+    outputs=[{"name": "out", "type": PackedMaskFormat}],
+    default_render_options={"data": {"src": "out"}},
+    description="AND of two binary masks.",
+)
+def mask_and(mask1: ImageFormat, mask2: ImageFormat) -> PackedMaskFormat:
+    mask1 = assert_packedmask(mask1)
+    words1, words2 = _similar_masks(mask1, assert_packedmask(mask2))
+    return PackedMaskFormat(words1 & words2, mask1.width())
+
+
+@fn.NodeDecorator(
+    node_id="cv2.mask_or",
+    name="Mask OR",
+    outputs=[{"name": "out", "type": PackedMaskFormat}],
+    default_render_options={"data": {"src": "out"}},
+    description="OR of two binary masks.",
+)
+def mask_or(mask1: ImageFormat, mask2: ImageFormat) -> PackedMaskFormat:
+    mask1 = assert_packedmask(mask1)
+    words1, words2 = _similar_masks(mask1, assert_packedmask(mask2))
+    return PackedMaskFormat(words1 | words2, mask1.width())
+
+
+@fn.NodeDecorator(
+    node_id="cv2.mask_xor",
+    name="Mask XOR",
+    outputs=[{"name": "out", "type": PackedMaskFormat}],
+    default_render_options={"data": {"src": "out"}},
+    description="XOR of two binary masks.",
+)
+def mask_xor(mask1: ImageFormat, mask2: ImageFormat) -> PackedMaskFormat:
+    mask1 = assert_packedmask(mask1)
+    words1, words2 = _similar_masks(mask1, assert_packedmask(mask2))
+    return PackedMaskFormat(words1 ^ words2, mask1.width())
+
+
+@fn.NodeDecorator(
+    node_id="cv2.mask_not",
+    name="Mask NOT",
+    outputs=[{"name": "out", "type": PackedMaskFormat}],
+    default_render_options={"data": {"src": "out"}},
+    description="Inverts a binary mask.",
+)
+def mask_not(mask: ImageFormat) -> PackedMaskFormat:
+    return packed_not(assert_packedmask(mask))
+
+
+@fn.NodeDecorator(
+    node_id="cv2.mask_count",
+    name="Mask Count",
+    outputs=[{"name": "count"}],
+    description="Counts the set pixels of a binary mask.",
+)
+def mask_count(mask: ImageFormat) -> int:
+    return assert_packedmask(mask).count()
+
+
+@fn.NodeDecorator(
+    node_id="cv2.mask_morphology",
+    name="Mask Morphology",
+    outputs=[{"name": "out", "type": PackedMaskFormat}],
+    default_render_options={"data": {"src": "out"}},
+    description="Morphological operations on a binary mask.",
+)
+def mask_morphology(
+    mask: ImageFormat,
+    op: MorphologicalOperations = MorphologicalOperations.DILATE,
+    kernel: Optional[Union[int, str, np.ndarray]] = None,
+    iterations: int = 1,
+) -> PackedMaskFormat:
+    """
+    Applies a morphological operation to the packed mask. Rectangle and line
+    structuring elements run word-wise on the packed bits, with a cost growing
+    with the logarithm of the kernel size, other kernels run with cv2.
+
+    Args:
+        mask: ImageFormat: The mask, other images are packed (non-zero is set).
+        op: MorphologicalOperations: The operation.
+        kernel: Union[int, str, np.ndarray]: The structuring element (see
+            resolve_kernel), defaults to 3x3.
+        iterations: int: The number of times the operation is applied.
+    Returns:
+        PackedMaskFormat: The result.
+    """
+    return packed_morphology(
+        assert_packedmask(mask),
+        MorphologicalOperations.v(op),
+        resolve_kernel(kernel),
+        iterations,
+    )
+
+
+NODE_SHELF = fn.Shelf(
+    name="Packed Masks",
+    description="Binary masks with one bit per pixel.",
+    subshelves=[],
+    nodes=[
+        pack_mask,
+        mask_and,
+        mask_or,
+        mask_xor,
+        mask_not,
+        mask_count,
+        mask_morphology,
+    ],
+)
@@ -3,7 +3,12 @@ from .filtering_smoothing import NODE_SHELF as FILTERING_SMOOTHING_SHELF
 from .geometric_transformations import NODE_SHELF as GEOMETRIC_TRANSFORMATIONS_SHELF
 from .thresholding import NODE_SHELF as THRESHOLDING_SHELF
 from .morphological_operations import NODE_SHELF as MORPHOLOGICAL_OPERATIONS_SHELF
+from .reconstruction import NODE_SHELF as RECONSTRUCTION_SHELF
 from .edge_gradient import NODE_SHELF as EDGE_GRADIENT_SHELF
+from .kernels import NODE_SHELF as KERNELS_SHELF
+from .local_statistics import NODE_SHELF as LOCAL_STATISTICS_SHELF
+from .filter_bank import NODE_SHELF as FILTER_BANK_SHELF
+from .camera import NODE_SHELF as CAMERA_SHELF
 from .detection_feature_extraction import (
     NODE_SHELF as DETECTION_FEATURE_EXTRACTION_SHELF,
 )
@@ -15,8 +20,13 @@ NODE_SHELF = fn.Shelf(
         GEOMETRIC_TRANSFORMATIONS_SHELF,
         THRESHOLDING_SHELF,
         MORPHOLOGICAL_OPERATIONS_SHELF,
+        RECONSTRUCTION_SHELF,
         EDGE_GRADIENT_SHELF,
         DETECTION_FEATURE_EXTRACTION_SHELF,
+        KERNELS_SHELF,
+        LOCAL_STATISTICS_SHELF,
+        FILTER_BANK_SHELF,
+        CAMERA_SHELF,
     ],
     name="Image Processing",
     description="Image processing operations.",
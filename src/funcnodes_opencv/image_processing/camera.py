@@ -0,0 +1,197 @@
+from typing import Optional, Tuple
+import cv2
+import numpy as np
+import funcnodes as fn
+from ..imageformat import OpenCVImageFormat, ImageFormat
+from ..utils import assert_opencvdata, LRUCache, array_key
+from .geometric_transformations import Interpolations, remap_tiled
+
+
+_RECTIFY_MAPS = LRUCache(maxsize=8)
+
+
+def _as_key(*arrays: Optional[np.ndarray]) -> Tuple:
+    return tuple(
+        None if a is None else array_key(np.asarray(a, dtype=np.float64))
+        for a in arrays
+    )
+
+
+def undistort_rectify_maps(
+    cameraMatrix: np.ndarray,
+    distCoeffs: Optional[np.ndarray],
+    size: Tuple[int, int],
+    R: Optional[np.ndarray] = None,
+    newCameraMatrix: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the fixed-point (CV_16SC2) undistortion and rectification maps of
+    cv2.initUndistortRectifyMap for an image size (w, h), cached by camera matrix,
+    distortion coefficients, rectification, new camera matrix and size.
+    """
+    if newCameraMatrix is None:
+        newCameraMatrix = cameraMatrix
+    key = (
+        _as_key(cameraMatrix, distCoeffs, R, newCameraMatrix),
+        tuple(int(s) for s in size),
+    )
+    return _RECTIFY_MAPS.get(
+        key,
+        lambda: cv2.initUndistortRectifyMap(
+            np.asarray(cameraMatrix, dtype=np.float64),
+            None if distCoeffs is None else np.asarray(distCoeffs, dtype=np.float64),
+            None if R is None else np.asarray(R, dtype=np.float64),
+            np.asarray(newCameraMatrix, dtype=np.float64),
+            tuple(int(s) for s in size),
+            cv2.CV_16SC2,
+        ),
+    )
+
+
+@fn.NodeDecorator(
+    node_id="cv2.undistort",
+    name="Undistort",
+    outputs=[
+        {"name": "out"},
+        {"name": "newCameraMatrix", "description": "The camera matrix of the output."},
+    ],
+    default_io_options={
+        "max_workers": {"value_options": {"min": 1}},
+    },
+    default_render_options={"data": {"src": "out"}},
+    description="Corrects the lens distortion of an image with cached remap maps.",
+)
+def undistort(
+    img: ImageFormat,
+    cameraMatrix: np.ndarray,
+    distCoeffs: np.ndarray,
+    alpha: Optional[float] = None,
+    interpolation: Interpolations = Interpolations.LINEAR,
+    max_workers: Optional[int] = None,
+) -> Tuple[OpenCVImageFormat, np.ndarray]:
+    """
+    Corrects the lens distortion like cv2.undistort, but the maps are built once per
+    camera model and image size and reused for every following frame.
+
+    Args:
+        img: ImageFormat: The image.
+        cameraMatrix: np.ndarray: The 3x3 camera matrix.
+        distCoeffs: np.ndarray: The distortion coefficients.
+        alpha: float: If set, the free scaling parameter of
+            cv2.getOptimalNewCameraMatrix (0 keeps only valid pixels, 1 keeps all
+            source pixels), otherwise the camera matrix is kept.
+        interpolation: Interpolations: The interpolation method.
+        max_workers: int: The number of threads of the remap.
+    Returns:
+        OpenCVImageFormat: The undistorted image.
+        np.ndarray: The camera matrix of the undistorted image.
+    """
+    data = assert_opencvdata(img)
+    size = (data.shape[1], data.shape[0])
+    cameraMatrix = np.asarray(cameraMatrix, dtype=np.float64)
+    newCameraMatrix = cameraMatrix
+    if alpha is not None:
+        newCameraMatrix, _ = cv2.getOptimalNewCameraMatrix(
+            cameraMatrix, np.asarray(distCoeffs, dtype=np.float64), size, alpha
+        )
+    map1, map2 = undistort_rectify_maps(
+        cameraMatrix, distCoeffs, size, newCameraMatrix=newCameraMatrix
+    )
+    return (
+        OpenCVImageFormat(
+            remap_tiled(
+                data,
+                map1,
+                map2,
+                Interpolations.v(interpolation),
+                max_workers=max_workers,
+            )
+        ),
+        newCameraMatrix.copy(),
+    )
+
+
+@fn.NodeDecorator(
+    node_id="cv2.stereo_rectify",
+    name="Stereo Rectify",
+    outputs=[
+        {"name": "out1", "description": "The rectified first image."},
+        {"name": "out2", "description": "The rectified second image."},
+        {"name": "Q", "description": "The disparity-to-depth mapping matrix."},
+    ],
+    default_io_options={
+        "max_workers": {"value_options": {"min": 1}},
+    },
+    default_render_options={"data": {"src": "out1"}},
+    description="Undistorts and rectifies a stereo image pair with cached remap maps.",
+)
+def stereo_rectify(
+    img1: ImageFormat,
+    img2: ImageFormat,
+    cameraMatrix1: np.ndarray,
+    distCoeffs1: np.ndarray,
+    cameraMatrix2: np.ndarray,
+    distCoeffs2: np.ndarray,
+    R: np.ndarray,
+    T: np.ndarray,
+    alpha: float = -1,
+    interpolation: Interpolations = Interpolations.LINEAR,
+    max_workers: Optional[int] = None,
+) -> Tuple[OpenCVImageFormat, OpenCVImageFormat, np.ndarray]:
+    """
+    Rectifies a stereo pair with cv2.stereoRectify, so that epipolar lines become
+    horizontal. The rectification maps of both cameras are built once per stereo
+    model and image size and reused for every following pair.
+
+    Args:
+        img1: ImageFormat: The image of the first camera.
+        img2: ImageFormat: The image of the second camera.
+        cameraMatrix1: np.ndarray: The camera matrix of the first camera.
+        distCoeffs1: np.ndarray: The distortion coefficients of the first camera.
+        cameraMatrix2: np.ndarray: The camera matrix of the second camera.
+        distCoeffs2: np.ndarray: The distortion coefficients of the second camera.
+        R: np.ndarray: The rotation from the first to the second camera.
+        T: np.ndarray: The translation from the first to the second camera.
+        alpha: float: The free scaling parameter, -1 for the default scaling.
+        interpolation: Interpolations: The interpolation method.
+        max_workers: int: The number of threads of the remap.
+    Returns:
+        OpenCVImageFormat: The rectified first image.
+        OpenCVImageFormat: The rectified second image.
+        np.ndarray: The disparity-to-depth mapping matrix.
+    """
+    data1 = assert_opencvdata(img1)
+    data2 = assert_opencvdata(img2)
+    if data1.shape[:2] != data2.shape[:2]:
+        raise ValueError("The stereo images must have the same size")
+    size = (data1.shape[1], data1.shape[0])
+    params = [
+        np.asarray(p, dtype=np.float64)
+        for p in (cameraMatrix1, distCoeffs1, cameraMatrix2, distCoeffs2, R, T)
+    ]
+    key = ("stereo", _as_key(*params), size, float(alpha))
+    R1, R2, P1, P2, Q = _RECTIFY_MAPS.get(
+        key, lambda: cv2.stereoRectify(*params[:4], size, *params[4:], alpha=alpha)[:5]
+    )
+    interpolation = Interpolations.v(interpolation)
+    results = []
+    for data, K, D, Rn, P in (
+        (data1, params[0], params[1], R1, P1),
+        (data2, params[2], params[3], R2, P2),
+    ):
+        map1, map2 = undistort_rectify_maps(K, D, size, R=Rn, newCameraMatrix=P)
+        results.append(
+            OpenCVImageFormat(
+                remap_tiled(data, map1, map2, interpolation, max_workers=max_workers)
+            )
+        )
+    # the cached matrix is read-only
+    return results[0], results[1], Q.copy()
+
+
+NODE_SHELF = fn.Shelf(
+    nodes=[undistort, stereo_rectify],
+    subshelves=[],
+    name="Camera Models",
+    description="Lens undistortion and stereo rectification.",
+)
@@ -0,0 +1,184 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+import cv2
+import numpy as np
+import funcnodes as fn
+from ..imageformat import ImageFormat
+from ..utils import assert_opencvdata
+
+
+class FilterBankTypes(fn.DataEnum):
+    """
+    Filters of the filter bank, all applied to the Gaussian smoothed image.
+
+    Attributes:
+        IDENTITY: the image itself
+        GAUSSIAN: Gaussian smoothing with sigma
+        DX: first derivative in x direction (central differences)
+        DY: first derivative in y direction (central differences)
+        DXX: second derivative in x direction
+        DYY: second derivative in y direction
+        DXY: mixed second derivative
+        GRADIENT: gradient magnitude
+        LOG: Laplacian of Gaussian
+        DOG: difference of Gaussians, G(sigma2) - G(sigma)
+    """
+
+    IDENTITY = "identity"
+    GAUSSIAN = "gaussian"
+    DX = "dx"
+    DY = "dy"
+    DXX = "dxx"
+    DYY = "dyy"
+    DXY = "dxy"
+    GRADIENT = "gradient"
+    LOG = "log"
+    DOG = "dog"
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    """A filter of the filter bank, parsed from "<type>[:<sigma>[:<sigma2>]]"."""
+
+    type: str
+    sigma: float = 0
+    sigma2: Optional[float] = None
+
+    @classmethod
+    def parse(cls, spec: str) -> "FilterSpec":
+        parts = [p.strip() for p in spec.strip().lower().split(":")]
+        try:
+            ftype = FilterBankTypes.v(parts[0])
+            sigmas = [float(p) for p in parts[1:]]
+        except (KeyError, ValueError):
+            raise ValueError(
+                f"Invalid filter spec '{spec}', expected '<type>[:<sigma>[:<sigma2>]]'"
+            )
+        if ftype == FilterBankTypes.IDENTITY.value:
+            if sigmas:
+                raise ValueError(f"'{spec}' does not take a sigma")
+            return cls(ftype)
+        if ftype == FilterBankTypes.DOG.value:
+            if len(sigmas) != 2 or not 0 < sigmas[0] < sigmas[1]:
+                raise ValueError(f"'{spec}' needs two increasing positive sigmas")
+            return cls(ftype, sigmas[0], sigmas[1])
+        if len(sigmas) != 1 or sigmas[0] <= 0:
+            raise ValueError(f"'{spec}' needs a single positive sigma")
+        return cls(ftype, sigmas[0])
+
+    @property
+    def max_sigma(self) -> float:
+        return self.sigma if self.sigma2 is None else self.sigma2
+
+    @property
+    def name(self) -> str:
+        if self.type == FilterBankTypes.IDENTITY.value:
+            return self.type
+        sigmas = [self.sigma] if self.sigma2 is None else [self.sigma, self.sigma2]
+        return ":".join([self.type] + [f"{s:g}" for s in sigmas])
+
+
+def parse_filter_specs(filters: Union[str, List[str]]) -> List[FilterSpec]:
+    """Parses a list of filter specs or a single comma separated string of them."""
+    if isinstance(filters, str):
+        filters = filters.split(",")
+    return [FilterSpec.parse(f) for f in filters if f.strip()]
+
+
+def _apply(spec: FilterSpec, gaussians: Dict[float, np.ndarray]) -> np.ndarray:
+    g = gaussians[spec.sigma]
+    ftype = spec.type
+    if ftype in (FilterBankTypes.IDENTITY.value, FilterBankTypes.GAUSSIAN.value):
+        return g
+    if ftype == FilterBankTypes.DOG.value:
+        return gaussians[spec.sigma2] - g
+    if ftype == FilterBankTypes.LOG.value:
+        return cv2.Laplacian(g, cv2.CV_32F, ksize=1)
+    if ftype == FilterBankTypes.DXY.value:
+        dx = cv2.Sobel(g, cv2.CV_32F, 1, 0, ksize=1, scale=0.5)
+        return cv2.Sobel(dx, cv2.CV_32F, 0, 1, ksize=1, scale=0.5)
+    if ftype == FilterBankTypes.GRADIENT.value:
+        dx = cv2.Sobel(g, cv2.CV_32F, 1, 0, ksize=1, scale=0.5)
+        dy = cv2.Sobel(g, cv2.CV_32F, 0, 1, ksize=1, scale=0.5)
+        return cv2.magnitude(dx, dy)
+    dx, dy = {
+        FilterBankTypes.DX.value: (1, 0),
+        FilterBankTypes.DY.value: (0, 1),
+        FilterBankTypes.DXX.value: (2, 0),
+        FilterBankTypes.DYY.value: (0, 2),
+    }[ftype]
+    return cv2.Sobel(g, cv2.CV_32F, dx, dy, ksize=1, scale=0.5 if dx + dy == 1 else 1)
+
+
+def apply_filter_bank(
+    data: np.ndarray, specs: List[FilterSpec], max_workers: Optional[int] = None
+) -> List[np.ndarray]:
+    """
+    Applies the filters to a float image. The Gaussians are computed once per sigma,
+    each from the next smaller one, and the filters of a scale run on a thread pool
+    as soon as its Gaussians are available.
+    """
+    gaussians: Dict[float, np.ndarray] = {0: data}
+    futures: Dict[FilterSpec, Future] = {}
+    by_scale: Dict[float, List[FilterSpec]] = {}
+    for spec in specs:
+        by_scale.setdefault(spec.max_sigma, []).append(spec)
+    sigmas = sorted({s for spec in specs for s in (spec.sigma, spec.max_sigma)})
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        prev = 0
+        for sigma in sigmas:
+            if sigma > 0:
+                gaussians[sigma] = cv2.GaussianBlur(
+                    gaussians[prev], (0, 0), np.sqrt(sigma**2 - prev**2)
+                ).reshape(data.shape)
+                prev = sigma
+            for spec in by_scale.get(sigma, []):
+                if spec not in futures:
+                    futures[spec] = executor.submit(_apply, spec, gaussians)
+        results = {spec: fut.result() for spec, fut in futures.items()}
+    return [results[spec].reshape(data.shape) for spec in specs]
+
+
+@fn.NodeDecorator(
+    node_id="cv2.filter_bank",
+    name="Filter Bank",
+    outputs=[{"name": "features"}, {"name": "names"}],
+    default_io_options={
+        "max_workers": {"value_options": {"min": 1}},
+    },
+    description="Applies a bank of Gaussian derivative filters and stacks the results.",
+)
+def filter_bank(
+    img: ImageFormat,
+    filters: Union[str, List[str]] = "gaussian:1,gaussian:2,gradient:1,log:2,dog:1:2",
+    max_workers: Optional[int] = None,
+) -> Tuple[np.ndarray, List[str]]:
+    """
+    Applies many filters to the same image with a single input conversion, e.g. to
+    compute pixel features. Filters are given as "<type>[:<sigma>[:<sigma2>]]"
+    (see FilterBankTypes), e.g. "gaussian:4", "dxx:2" or "dog:1:2".
+
+    Args:
+        img: ImageFormat: The image.
+        filters: Union[str, List[str]]: The filter specs, as list or comma separated.
+        max_workers: int: The number of threads, defaults to the number of CPUs.
+    Returns:
+        np.ndarray: The stacked features of shape (h, w, n_filters * channels).
+        List[str]: The names of the filters.
+    """
+    specs = parse_filter_specs(filters)
+    if len(specs) == 0:
+        raise ValueError("No filters given")
+    data = assert_opencvdata(img)
+    features = apply_filter_bank(data, specs, max_workers)
+    return np.concatenate(features, axis=2), [spec.name for spec in specs]
+
+
+NODE_SHELF = fn.Shelf(
+    nodes=[filter_bank],
+    subshelves=[],
+    name="Filter Bank",
+    description="Banks of filters applied to the same image.",
+)
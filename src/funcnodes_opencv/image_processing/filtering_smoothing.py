@@ -1,9 +1,13 @@
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import os
+from typing import List, Optional, Tuple, Union
 import cv2
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import funcnodes as fn
 from ..imageformat import OpenCVImageFormat, ImageFormat
-from ..utils import assert_opencvdata
+from ..utils import assert_opencvdata, LRUCache, RoiWindow, array_key
+from .kernels import resolve_kernel
 
 
 class BorderTypes(fn.DataEnum):
@@ -38,16 +42,130 @@ def blur(
     kw: int = 5,
     kh: int = 0,
     borderType: BorderTypes = BorderTypes.DEFAULT,
+    roi: Optional[Tuple[int, int, int, int]] = None,
 ) -> OpenCVImageFormat:
     if kh <= 0:
         kh = kw
 
     ksize = (kw, kh)
+    window = RoiWindow(img, roi, max(kw, kh) // 2)
     return OpenCVImageFormat(
-        cv2.blur(assert_opencvdata(img), ksize, borderType=BorderTypes.v(borderType))
+        window.crop(cv2.blur(window.data, ksize, borderType=BorderTypes.v(borderType)))
     )
 
 
+class GaussianModes(fn.DataEnum):
+    """
+    Execution modes of the Gaussian blur.
+
+    Attributes:
+        EXACT: cv2.GaussianBlur with the given kernel size, cost grows with the kernel size
+        PYRAMID: blurs at a coarse pyramid level and upsamples again, the cost is
+            independent of sigma; the maximal deviation from the (untruncated) exact
+            blur stays below 1e-3 for images in [0, 1]
+        BOX: cascade of four box filters with matched variance, the cost is
+            independent of sigma; the maximal deviation is about 2e-2 for images in [0, 1]
+        AUTO: EXACT for small sigmas, PYRAMID for sigmas of 8 pixels and more
+    """
+
+    EXACT = "exact"
+    PYRAMID = "pyramid"
+    BOX = "box"
+    AUTO = "auto"
+
+
+_GAUSSIAN_AUTO_MIN_SIGMA = 8
+# smallest sigma (in pixels of the coarse level) the pyramid blur is done with,
+# below that the level is undersampled
+_GAUSSIAN_PYRAMID_MIN_SIGMA = 2.0
+_GAUSSIAN_BOX_PASSES = 4
+
+
+def gaussian_sigma(ksize: int, sigma: float) -> float:
+    """
+    Returns sigma, or the sigma OpenCV derives from the kernel size if sigma <= 0.
+    """
+    if sigma > 0:
+        return float(sigma)
+    return 0.3 * ((ksize - 1) * 0.5 - 1) + 0.8
+
+
+def box_widths(sigma: float, passes: int = _GAUSSIAN_BOX_PASSES) -> List[int]:
+    """
+    Returns the odd widths of a cascade of box filters whose total variance
+    matches a Gaussian with the given sigma.
+    """
+    wl = int(np.sqrt(12 * sigma**2 / passes + 1))
+    if wl % 2 == 0:
+        wl -= 1
+    wl = max(wl, 1)
+    m = round(
+        (12 * sigma**2 - passes * wl**2 - 4 * passes * wl - 3 * passes) / (-4 * wl - 4)
+    )
+    m = min(max(m, 0), passes)
+    return [wl] * m + [wl + 2] * (passes - m)
+
+
+def _pad_for_blur(
+    data: np.ndarray, sigmaX: float, sigmaY: float, borderType: int, multiple: int = 1
+) -> Tuple[np.ndarray, Tuple[slice, slice]]:
+    # pads by 3 sigma with the requested border (rounded up to a multiple of the
+    # pyramid scale), so the approximations do not need to handle borders themselves
+    h, w = data.shape[:2]
+    py, px = int(np.ceil(3 * sigmaY)), int(np.ceil(3 * sigmaX))
+    ph = -(-(h + 2 * py) // multiple) * multiple
+    pw = -(-(w + 2 * px) // multiple) * multiple
+    padded = cv2.copyMakeBorder(
+        data, py, ph - h - py, px, pw - w - px, borderType & ~cv2.BORDER_ISOLATED
+    )
+    return padded, (slice(py, py + h), slice(px, px + w))
+
+
+def _pyramid_gaussian(
+    data: np.ndarray, sigmaX: float, sigmaY: float, borderType: int
+) -> np.ndarray:
+    # pyrDown and pyrUp each add a variance of 1 (in pixels of their finer level),
+    # so after L levels down and up 2 * (4^L - 1) / 3 of the variance is done
+    sigma = min(sigmaX, sigmaY)
+    levels = 0
+    while (
+        sigma**2 - 2 * (4 ** (levels + 1) - 1) / 3
+        >= (_GAUSSIAN_PYRAMID_MIN_SIGMA * 2 ** (levels + 1)) ** 2
+    ):
+        levels += 1
+    if levels == 0:
+        return cv2.GaussianBlur(
+            data, (0, 0), sigmaX=sigmaX, sigmaY=sigmaY, borderType=borderType
+        )
+
+    scale = 2**levels
+    padded, roi = _pad_for_blur(data, sigmaX, sigmaY, borderType, multiple=scale)
+    sizes = []
+    for _ in range(levels):
+        sizes.append((padded.shape[1], padded.shape[0]))
+        padded = cv2.pyrDown(padded)
+
+    done = 2 * (4**levels - 1) / 3
+    padded = cv2.GaussianBlur(
+        padded,
+        (0, 0),
+        sigmaX=np.sqrt(sigmaX**2 - done) / scale,
+        sigmaY=np.sqrt(sigmaY**2 - done) / scale,
+    )
+    for size in reversed(sizes):
+        padded = cv2.pyrUp(padded, dstsize=size)
+    return np.ascontiguousarray(padded[roi])
+
+
+def _box_gaussian(
+    data: np.ndarray, sigmaX: float, sigmaY: float, borderType: int
+) -> np.ndarray:
+    padded, roi = _pad_for_blur(data, sigmaX, sigmaY, borderType)
+    for wx, wy in zip(box_widths(sigmaX), box_widths(sigmaY)):
+        padded = cv2.blur(padded, (wx, wy))
+    return np.ascontiguousarray(padded[roi])
+
+
 @fn.NodeDecorator(
     node_id="cv2.GaussianBlur",
     default_render_options={"data": {"src": "out"}},
@@ -60,7 +178,16 @@ def gaussianBlur(
     sigmaX: float = 0,
     sigmaY: float = -1,
     borderType: BorderTypes = BorderTypes.DEFAULT,
+    mode: GaussianModes = GaussianModes.EXACT,
+    roi: Optional[Tuple[int, int, int, int]] = None,
 ) -> OpenCVImageFormat:
+    """
+    Applies a Gaussian blur. The EXACT mode truncates the kernel at the given size,
+    the PYRAMID and BOX modes only use the size to derive sigma (if sigma <= 0) and
+    run in constant time per pixel, which makes them suited for large sigmas,
+    e.g. for background flattening. If roi (x, y, w, h) is given, only that region
+    is computed, reading its border from the surrounding pixels.
+    """
     if kh <= 0:
         kh = kw
 
@@ -73,33 +200,210 @@ def gaussianBlur(
     if sigmaY < 0:
         sigmaY = sigmaX
 
+    borderType = BorderTypes.v(borderType)
+    mode = GaussianModes.v(mode)
+    sx = gaussian_sigma(kw, sigmaX)
+    sy = gaussian_sigma(kh, sigmaY if sigmaY > 0 else sigmaX)
+    if mode == GaussianModes.EXACT.value:
+        margin = max(kw, kh) // 2
+    else:
+        # the approximations are not truncated, 4 sigma cover them up to 1e-4
+        margin = int(np.ceil(4 * max(sx, sy)))
+    window = RoiWindow(img, roi, margin)
+    data = window.data
+    if mode != GaussianModes.EXACT.value:
+        if mode == GaussianModes.AUTO.value:
+            mode = (
+                GaussianModes.PYRAMID.value
+                if min(sx, sy) >= _GAUSSIAN_AUTO_MIN_SIGMA
+                else GaussianModes.EXACT.value
+            )
+        approximation = {
+            GaussianModes.PYRAMID.value: _pyramid_gaussian,
+            GaussianModes.BOX.value: _box_gaussian,
+        }.get(mode)
+        if approximation is not None:
+            # running sums can leave tiny rounding errors outside of [0, 1]
+            return OpenCVImageFormat(
+                window.crop(np.clip(approximation(data, sx, sy, borderType), 0, 1))
+            )
+
     ksize = (kw, kh)
     img = cv2.GaussianBlur(
-        assert_opencvdata(img),
+        data,
         ksize,
         sigmaX=sigmaX,
         sigmaY=sigmaY,
-        borderType=BorderTypes.v(borderType),
+        borderType=borderType,
+    )
+    return OpenCVImageFormat(window.crop(img))
+
+
+class MedianModes(fn.DataEnum):
+    """
+    Precision modes of the median blur.
+
+    Attributes:
+        AUTO: same as UINT8, kernels up to 5 keep float precision in any mode
+        UINT8: quantizes to 8 bit for ksize > 5 (fastest, loses precision)
+        UINT16: exact median at 16 bit precision, about 10-50x slower than UINT8
+    """
+
+    AUTO = "auto"
+    UINT8 = "uint8"
+    UINT16 = "uint16"
+
+
+# minimal size of the output tiles of the 16 bit median
+_MEDIAN_TILE = 32
+
+
+def _dense_ranks(pieces: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # per row of the (n, m) uint16 pieces, the rank among the distinct values of
+    # the row and the table of the distinct values by rank
+    order = np.argsort(pieces, axis=1, kind="stable")
+    ordered = np.take_along_axis(pieces, order, axis=1)
+    steps = np.zeros(ordered.shape, dtype=bool)
+    np.not_equal(ordered[:, 1:], ordered[:, :-1], out=steps[:, 1:])
+    ranked = np.cumsum(steps, axis=1, dtype=np.uint16)
+    ranks = np.empty_like(ranked)
+    np.put_along_axis(ranks, order, ranked, axis=1)
+    table = np.zeros_like(ordered)
+    table[np.arange(len(pieces))[:, None], ranked] = ordered
+    return ranks, table
+
+
+def _median_tiles(pieces: np.ndarray, ksize: int) -> np.ndarray:
+    # the medians of the interiors of the padded uint16 tiles (n, s, s), each tile
+    # as its own exact 8 bit problem: the high byte of the dense ranks first, then
+    # the low byte in the band of every high byte occurring in the tile, all tiles
+    # as one mosaic for cv2's O(1) median
+    n, s, _ = pieces.shape
+    r = ksize // 2
+    ranks, table = _dense_ranks(pieces.reshape(n, s * s))
+    ranks = ranks.reshape(n, s, s)
+
+    def _median(mosaic):
+        res = cv2.medianBlur(mosaic.reshape(-1, s), ksize).reshape(-1, s, s)
+        return res[:, r : s - r, r : s - r]
+
+    high = _median((ranks >> 8).astype(np.uint8))
+    ids = np.arange(n, dtype=np.int64)[:, None, None] << 8
+    keys = np.flatnonzero(np.bincount((ids + high).ravel()))
+    tiles, levels = keys >> 8, (keys & 255).astype(np.uint8)
+    lo = (levels.astype(np.uint16) << 8)[:, None, None]
+    low = _median(np.minimum(np.maximum(ranks[tiles], lo) - lo, 255).astype(np.uint8))
+    res = np.where(high[tiles] == levels[:, None, None], lo | low, 0).astype(np.uint16)
+    # every pixel is set by the band of its high byte only
+    starts = np.flatnonzero(np.r_[True, tiles[1:] != tiles[:-1]])
+    res = np.bitwise_or.reduceat(res, starts, axis=0)
+    return np.take_along_axis(table, res.reshape(n, -1), axis=1).reshape(res.shape)
+
+
+def median_blur_u16(
+    data: np.ndarray, ksize: int, max_workers: Optional[int] = None
+) -> np.ndarray:
+    """
+    Exact median filter of an uint16 image (with replicated borders like
+    cv2.medianBlur) for any odd kernel size, built on the constant time 8 bit
+    median of OpenCV (Perreault/Hebert). The median commutes with monotone maps,
+    so each padded tile is replaced by the ranks of its distinct values, the median
+    of the high bytes of the ranks is the high byte of the median rank, and the low
+    byte is the 8 bit median of the ranks clamped to the 256 ranks of that high
+    byte. The medians of a tile span few bands of 256 ranks, so a handful of 8 bit
+    passes suffice, independent of the value range. Tiles are filtered in
+    parallel.
+    """
+    if ksize <= 5:
+        return cv2.medianBlur(data, ksize)
+
+    if data.ndim == 3:
+        return np.stack(
+            [
+                median_blur_u16(data[..., i], ksize, max_workers)
+                for i in range(data.shape[2])
+            ],
+            axis=-1,
+        )
+
+    present = np.bincount(data.ravel(), minlength=65536) > 0
+    if present.sum() <= 256:
+        # a single 8 bit pass on the ranks of the values
+        values = np.flatnonzero(present).astype(np.uint16)
+        ranks = (np.cumsum(present, dtype=np.int32) - 1).astype(np.uint8)[data]
+        return values[cv2.medianBlur(ranks, ksize)]
+
+    h, w = data.shape
+    r = ksize // 2
+    # tiles of twice the kernel radius keep the overlap of the padded tiles small
+    t = min(max(_MEDIAN_TILE, 2 * r), max(h, w))
+    ny, nx = -(-h // t), -(-w // t)
+    padded = cv2.copyMakeBorder(
+        data, r, r + ny * t - h, r, r + nx * t - w, cv2.BORDER_REPLICATE
     )
-    return OpenCVImageFormat(img)
+    s = t + 2 * r
+    pieces = sliding_window_view(padded, (s, s))[::t, ::t].reshape(ny * nx, s, s)
+
+    chunks = np.array_split(np.arange(ny * nx), max_workers or os.cpu_count() or 1)
+    chunks = [c for c in chunks if len(c)]
+
+    def _chunk(c):
+        return _median_tiles(pieces[c], ksize)
+
+    if len(chunks) <= 1:
+        res = np.concatenate([_chunk(c) for c in chunks])
+    else:
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            res = np.concatenate(list(executor.map(_chunk, chunks)))
+    res = res.reshape(ny, nx, t, t).transpose(0, 2, 1, 3).reshape(ny * t, nx * t)
+    return res[:h, :w]
 
 
 @fn.NodeDecorator(
     node_id="cv2.medianBlur",
     default_render_options={"data": {"src": "out"}},
     description="Apply a median blur to an image.",
+    default_io_options={
+        "max_workers": {"value_options": {"min": 1}},
+    },
 )
 def medianBlur(
     img: ImageFormat,
     ksize: int = 5,
+    mode: MedianModes = MedianModes.AUTO,
+    max_workers: Optional[int] = None,
+    roi: Optional[Tuple[int, int, int, int]] = None,
 ) -> OpenCVImageFormat:
+    """
+    Applies a median blur. OpenCV only supports kernels larger than 5 on 8 bit data,
+    so larger kernels either quantize to 8 bit (UINT8, the default) or use an exact
+    16 bit median (UINT16), which keeps the precision of 12/16 bit sensor data. The
+    16 bit median runs a few 8 bit passes per tile and takes about 10x (ksize 9)
+    to 50x (ksize 101) the time of UINT8, e.g. 0.1 s for 512x512 at ksize 9.
+
+    Args:
+        img: ImageFormat: The image.
+        ksize: int: The kernel size, even sizes are increased by one.
+        mode: MedianModes: The precision mode.
+        max_workers: int: The number of threads of the 16 bit median, defaults to the
+            number of CPUs.
+        roi: Tuple[int, int, int, int]: Only filters this region (x, y, w, h),
+            reading its border from the surrounding pixels.
+    Returns:
+        OpenCVImageFormat: The filtered image.
+    """
     if ksize % 2 == 0:
         ksize += 1
 
-    img = assert_opencvdata(img)
+    window = RoiWindow(img, roi, ksize // 2)
+    img = window.data
+    if MedianModes.v(mode) == MedianModes.UINT16.value:
+        u16 = np.round(img * 65535).astype(np.uint16)
+        res = median_blur_u16(u16, ksize, max_workers).astype(np.float32) / 65535
+        return OpenCVImageFormat(window.crop(res))
     if ksize > 5:
         img = (img * 255).astype(np.uint8)
-    return OpenCVImageFormat(cv2.medianBlur(img, ksize))
+    return OpenCVImageFormat(window.crop(cv2.medianBlur(img, ksize)))
 
 
 @fn.NodeDecorator(
@@ -113,15 +417,221 @@ def bilateralFilter(
     sigmaColor: float = 0.25,
     sigmaSpace: float = 0.25,
     borderType: BorderTypes = BorderTypes.DEFAULT,
+    roi: Optional[Tuple[int, int, int, int]] = None,
 ) -> OpenCVImageFormat:
+    # cv2 derives the diameter from sigmaSpace if d <= 0
+    radius = d // 2 if d > 0 else int(round(sigmaSpace * 1.5))
+    window = RoiWindow(img, roi, radius)
     img = cv2.bilateralFilter(
-        assert_opencvdata(img),
+        window.data,
         d,
         sigmaColor,
         sigmaSpace,
         borderType=BorderTypes.v(borderType),
     )
-    return OpenCVImageFormat(img)
+    return OpenCVImageFormat(window.crop(img))
+
+
+def _gray(data: np.ndarray) -> np.ndarray:
+    if data.ndim == 2:
+        return data
+    if data.shape[2] == 1:
+        return data[..., 0]
+    if data.shape[2] == 3:
+        return cv2.cvtColor(data, cv2.COLOR_BGR2GRAY)
+    return data.mean(axis=2, dtype=np.float32)
+
+
+def guided_filter(
+    data: np.ndarray,
+    guide: np.ndarray,
+    radius: int,
+    eps: float,
+    borderType: int = cv2.BORDER_DEFAULT,
+) -> np.ndarray:
+    """
+    Guided filter (He et al.) of a float image (h, w, c) with a guide of one or c
+    channels. Only normalized box filters are used, so the cost does not depend on
+    the radius.
+    """
+    if guide.ndim == 2:
+        guide = guide[..., None]
+    if guide.shape[2] != data.shape[2]:
+        guide = np.repeat(_gray(guide)[..., None], data.shape[2], axis=2)
+
+    ksize = (2 * radius + 1, 2 * radius + 1)
+
+    def _mean(x):
+        return cv2.boxFilter(x, -1, ksize, borderType=borderType).reshape(x.shape)
+
+    mean_i = _mean(guide)
+    mean_p = _mean(data)
+    var_i = _mean(guide * guide) - mean_i * mean_i
+    a = (_mean(guide * data) - mean_i * mean_p) / (var_i + eps)
+    b = mean_p - a * mean_i
+    return _mean(a) * guide + _mean(b)
+
+
+# taps of the grid blur, a binomial approximation of a Gaussian with sigma 1 cell
+_GRID_BLUR = np.array([1, 4, 6, 4, 1], dtype=np.float32) / 16
+_GRID_PAD = 2
+# below this sigmaSpace (in pixels) bilateral_grid uses the exact filter
+_GRID_MIN_SIGMA_SPACE = 2.0
+
+
+def _blur_grid_axis(grid: np.ndarray, axis: int) -> np.ndarray:
+    out = np.zeros_like(grid)
+    n = grid.shape[axis]
+    for offset, tap in zip(range(-_GRID_PAD, _GRID_PAD + 1), _GRID_BLUR):
+        src = [slice(None)] * grid.ndim
+        dst = [slice(None)] * grid.ndim
+        src[axis] = slice(max(0, offset), n + min(0, offset))
+        dst[axis] = slice(max(0, -offset), n + min(0, -offset))
+        out[tuple(dst)] += tap * grid[tuple(src)]
+    return out
+
+
+def bilateral_grid(
+    data: np.ndarray, sigmaColor: float, sigmaSpace: float
+) -> np.ndarray:
+    """
+    Bilateral grid approximation (Paris and Durand) of the bilateral filter of a
+    float image (h, w, c) in [0, 1], with the grayscale image as edge image.
+    The grid is sampled every sigmaSpace pixels and every sigmaColor intensity
+    levels, so the cost per pixel does not depend on sigmaSpace.
+
+    The grid has about h * w / sigmaSpace**2 / sigmaColor cells. If that is more
+    than the number of pixels (roughly sigmaSpace**2 < 1 / sigmaColor), or
+    sigmaSpace is below 2 pixels, the grid offers no speedup and would need
+    more memory than the image, so cv2.bilateralFilter is used instead.
+    """
+    h, w, c = data.shape
+    sigmaSpace = float(sigmaSpace)
+    sigmaColor = max(float(sigmaColor), 1e-3)
+    pad = _GRID_PAD
+    gh = int((h - 1) / max(sigmaSpace, 1.0)) + 1 + 2 * pad
+    gw = int((w - 1) / max(sigmaSpace, 1.0)) + 1 + 2 * pad
+    gd = int(1 / sigmaColor) + 1 + 2 * pad
+    if sigmaSpace < _GRID_MIN_SIGMA_SPACE or gh * gw * gd > h * w:
+        return cv2.bilateralFilter(data, -1, sigmaColor, sigmaSpace).reshape(h, w, c)
+
+    gy = np.arange(h, dtype=np.float32) / sigmaSpace + pad
+    gx = np.arange(w, dtype=np.float32) / sigmaSpace + pad
+    gz = np.clip(_gray(data), 0, 1) / sigmaColor + pad
+
+    # splat into a (y, z, x) grid of homogeneous values, so a slice of it can be
+    # interpolated in x and z by a single remap
+    cells = (gy + 0.5).astype(np.int64)[:, None] * gd + (gz + 0.5).astype(np.int64)
+    cells = (cells * gw + (gx + 0.5).astype(np.int64)[None, :]).ravel()
+    size = gh * gd * gw
+    grid = np.empty((gh, gd, gw, c + 1), dtype=np.float32)
+    values = data.reshape(-1, c)
+    for i in range(c):
+        grid[..., i] = np.bincount(cells, weights=values[:, i], minlength=size).reshape(
+            gh, gd, gw
+        )
+    grid[..., c] = np.bincount(cells, minlength=size).reshape(gh, gd, gw)
+    for axis in range(3):
+        grid = _blur_grid_axis(grid, axis)
+
+    # slice: trilinear interpolation as two (x, z) remaps for the neighbouring y cells
+    grid = grid.reshape(gh * gd, gw, c + 1)
+    y0 = np.floor(gy)
+    fy = (gy - y0)[:, None, None]
+    mapx = np.ascontiguousarray(np.broadcast_to(gx, (h, w)))
+    mapy = (y0 * gd)[:, None] + gz
+
+    def _remap(mapy):
+        # remap handles at most 4 channels at once
+        return np.concatenate(
+            [
+                cv2.remap(
+                    np.ascontiguousarray(grid[..., i : i + 4]),
+                    mapx,
+                    mapy,
+                    cv2.INTER_LINEAR,
+                ).reshape(h, w, -1)
+                for i in range(0, c + 1, 4)
+            ],
+            axis=2,
+        )
+
+    lower = _remap(mapy)
+    upper = _remap(mapy + gd)
+    lower += fy * (upper - lower)
+    return lower[..., :c] / np.maximum(lower[..., c:], 1e-8)
+
+
+@fn.NodeDecorator(
+    node_id="cv2.guidedFilter",
+    default_render_options={"data": {"src": "out"}},
+    description="Apply a guided filter to an image, a fast edge-preserving smoothing.",
+)
+def guidedFilter(
+    img: ImageFormat,
+    sigmaColor: float = 0.1,
+    sigmaSpace: int = 8,
+    guide: Optional[ImageFormat] = None,
+    borderType: BorderTypes = BorderTypes.DEFAULT,
+) -> OpenCVImageFormat:
+    """
+    Edge-preserving smoothing with the guided filter, built from box filters, so
+    the cost does not depend on the window size. The parameters mirror the ones of
+    bilateralFilter, sigmaSpace is the window radius and sigmaColor the intensity
+    difference (the regularization is sigmaColor^2) below which edges are smoothed.
+
+    Args:
+        img: ImageFormat: The image.
+        sigmaColor: float: The edge threshold in intensity units.
+        sigmaSpace: int: The window radius in pixels.
+        guide: ImageFormat: The guide image, defaults to the image itself.
+        borderType: BorderTypes: The border type.
+    Returns:
+        OpenCVImageFormat: The filtered image.
+    """
+    data = assert_opencvdata(img)
+    guide = data if guide is None else assert_opencvdata(guide)
+    if guide.shape[:2] != data.shape[:2]:
+        raise ValueError(
+            f"The guide size {guide.shape[1]}x{guide.shape[0]} does not match "
+            f"the image size {data.shape[1]}x{data.shape[0]}"
+        )
+    res = guided_filter(
+        data,
+        guide,
+        max(int(sigmaSpace), 1),
+        float(sigmaColor) ** 2,
+        BorderTypes.v(borderType),
+    )
+    return OpenCVImageFormat(np.clip(res, 0, 1))
+
+
+@fn.NodeDecorator(
+    node_id="cv2.bilateralGrid",
+    default_render_options={"data": {"src": "out"}},
+    description="Apply a fast bilateral grid approximation of the bilateral filter.",
+)
+def bilateralGrid(
+    img: ImageFormat,
+    sigmaColor: float = 0.1,
+    sigmaSpace: float = 16,
+) -> OpenCVImageFormat:
+    """
+    Approximates bilateralFilter(img, -1, sigmaColor, sigmaSpace) on a downsampled
+    bilateral grid. The cost does not depend on sigmaSpace and decreases with
+    larger sigmaColor, which makes it suited for real-time use on large images.
+    For small sigmaSpace (below 2 pixels or sigmaSpace**2 < 1 / sigmaColor) the
+    grid would be larger than the image and bilateralFilter is used instead.
+
+    Args:
+        img: ImageFormat: The image.
+        sigmaColor: float: The filter sigma in the color space.
+        sigmaSpace: float: The filter sigma in the coordinate space (pixels).
+    Returns:
+        OpenCVImageFormat: The filtered image.
+    """
+    res = bilateral_grid(assert_opencvdata(img), sigmaColor, sigmaSpace)
+    return OpenCVImageFormat(np.clip(res, 0, 1))
 
 
 @fn.NodeDecorator(
@@ -135,22 +645,154 @@ def boxFilter(
     kh: Optional[int] = None,
     normalize: bool = True,
     borderType: BorderTypes = BorderTypes.DEFAULT,
+    roi: Optional[Tuple[int, int, int, int]] = None,
 ) -> OpenCVImageFormat:
     if kh is None:
         kh = kw
 
     ksize = (kw, kh)
+    window = RoiWindow(img, roi, max(kw, kh) // 2)
     return OpenCVImageFormat(
-        cv2.boxFilter(
-            assert_opencvdata(img),
-            -1,
-            ksize=ksize,
-            normalize=normalize,
-            borderType=BorderTypes.v(borderType),
+        window.crop(
+            cv2.boxFilter(
+                window.data,
+                -1,
+                ksize=ksize,
+                normalize=normalize,
+                borderType=BorderTypes.v(borderType),
+            )
         )
     )
 
 
+class Filter2DModes(fn.DataEnum):
+    """
+    Execution modes of filter2D.
+
+    Attributes:
+        AUTO: uses the separable path if the kernel is (numerically) low-rank and this is
+            cheaper than applying the full kernel, otherwise applies the full kernel
+        DIRECT: always applies the full kernel with cv2.filter2D, O(kw*kh) per pixel
+        SEPARABLE: decomposes the kernel into a sum of rank-1 (row x column) kernels within
+            the given tolerance and applies each with cv2.sepFilter2D, O(rank*(kw+kh)) per pixel
+        FFT: multiplies the image and kernel spectra (cv2.dft), the kernel spectrum is cached for
+            repeated calls with the same kernel and image size, O(log(w*h)) per pixel
+    """
+
+    AUTO = "auto"
+    DIRECT = "direct"
+    SEPARABLE = "separable"
+    FFT = "fft"
+
+
+# AUTO crossover points of filter2D: separable passes are only worth it up to about this
+# many taps (rank * (kw + kh)), beyond that and for kernels at least this large the
+# FFT path is faster
+_SEPARABLE_MAX_TAPS = 128
+_FFT_MIN_KERNEL_AREA = 51 * 51
+
+_KERNEL_SPECTRA = LRUCache(maxsize=8)
+
+
+def separable_decomposition(
+    kernel: np.ndarray, tolerance: float = 1e-5
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Decomposes a 2D kernel into a sum of rank-1 kernels via SVD,
+    kernel ~= sum(np.outer(ky, kx) for kx, ky in result).
+
+    The number of terms is the smallest rank whose Frobenius error relative to the
+    kernel norm is at most `tolerance`.
+    """
+    kernel = np.asarray(kernel, dtype=np.float64)
+    if kernel.ndim == 1:
+        # cv2 interprets 1D kernels as columns
+        kernel = kernel[:, np.newaxis]
+    u, s, vt = np.linalg.svd(kernel, full_matrices=False)
+    total = np.sqrt(np.sum(s**2))
+    # residual[r] = frobenius error when keeping the first r terms
+    residual = np.sqrt(np.maximum(np.cumsum((s**2)[::-1])[::-1], 0))
+    rank = len(s)
+    for r in range(1, len(s)):
+        if residual[r] <= tolerance * total:
+            rank = r
+            break
+    return [(vt[i] * np.sqrt(s[i]), u[:, i] * np.sqrt(s[i])) for i in range(rank)]
+
+
+def _sep_filter(
+    data: np.ndarray,
+    terms: List[Tuple[np.ndarray, np.ndarray]],
+    anchor: Tuple[int, int],
+    delta: float,
+    borderType: int,
+) -> np.ndarray:
+    res = None
+    for kx, ky in terms:
+        part = cv2.sepFilter2D(
+            data, -1, kx, ky, anchor=anchor, delta=0, borderType=borderType
+        )
+        res = part if res is None else cv2.add(res, part, dst=res)
+    if delta:
+        res += delta
+    return res
+
+
+def kernel_spectrum(kernel: np.ndarray, dft_h: int, dft_w: int) -> np.ndarray:
+    """The (CCS packed) spectrum of the kernel zero-padded to dft_h x dft_w, cached."""
+
+    def _spectrum():
+        padded = np.zeros((dft_h, dft_w), dtype=np.float32)
+        padded[: kernel.shape[0], : kernel.shape[1]] = kernel
+        return cv2.dft(padded, nonzeroRows=kernel.shape[0])
+
+    return _KERNEL_SPECTRA.get((array_key(kernel), dft_h, dft_w), _spectrum)
+
+
+def _fft_filter(
+    data: np.ndarray,
+    kernel: np.ndarray,
+    anchor: Tuple[int, int],
+    delta: float,
+    borderType: int,
+) -> np.ndarray:
+    """Correlates the [h, w, c] data with the kernel in the frequency domain,
+    matching the output of cv2.filter2D.
+    """
+    kh, kw = kernel.shape
+    ax, ay = anchor
+    if ax < 0:
+        ax = kw // 2
+    if ay < 0:
+        ay = kh // 2
+    h, w = data.shape[:2]
+    dft_h = cv2.getOptimalDFTSize(h + kh - 1)
+    dft_w = cv2.getOptimalDFTSize(w + kw - 1)
+    spectrum = kernel_spectrum(kernel, dft_h, dft_w)
+    borderType = borderType & ~cv2.BORDER_ISOLATED
+
+    planes = []
+    for c in range(data.shape[2]):
+        # the border is extended over the whole dft size instead of zero padding, output
+        # rows/cols < h/w never wrap around into it
+        plane = cv2.copyMakeBorder(
+            data[:, :, c],
+            ay,
+            dft_h - h - ay,
+            ax,
+            dft_w - w - ax,
+            borderType,
+        )
+        spec = cv2.dft(plane, nonzeroRows=h + kh - 1)
+        spec = cv2.mulSpectrums(spec, spectrum, 0, conjB=True)
+        plane = cv2.idft(spec, flags=cv2.DFT_SCALE | cv2.DFT_REAL_OUTPUT, nonzeroRows=h)
+        planes.append(plane[:h, :w])
+    res = np.stack(planes, axis=2)
+    if delta:
+        res += delta
+    return res
+
+
 @fn.NodeDecorator(
     node_id="cv2.filter2D",
     default_render_options={"data": {"src": "out"}},
@@ -158,27 +800,91 @@ def boxFilter(
 )
 def filter2D(
     img: ImageFormat,
-    kernel: Optional[np.ndarray],
+    kernel: Union[str, np.ndarray],
     anchor: Optional[Tuple[int, int]] = None,
     delta: int = 0,
     borderType: BorderTypes = BorderTypes.DEFAULT,
     clip: bool = True,
+    mode: Filter2DModes = Filter2DModes.AUTO,
+    tolerance: float = 1e-5,
+    roi: Optional[Tuple[int, int, int, int]] = None,
 ) -> OpenCVImageFormat:
     if anchor is None:
         anchor = (-1, -1)
 
-    data = assert_opencvdata(img)
-    img = cv2.filter2D(
-        data,
+    mode = Filter2DModes.v(mode)
+    borderType = BorderTypes.v(borderType)
+    kernel = resolve_kernel(kernel, default_type="box")
+    if kernel.ndim == 1:
+        # cv2 interprets 1D kernels as columns
+        kernel = kernel[:, np.newaxis]
+    kh, kw = kernel.shape
+    # the anchor can be anywhere in the kernel
+    window = RoiWindow(img, roi, max(kw, kh))
+    data = window.data
+
+    terms = None
+    if mode == Filter2DModes.SEPARABLE.value:
+        terms = separable_decomposition(kernel, tolerance)
+    elif mode == Filter2DModes.AUTO.value:
+        terms = separable_decomposition(kernel, tolerance)
+        taps = len(terms) * (kw + kh)
+        if taps >= kw * kh or taps > _SEPARABLE_MAX_TAPS:
+            terms = None
+            if kw * kh >= _FFT_MIN_KERNEL_AREA:
+                mode = Filter2DModes.FFT.value
+
+    if terms is not None:
+        img = _sep_filter(data, terms, anchor, delta, borderType)
+    elif mode == Filter2DModes.FFT.value and borderType != cv2.BORDER_TRANSPARENT:
+        img = _fft_filter(data, kernel, anchor, delta, borderType)
+    else:
+        img = cv2.filter2D(
+            data,
+            -1,
+            kernel=kernel,
+            anchor=anchor,
+            delta=delta,
+            borderType=borderType,
+        )
+    if clip:
+        img = np.clip(img, 0, 1)
+    return OpenCVImageFormat(window.crop(img))
+
+
+@fn.NodeDecorator(
+    node_id="cv2.sepFilter2D",
+    default_render_options={"data": {"src": "out"}},
+    description="Apply a separable kernel (row and column kernel) to an image.",
+)
+def sepFilter2D(
+    img: ImageFormat,
+    kernelX: np.ndarray,
+    kernelY: np.ndarray,
+    anchor: Optional[Tuple[int, int]] = None,
+    delta: float = 0,
+    borderType: BorderTypes = BorderTypes.DEFAULT,
+    clip: bool = True,
+    roi: Optional[Tuple[int, int, int, int]] = None,
+) -> OpenCVImageFormat:
+    if anchor is None:
+        anchor = (-1, -1)
+
+    kernelX = np.asarray(kernelX, dtype=np.float32).ravel()
+    kernelY = np.asarray(kernelY, dtype=np.float32).ravel()
+    window = RoiWindow(img, roi, max(len(kernelX), len(kernelY)))
+    img = cv2.sepFilter2D(
+        window.data,
         -1,
-        kernel=kernel,
+        kernelX,
+        kernelY,
         anchor=anchor,
         delta=delta,
         borderType=BorderTypes.v(borderType),
     )
     if clip:
         img = np.clip(img, 0, 1)
-    return OpenCVImageFormat(img)
+    return OpenCVImageFormat(window.crop(img))
 
 
 @fn.NodeDecorator(
@@ -189,6 +895,7 @@ def stackBlur(
     img: ImageFormat,
     kw: int = 5,
     kh: Optional[int] = None,
+    roi: Optional[Tuple[int, int, int, int]] = None,
 ) -> OpenCVImageFormat:
     if kh is None:
         kh = kw
@@ -197,7 +904,10 @@ def stackBlur(
     if kh % 2 == 0:
         kh += 1
     ksize = (kw, kh)
-    return OpenCVImageFormat(cv2.stackBlur(assert_opencvdata(img), ksize))
+    window = RoiWindow(img, roi, max(kw, kh) // 2)
+    # running sums can leave tiny rounding errors outside of [0, 1]
+    res = np.clip(cv2.stackBlur(window.data, ksize), 0, 1)
+    return OpenCVImageFormat(window.crop(res))
 
 
 NODE_SHELF = fn.Shelf(
@@ -206,9 +916,12 @@ NODE_SHELF = fn.Shelf(
         gaussianBlur,
         medianBlur,
         bilateralFilter,
+        guidedFilter,
+        bilateralGrid,
         stackBlur,
         boxFilter,
         filter2D,
+        sepFilter2D,
     ],
     subshelves=[],
     name="Filtering and Smoothing",
@@ -1,10 +1,12 @@
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from typing import List, Optional, Tuple, Union
 import cv2
 import numpy as np
 import funcnodes as fn
 import math
 from ..imageformat import OpenCVImageFormat, ImageFormat
-from ..utils import assert_opencvdata
+from ..utils import assert_opencvdata, assert_opencvimg, LRUCache, array_key
 
 
 class Interpolations(fn.DataEnum):
@@ -81,6 +83,94 @@ def rotate(
     return OpenCVImageFormat(cv2.rotate(assert_opencvdata(img), rot))
 
 
+@fn.NodeDecorator(
+    node_id="cv2.crop",
+    name="Crop",
+    default_render_options={"data": {"src": "out"}},
+    default_io_options={
+        "x": {"value_options": {"min": 0}},
+        "y": {"value_options": {"min": 0}},
+        "w": {"value_options": {"min": 1}},
+        "h": {"value_options": {"min": 1}},
+    },
+    description="Crops a region of interest without copying the pixels.",
+)
+def crop(
+    img: ImageFormat,
+    x: int = 0,
+    y: int = 0,
+    w: int = 512,
+    h: int = 512,
+) -> OpenCVImageFormat:
+    """
+    Returns the region (x, y, w, h), clipped to the image, as a view of the image
+    buffer. Neighborhood filters applied to the crop read their border from the
+    surrounding pixels of the image, and only process the region.
+
+    Args:
+        img: ImageFormat: The image.
+        x: int: The left edge of the region.
+        y: int: The top edge of the region.
+        w: int: The width of the region.
+        h: int: The height of the region.
+    Returns:
+        OpenCVImageFormat: The region.
+    """
+    return assert_opencvimg(img).crop(x, y, w, h)
+
+
+class ResizeModes(fn.DataEnum):
+    """
+    Execution modes of resize.
+
+    Attributes:
+        DIRECT: a single cv2.resize with the given interpolation
+        AUTO: downscales by factors >= 2 with repeated pyrDown (shared via the cached
+            pyramid of the image) and resizes the remaining factor < 2 with AREA, which
+            avoids aliasing and is much faster than AREA on the full image; other
+            downscales use AREA and upscales the given interpolation
+    """
+
+    DIRECT = "direct"
+    AUTO = "auto"
+
+
+def _target_size(
+    shape: Tuple[int, ...],
+    h: Optional[int],
+    w: Optional[int],
+    fh: float,
+    fw: float,
+) -> Tuple[int, int]:
+    if h is None:
+        h = int(round(fh * shape[0]))
+    if w is None:
+        w = int(round(fw * shape[1]))
+    return max(h, 1), max(w, 1)
+
+
+def pyramid_resize(
+    pyramid: "ImagePyramid", dsize: Tuple[int, int], interpolation: int
+) -> np.ndarray:
+    """
+    Resizes the base image of the pyramid to dsize (w, h), starting from the smallest
+    pyramid level that is still at least as large as dsize.
+    """
+    w, h = dsize
+    level = 0
+    src = pyramid.gaussian(0)[0]
+    while (src.shape[0] + 1) // 2 >= h and (src.shape[1] + 1) // 2 >= w:
+        level += 1
+        src = pyramid.gaussian(level)[level]
+    if src.shape[:2] == (h, w):
+        return src.copy()
+    if h <= src.shape[0] and w <= src.shape[1]:
+        interpolation = cv2.INTER_AREA
+    return cv2.resize(src, (w, h), interpolation=interpolation).reshape(
+        h, w, src.shape[2]
+    )
+
+
 @fn.NodeDecorator(
     node_id="cv2.resize",
     outputs=[
@@ -95,51 +185,291 @@ def resize(
     fh: float = 1,
     fw: float = 1,
     interpolation: Interpolations = Interpolations.LINEAR,
+    mode: ResizeModes = ResizeModes.DIRECT,
 ) -> OpenCVImageFormat:
     interpolation: int = Interpolations.v(interpolation)
-    data = assert_opencvdata(img)
-    if h is None:
-        h = int(round(fh * data.shape[0]))
-    if h == 0:
-        h = 1
-    if w is None:
-        w = int(round(fw * data.shape[1]))
-    if w == 0:
-        w = 1
+    if ResizeModes.v(mode) == ResizeModes.AUTO.value:
+        pyr = ImagePyramid.of(img)
+        h, w = _target_size(pyr.gaussian(0)[0].shape, h, w, fh, fw)
+        return OpenCVImageFormat(pyramid_resize(pyr, (w, h), interpolation))
 
+    data = assert_opencvdata(img)
+    h, w = _target_size(data.shape, h, w, fh, fw)
     return OpenCVImageFormat(
         cv2.resize(data, dsize=(w, h), interpolation=interpolation)
     )
 
 
+def parse_sizes(sizes: Union[str, List[Tuple[int, int]]]) -> List[Tuple[int, int]]:
+    """Parses sizes given as "<w>x<h>" list or comma separated string to (w, h)."""
+    if isinstance(sizes, str):
+        sizes = [s for s in sizes.split(",") if s.strip()]
+    res = []
+    for size in sizes:
+        if isinstance(size, str):
+            try:
+                w, h = (int(v) for v in size.lower().split("x"))
+            except ValueError:
+                raise ValueError(f"Invalid size '{size}', expected '<w>x<h>'")
+        else:
+            w, h = (int(v) for v in size)
+        if w <= 0 or h <= 0:
+            raise ValueError(f"Invalid size {w}x{h}")
+        res.append((w, h))
+    return res
+
+
+@fn.NodeDecorator(
+    node_id="cv2.resize_multi",
+    name="Resize Multi",
+    outputs=[
+        {"name": "out", "description": "The resized images, in the order of sizes."},
+    ],
+    description="Resizes an image to several sizes in one call.",
+)
+def resize_multi(
+    img: ImageFormat,
+    sizes: Union[str, List[Tuple[int, int]]] = "512x512,256x256,128x128",
+    interpolation: Interpolations = Interpolations.LINEAR,
+) -> List[OpenCVImageFormat]:
+    """
+    Resizes an image to several sizes, e.g. thumbnails and model input sizes, with the
+    AUTO strategy of resize. The pyramid levels are computed once and shared by all
+    sizes (and by other nodes working on the same image).
+
+    Args:
+        img: ImageFormat: The image.
+        sizes: Union[str, List[Tuple[int, int]]]: The target sizes as "<w>x<h>",
+            as list or comma separated.
+        interpolation: Interpolations: The interpolation used for upscaling.
+    Returns:
+        List[OpenCVImageFormat]: The resized images.
+    """
+    pyr = ImagePyramid.of(img)
+    interpolation = Interpolations.v(interpolation)
+    return [
+        OpenCVImageFormat(pyramid_resize(pyr, size, interpolation))
+        for size in parse_sizes(sizes)
+    ]
+
+
+class WarpModes(fn.DataEnum):
+    """
+    Execution modes of the warp nodes.
+
+    Attributes:
+        DIRECT: cv2.warpAffine/cv2.warpPerspective, computes the coordinates on every call
+        CACHED: computes fixed-point remap tables once per matrix, input and output size
+            and warps with cv2.remap, for repeated warps with the same matrix
+    """
+
+    DIRECT = "direct"
+    CACHED = "cached"
+
+
+_WARP_MAPS = LRUCache(maxsize=8)
+
+
+def _compute_warp_maps(
+    M: np.ndarray,
+    dsize: Tuple[int, int],
+    perspective: bool,
+    nearest: bool,
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    w, h = dsize
+    if perspective:
+        inv = np.linalg.inv(M)
+    else:
+        inv = np.vstack([cv2.invertAffineTransform(M), [0, 0, 1]])
+    x = np.arange(w, dtype=np.float64)[None, :]
+    y = np.arange(h, dtype=np.float64)[:, None]
+    mapx = inv[0, 0] * x + inv[0, 1] * y + inv[0, 2]
+    mapy = inv[1, 0] * x + inv[1, 1] * y + inv[1, 2]
+    if perspective:
+        z = inv[2, 0] * x + inv[2, 1] * y + inv[2, 2]
+        z = np.where(np.abs(z) > 1e-12, 1 / z, 0)
+        mapx, mapy = mapx * z, mapy * z
+    return cv2.convertMaps(
+        mapx.astype(np.float32),
+        mapy.astype(np.float32),
+        cv2.CV_16SC2,
+        nninterpolation=nearest,
+    )
+
+
+def warp_maps(
+    M: np.ndarray,
+    src_size: Tuple[int, int],
+    dsize: Tuple[int, int],
+    perspective: bool = False,
+    nearest: bool = False,
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Returns the fixed-point (CV_16SC2) remap tables of the warp with the (2x3 or 3x3)
+    matrix M, cached by matrix, input size (w, h) and output size (w, h).
+    """
+    M = np.asarray(M, dtype=np.float64)
+    key = (array_key(M), tuple(src_size), tuple(dsize), perspective, nearest)
+    return _WARP_MAPS.get(
+        key, lambda: _compute_warp_maps(M, tuple(dsize), perspective, nearest)
+    )
+
+
+def remap_tiled(
+    data: np.ndarray,
+    map1: np.ndarray,
+    map2: Optional[np.ndarray],
+    interpolation: int = cv2.INTER_LINEAR,
+    borderMode: int = cv2.BORDER_CONSTANT,
+    max_workers: Optional[int] = None,
+) -> np.ndarray:
+    """
+    cv2.remap, split into row tiles on a thread pool if max_workers > 1
+    (cv2.remap is parallel by itself if OpenCV runs with several threads).
+    """
+    if interpolation == cv2.INTER_AREA:
+        interpolation = cv2.INTER_LINEAR
+
+    def _remap(rows: slice) -> np.ndarray:
+        return cv2.remap(
+            data,
+            map1[rows],
+            None if map2 is None else map2[rows],
+            interpolation,
+            borderMode=borderMode,
+        )
+
+    h = map1.shape[0]
+    if not max_workers or max_workers <= 1 or h < 2 * max_workers:
+        return _remap(slice(None))
+
+    bounds = np.linspace(0, h, max_workers + 1).astype(int)
+    rows = [slice(a, b) for a, b in zip(bounds[:-1], bounds[1:])]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return np.concatenate(list(executor.map(_remap, rows)))
+
+
+def warp(
+    data: np.ndarray,
+    M: np.ndarray,
+    dsize: Tuple[int, int],
+    perspective: bool = False,
+    interpolation: int = cv2.INTER_LINEAR,
+    mode: WarpModes = WarpModes.DIRECT,
+    max_workers: Optional[int] = None,
+) -> np.ndarray:
+    """Warps the data with cv2.warpAffine/warpPerspective or cached remap tables."""
+    if WarpModes.v(mode) == WarpModes.CACHED.value:
+        map1, map2 = warp_maps(
+            M,
+            (data.shape[1], data.shape[0]),
+            dsize,
+            perspective=perspective,
+            nearest=interpolation == cv2.INTER_NEAREST,
+        )
+        return remap_tiled(data, map1, map2, interpolation, max_workers=max_workers)
+    if perspective:
+        return cv2.warpPerspective(data, M, dsize, flags=interpolation)
+    return cv2.warpAffine(data, M, dsize, flags=interpolation)
+
+
 @fn.NodeDecorator(
     node_id="cv2.warpAffine",
     default_render_options={"data": {"src": "out"}},
+    default_io_options={
+        "max_workers": {"value_options": {"min": 1}},
+    },
 )
 def warpAffine(
-    img: ImageFormat, M: np.ndarray, w: Optional[int] = None, h: Optional[int] = None
+    img: ImageFormat,
+    M: np.ndarray,
+    w: Optional[int] = None,
+    h: Optional[int] = None,
+    interpolation: Interpolations = Interpolations.LINEAR,
+    mode: WarpModes = WarpModes.DIRECT,
+    max_workers: Optional[int] = None,
 ) -> OpenCVImageFormat:
+    """
+    Applies an affine transformation to an image. With the CACHED mode the remap
+    tables of M are computed once and reused by all following calls with the same
+    matrix and sizes, e.g. for every frame of a fixed camera.
+
+    Args:
+        img: ImageFormat: The image.
+        M: np.ndarray: The 2x3 transformation matrix.
+        w: int: The output width, defaults to the input width.
+        h: int: The output height, defaults to the input height.
+        interpolation: Interpolations: The interpolation method.
+        mode: WarpModes: The execution mode.
+        max_workers: int: The number of threads of the CACHED mode.
+    Returns:
+        OpenCVImageFormat: The transformed image.
+    """
     data = assert_opencvdata(img)
     if w is None:
         w = data.shape[1]
     if h is None:
         h = data.shape[0]
-    return OpenCVImageFormat(cv2.warpAffine(assert_opencvdata(img), M, (w, h)))
+    return OpenCVImageFormat(
+        warp(
+            data,
+            M,
+            (w, h),
+            interpolation=Interpolations.v(interpolation),
+            mode=mode,
+            max_workers=max_workers,
+        )
+    )
 
 
 @fn.NodeDecorator(
     node_id="cv2.perpectiveTransform",
     default_render_options={"data": {"src": "out"}},
+    default_io_options={
+        "max_workers": {"value_options": {"min": 1}},
+    },
 )
 def perpectiveTransform(
-    img: ImageFormat, M: np.ndarray, w: Optional[int] = None, h: Optional[int] = None
+    img: ImageFormat,
+    M: np.ndarray,
+    w: Optional[int] = None,
+    h: Optional[int] = None,
+    interpolation: Interpolations = Interpolations.LINEAR,
+    mode: WarpModes = WarpModes.DIRECT,
+    max_workers: Optional[int] = None,
 ) -> OpenCVImageFormat:
+    """
+    Applies a perspective transformation to an image. With the CACHED mode the remap
+    tables of M are computed once and reused by all following calls with the same
+    matrix and sizes, e.g. for every frame of a fixed camera.
+
+    Args:
+        img: ImageFormat: The image.
+        M: np.ndarray: The 3x3 transformation matrix.
+        w: int: The output width, defaults to the input width.
+        h: int: The output height, defaults to the input height.
+        interpolation: Interpolations: The interpolation method.
+        mode: WarpModes: The execution mode.
+        max_workers: int: The number of threads of the CACHED mode.
+    Returns:
+        OpenCVImageFormat: The transformed image.
+    """
     data = assert_opencvdata(img)
     if w is None:
         w = data.shape[1]
     if h is None:
         h = data.shape[0]
-    return OpenCVImageFormat(cv2.warpPerspective(assert_opencvdata(img), M, (w, h)))
+    return OpenCVImageFormat(
+        warp(
+            data,
+            M,
+            (w, h),
+            perspective=True,
+            interpolation=Interpolations.v(interpolation),
+            mode=mode,
+            max_workers=max_workers,
+        )
+    )
 
 
 class FreeRotationCropMode(fn.DataEnum):
@@ -154,6 +484,31 @@ class FreeRotationCropMode(fn.DataEnum):
     NONE = 2
 
 
+def rotation_matrix(
+    w: int, h: int, angle: float, mode: FreeRotationCropMode
+) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """
+    Returns the affine matrix and the output size (w, h) of a rotation of a w x h
+    image by angle (degrees) around its center, with the output bounds of the crop
+    mode computed analytically.
+    """
+    mode = FreeRotationCropMode.interfere(mode)
+    cx, cy = w / 2, h / 2
+    M = cv2.getRotationMatrix2D((cx, cy), angle, 1)
+    if mode == FreeRotationCropMode.NONE:
+        return M, (w, h)
+    if mode == FreeRotationCropMode.KEEP:
+        # the bounding box of the rotated image
+        cos_a, sin_a = abs(M[0, 0]), abs(M[0, 1])
+        nw, nh = w * cos_a + h * sin_a, w * sin_a + h * cos_a
+    else:
+        # the largest axis-aligned rectangle within the rotated image
+        nw, nh = rotatedRectWithMaxArea(w, h, math.radians(angle))
+    M[0, 2] += (nw / 2) - cx
+    M[1, 2] += (nh / 2) - cy
+    return M, (int(nw), int(nh))
+
+
 @fn.NodeDecorator(
     node_id="cv2.freeRotation",
     outputs=[
@@ -163,12 +518,18 @@ class FreeRotationCropMode(fn.DataEnum):
         {"name": "M", "description": "The transformation matrix."},
     ],
     default_render_options={"data": {"src": "out"}},
-    default_io_options={"angle": {"value_options": {"min": 0.0, "max": 360.0}}},
+    default_io_options={
+        "angle": {"value_options": {"min": 0.0, "max": 360.0}},
+        "max_workers": {"value_options": {"min": 1}},
+    },
 )
 def freeRotation(
     img: ImageFormat,
     angle: float = 0,
     mode: FreeRotationCropMode = FreeRotationCropMode.KEEP,
+    roi: Optional[Tuple[int, int, int, int]] = None,
+    warp_mode: WarpModes = WarpModes.DIRECT,
+    max_workers: Optional[int] = None,
 ) -> Tuple[OpenCVImageFormat, np.ndarray]:
     """
     Rotates the image by the given angle.
@@ -176,57 +537,32 @@ def freeRotation(
         img: ImageFormat: The image to rotate.
         angle: float: The angle to rotate the image by.
         mode: FreeRotationCropMode: The mode of cropping for the rotation.
+        roi: Tuple[int, int, int, int]: Only computes this region (x, y, w, h) of the
+            rotated image, e.g. for a rotate-then-crop step.
+        warp_mode: WarpModes: CACHED keeps the remap tables per angle and size for
+            repeated rotations.
+        max_workers: int: The number of threads of the CACHED mode.
     Returns:
         funcnodes_opencv.OpenCVImageFormat: The rotated image.
+        np.ndarray: The matrix mapping the image to the returned (region of the)
+            rotated image.
     """
 
     img = assert_opencvdata(img)
-
-    cx = img.shape[1] / 2
-    cy = img.shape[0] / 2
-
-    mode = FreeRotationCropMode.interfere(mode)
-    M = cv2.getRotationMatrix2D((cx, cy), angle, 1)
-    corners = np.array(
-        [
-            [0, 0],  # Top-left
-            [img.shape[1], 0],  # Top-right
-            [0, img.shape[0]],  # Bottom-left
-            [img.shape[1], img.shape[0]],  # Bottom-right
-        ],
-        dtype=np.float32,
-    )
-    if mode == FreeRotationCropMode.NONE:
-        # rotate the image by angle and keep the size of the image
-        rotated = cv2.warpAffine(img, M, (img.shape[1], img.shape[0]))
-    elif mode == FreeRotationCropMode.KEEP:
-        # rotate the image by angle and fill the empty space with black
-        # calculate the new size of the image to fit the rotated image
-        transformed_corners = cv2.transform(np.array([corners]), M)[0]
-        min_x = min(transformed_corners[:, 0])
-        max_x = max(transformed_corners[:, 0])
-        min_y = min(transformed_corners[:, 1])
-        max_y = max(transformed_corners[:, 1])
-
-        w, h = int(max_x - min_x), int(max_y - min_y)
-
-        # Adjust the rotation matrix to account for translation
-        M[0, 2] += (w / 2) - cx
-        M[1, 2] += (h / 2) - cy
-
-        rotated = cv2.warpAffine(img, M, (w, h))
-    elif mode == FreeRotationCropMode.CROP:
-        # rotate the image by angle and crop the empty space
-        transformed_corners = cv2.transform(np.array([corners]), M)[0]
-
-        w, h = rotatedRectWithMaxArea(img.shape[1], img.shape[0], math.radians(angle))
-
-        # Adjust the rotation matrix to account for translation
-        M[0, 2] += (w / 2) - cx
-        M[1, 2] += (h / 2) - cy
-
-        rotated = cv2.warpAffine(img, M, (int(w), int(h)))
-
+    M, dsize = rotation_matrix(img.shape[1], img.shape[0], angle, mode)
+    if roi is not None:
+        x, y, w, h = (int(v) for v in roi)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, dsize[0]), min(y + h, dsize[1])
+        if x1 <= x0 or y1 <= y0:
+            raise ValueError(
+                f"The region {roi} is outside of the {dsize[0]}x{dsize[1]} output"
+            )
+        M[0, 2] -= x0
+        M[1, 2] -= y0
+        dsize = (x1 - x0, y1 - y0)
+
+    rotated = warp(img, M, dsize, mode=warp_mode, max_workers=max_workers)
     return OpenCVImageFormat(rotated), M
 
 
@@ -250,17 +586,174 @@ def pyrUp(
     return OpenCVImageFormat(cv2.pyrUp(assert_opencvdata(img)))
 
 
+def _allocate_levels(shapes: List[Tuple[int, ...]]) -> List[np.ndarray]:
+    # one allocation for all levels, carved into contiguous per-level views
+    sizes = [int(np.prod(shape)) for shape in shapes]
+    buffer = np.empty(sum(sizes), dtype=np.float32)
+    offsets = np.cumsum([0] + sizes)
+    return [
+        buffer[a:b].reshape(shape)
+        for a, b, shape in zip(offsets[:-1], offsets[1:], shapes)
+    ]
+
+
+def _readonly(arr: np.ndarray) -> np.ndarray:
+    arr.setflags(write=False)
+    return arr
+
+
+class ImagePyramid:
+    """
+    Gaussian and Laplacian pyramid of an image. Level 0 is the image itself, level i
+    has about 1 / 2^i of its size. Levels are built on demand into preallocated
+    buffers and kept, so all nodes working on the same image share one pyramid
+    (see ImagePyramid.of). The levels are read-only arrays of shape (h, w, c).
+    """
+
+    def __init__(self, data: np.ndarray):
+        base = data.view()
+        base.setflags(write=False)
+        self._gaussian: List[np.ndarray] = [base]
+        self._laplacian: List[np.ndarray] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def of(cls, img: ImageFormat, levels: int = 0) -> "ImagePyramid":
+        """Returns the pyramid of an image (cached on it) with at least `levels` levels."""
+        pyramid = assert_opencvimg(img).derived("pyramid", cls)
+        pyramid.gaussian(levels)
+        return pyramid
+
+    @property
+    def levels(self) -> int:
+        """The number of built downsampling levels."""
+        return len(self._gaussian) - 1
+
+    def gaussian(self, levels: int) -> List[np.ndarray]:
+        """Returns the Gaussian levels 0 to `levels`."""
+        with self._lock:
+            missing = levels - self.levels
+            if missing > 0:
+                shapes = []
+                h, w, c = self._gaussian[-1].shape
+                for _ in range(missing):
+                    h, w = (h + 1) // 2, (w + 1) // 2
+                    shapes.append((h, w, c))
+                for dst in _allocate_levels(shapes):
+                    cv2.pyrDown(
+                        self._gaussian[-1],
+                        dst=dst,
+                        dstsize=(dst.shape[1], dst.shape[0]),
+                    )
+                    self._gaussian.append(_readonly(dst))
+            return self._gaussian[: levels + 1]
+
+    def laplacian(self, levels: int) -> List[np.ndarray]:
+        """
+        Returns the Laplacian levels 0 to `levels`, level i being the difference of the
+        Gaussian level i and the upsampled level i + 1, the last level is the Gaussian
+        level itself, so the image can be reconstructed with collapse.
+        """
+        gaussian = self.gaussian(levels)
+        with self._lock:
+            if len(self._laplacian) != levels + 1:
+                bands = _allocate_levels([g.shape for g in gaussian])
+                for i in range(levels):
+                    up = cv2.pyrUp(
+                        gaussian[i + 1],
+                        dstsize=(gaussian[i].shape[1], gaussian[i].shape[0]),
+                    )
+                    np.subtract(
+                        gaussian[i], up.reshape(gaussian[i].shape), out=bands[i]
+                    )
+                bands[levels][...] = gaussian[levels]
+                self._laplacian = [_readonly(b) for b in bands]
+            return list(self._laplacian)
+
+    @staticmethod
+    def collapse(laplacian: List[np.ndarray]) -> np.ndarray:
+        """Reconstructs an image from (e.g. blended) Laplacian levels."""
+        res = laplacian[-1]
+        for band in reversed(laplacian[:-1]):
+            up = cv2.pyrUp(res, dstsize=(band.shape[1], band.shape[0]))
+            res = band + up.reshape(band.shape)
+        return res
+
+
+class PyramidTypes(fn.DataEnum):
+    """
+    Pyramid types.
+
+    Attributes:
+        GAUSSIAN: successively blurred and downsampled images
+        LAPLACIAN: band-pass differences of the Gaussian levels
+    """
+
+    GAUSSIAN = "gaussian"
+    LAPLACIAN = "laplacian"
+
+
+@fn.NodeDecorator(
+    node_id="cv2.pyramid",
+    name="Pyramid",
+    outputs=[
+        {"name": "pyramid", "description": "The pyramid, cached on the image."},
+        {"name": "out", "description": "The levels as arrays of shape (h, w, c)."},
+    ],
+    default_io_options={
+        "levels": {"value_options": {"min": 0}},
+    },
+    description="Builds a Gaussian or Laplacian pyramid in one call.",
+)
+def pyramid(
+    img: ImageFormat,
+    levels: int = 4,
+    kind: PyramidTypes = PyramidTypes.GAUSSIAN,
+) -> Tuple[ImagePyramid, List[np.ndarray]]:
+    """
+    Builds `levels` downsampling levels of a Gaussian or Laplacian pyramid at once.
+    The pyramid is cached on the image, so other nodes working on the same image
+    (and later calls with more levels) reuse the levels already built.
+
+    Args:
+        img: ImageFormat: The image.
+        levels: int: The number of downsampling levels.
+        kind: PyramidTypes: The pyramid type of the returned levels.
+    Returns:
+        ImagePyramid: The pyramid.
+        List[np.ndarray]: The levels 0 to `levels`.
+    """
+    pyr = ImagePyramid.of(img, levels)
+    if PyramidTypes.v(kind) == PyramidTypes.LAPLACIAN.value:
+        return pyr, pyr.laplacian(levels)
+    return pyr, pyr.gaussian(levels)
+
+
+@fn.NodeDecorator(
+    node_id="cv2.pyramid_level",
+    name="Pyramid Level",
+    default_render_options={"data": {"src": "out"}},
+    description="Returns a Gaussian level of a pyramid as image.",
+)
+def pyramid_level(pyramid: ImagePyramid, level: int = 1) -> OpenCVImageFormat:
+    return OpenCVImageFormat(pyramid.gaussian(max(level, 0))[max(level, 0)].copy())
+
+
 NODE_SHELF = fn.Shelf(
     name="Geometric Transformations",
     nodes=[
         flip,
         rotate,
+        crop,
         resize,
+        resize_multi,
         warpAffine,
         perpectiveTransform,
         freeRotation,
         pyrDown,
         pyrUp,
+        pyramid,
+        pyramid_level,
     ],
     description="Nodes for geometric transformations on images.",
 )
@@ -0,0 +1,148 @@
+from functools import lru_cache
+from typing import Optional, Union
+import cv2
+import numpy as np
+import funcnodes as fn
+
+
+class KernelTypes(fn.DataEnum):
+    """
+    Kernel types.
+
+    Attributes:
+        RECT: cv2.MORPH_RECT: rectangular structuring element
+        ELLIPSE: cv2.MORPH_ELLIPSE: elliptic structuring element
+        CROSS: cv2.MORPH_CROSS: cross-shaped structuring element
+        BOX: normalized box kernel
+        GAUSSIAN: Gaussian kernel, sigma <= 0 derives sigma from the size
+        DERIV_X: Sobel derivative kernel in x direction (square, size odd and <= 31)
+        DERIV_Y: Sobel derivative kernel in y direction (square, size odd and <= 31)
+    """
+
+    RECT = "rect"
+    ELLIPSE = "ellipse"
+    CROSS = "cross"
+    BOX = "box"
+    GAUSSIAN = "gaussian"
+    DERIV_X = "deriv_x"
+    DERIV_Y = "deriv_y"
+
+
+_STRUCTURING_ELEMENTS = {
+    KernelTypes.RECT.value: cv2.MORPH_RECT,
+    KernelTypes.ELLIPSE.value: cv2.MORPH_ELLIPSE,
+    KernelTypes.CROSS.value: cv2.MORPH_CROSS,
+}
+
+
+def get_kernel(
+    kernel_type: str, kw: int, kh: Optional[int] = None, sigma: float = 0
+) -> np.ndarray:
+    """
+    Returns the kernel of the given type and size, memoized.
+    The returned array is shared and therefore read-only.
+    """
+    kw = int(kw)
+    kh = kw if kh is None or kh <= 0 else int(kh)
+    if kw <= 0:
+        raise ValueError(f"Invalid kernel size {kw}x{kh}")
+    return _cached_kernel(KernelTypes.v(kernel_type), kw, kh, float(sigma))
+
+
+@lru_cache(maxsize=256)
+def _cached_kernel(kernel_type: str, kw: int, kh: int, sigma: float) -> np.ndarray:
+    if kernel_type in _STRUCTURING_ELEMENTS:
+        kernel = cv2.getStructuringElement(_STRUCTURING_ELEMENTS[kernel_type], (kw, kh))
+    elif kernel_type == KernelTypes.BOX.value:
+        kernel = np.full((kh, kw), 1.0 / (kw * kh), dtype=np.float32)
+    elif kernel_type == KernelTypes.GAUSSIAN.value:
+        kernel = (
+            cv2.getGaussianKernel(kh, sigma, cv2.CV_32F)
+            @ cv2.getGaussianKernel(kw, sigma, cv2.CV_32F).T
+        )
+    elif kernel_type in (KernelTypes.DERIV_X.value, KernelTypes.DERIV_Y.value):
+        if kh != kw:
+            raise ValueError(f"Derivative kernels must be square, got {kw}x{kh}")
+        dx, dy = (1, 0) if kernel_type == KernelTypes.DERIV_X.value else (0, 1)
+        kx, ky = cv2.getDerivKernels(dx, dy, kw, normalize=True, ktype=cv2.CV_32F)
+        kernel = ky @ kx.T
+    else:
+        raise ValueError(f"Unknown kernel type {kernel_type}")
+
+    kernel.setflags(write=False)
+    return kernel
+
+
+def parse_kernel_spec(spec: str) -> np.ndarray:
+    """
+    Returns the (cached) kernel for a spec of the form "<type>:<w>[x<h>][:<sigma>]",
+    e.g. "ellipse:7", "rect:15x3" or "gaussian:9:2.0".
+    """
+    parts = spec.strip().lower().split(":")
+    try:
+        size = parts[1].split("x")
+        kw = int(size[0])
+        kh = int(size[1]) if len(size) > 1 else kw
+        sigma = float(parts[2]) if len(parts) > 2 else 0
+        if len(parts) > 3:
+            raise ValueError()
+    except (IndexError, ValueError):
+        raise ValueError(
+            f"Invalid kernel spec '{spec}', expected '<type>:<w>[x<h>][:<sigma>]'"
+        )
+    return get_kernel(parts[0], kw, kh, sigma)
+
+
+def resolve_kernel(
+    kernel: Union[None, int, str, np.ndarray],
+    default_type: KernelTypes = KernelTypes.RECT,
+) -> Optional[np.ndarray]:
+    """
+    Resolves the kernel inputs of the filter and morphology nodes: None is kept,
+    an integer k is a cached k x k kernel of the default type, strings are kernel specs
+    (see parse_kernel_spec) and arrays are used as they are.
+    """
+    if kernel is None:
+        return None
+    if isinstance(kernel, str):
+        return parse_kernel_spec(kernel)
+    if isinstance(kernel, (int, float, np.integer, np.floating)):
+        return get_kernel(KernelTypes.v(default_type), int(kernel), int(kernel))
+    return np.asarray(kernel)
+
+
+@fn.NodeDecorator(
+    node_id="cv2.kernel",
+    name="Kernel",
+    description="Creates a (cached) structuring element or filter kernel.",
+    default_io_options={
+        "kw": {"value_options": {"min": 1}},
+    },
+)
+def kernel(
+    kernel_type: KernelTypes = KernelTypes.RECT,
+    kw: int = 5,
+    kh: Optional[int] = None,
+    sigma: float = 0,
+) -> np.ndarray:
+    """
+    Creates a structuring element or filter kernel. Kernels are memoized by type,
+    size and sigma, so they are not rebuilt on every call.
+
+    Args:
+        kernel_type: KernelTypes: The type of the kernel.
+        kw: int: The width of the kernel.
+        kh: int: The height of the kernel, defaults to the width.
+        sigma: float: The sigma of Gaussian kernels.
+    Returns:
+        np.ndarray: The kernel.
+    """
+    return get_kernel(KernelTypes.v(kernel_type), kw, kh, sigma)
+
+
+NODE_SHELF = fn.Shelf(
+    nodes=[kernel],
+    subshelves=[],
+    name="Kernels",
+    description="Structuring elements and filter kernels.",
+)
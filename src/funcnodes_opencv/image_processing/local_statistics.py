@@ -0,0 +1,176 @@
+from typing import Literal, Optional, Tuple
+import cv2
+import numpy as np
+import funcnodes as fn
+from ..imageformat import OpenCVImageFormat, ImageFormat, _assert_image_channels
+from ..utils import assert_opencvimg, LRUCache
+
+
+def _integral_images(data: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    sums, sqsums = cv2.integral2(data, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+    shape = (data.shape[0] + 1, data.shape[1] + 1, -1)
+    return sums.reshape(shape), sqsums.reshape(shape)
+
+
+def integral_images(img: ImageFormat) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the (float64) integral and squared integral images of shape
+    (h + 1, w + 1, c), computed once per image.
+    """
+    return assert_opencvimg(img).derived("integral2", _integral_images)
+
+
+class LocalStatistics:
+    """
+    Windowed count, sum, mean, variance and standard deviation of an image for any
+    window size in O(1) per pixel, read from its integral images.
+    Windows are centered like the OpenCV filters and clipped at the image borders,
+    so only pixels inside the image are counted.
+    """
+
+    def __init__(self, sums: np.ndarray, sqsums: np.ndarray):
+        self.sums = sums
+        self.sqsums = sqsums
+        self.shape = (sums.shape[0] - 1, sums.shape[1] - 1, sums.shape[2])
+        self._windows = LRUCache(maxsize=4)
+
+    @classmethod
+    def of(
+        cls, img: ImageFormat, channel: Literal[1, 3, None] = None
+    ) -> "LocalStatistics":
+        """
+        Returns the statistics of an image, created once per image. With channel=1
+        they are the statistics of the grayscale image.
+        """
+        img = assert_opencvimg(img)
+        if channel is None:
+            return img.derived("local_statistics", lambda _: cls(*integral_images(img)))
+        return img.derived(
+            ("local_statistics", channel),
+            lambda data: cls(*_integral_images(_assert_image_channels(data, channel))),
+        )
+
+    @staticmethod
+    def _bounds(n: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        start = np.arange(n) - k // 2
+        return np.clip(start, 0, n), np.clip(start + k, 0, n)
+
+    def window(
+        self, kw: int, kh: Optional[int] = None, rows: Optional[slice] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The float64 count (h, w, 1), sums and squared sums (h, w, c) of the windows,
+        of all rows or only of the band rows (e.g. a tile processed on a thread).
+        The full image result is cached for the last few window sizes.
+        """
+        kw = max(int(kw), 1)
+        kh = kw if kh is None or kh <= 0 else int(kh)
+        if rows is None:
+            return self._windows.get((kw, kh), lambda: self._box(kw, kh, slice(None)))
+        return self._box(kw, kh, rows)
+
+    def _box(self, kw: int, kh: int, rows: slice) -> Tuple[np.ndarray, ...]:
+        y0, y1 = self._bounds(self.shape[0], kh)
+        y0, y1 = y0[rows], y1[rows]
+        x0, x1 = self._bounds(self.shape[1], kw)
+
+        def _sum(table):
+            band = table[y1] - table[y0]
+            return band[:, x1] - band[:, x0]
+
+        count = ((y1 - y0)[:, None] * (x1 - x0)[None, :])[..., None]
+        return count.astype(np.float64), _sum(self.sums), _sum(self.sqsums)
+
+    def count(self, kw: int, kh: Optional[int] = None) -> np.ndarray:
+        """Number of pixels in each window, shape (h, w, 1)."""
+        return self.window(kw, kh)[0]
+
+    def sum(self, kw: int, kh: Optional[int] = None) -> np.ndarray:
+        """Windowed sums, shape (h, w, c)."""
+        return self.window(kw, kh)[1]
+
+    def mean(self, kw: int, kh: Optional[int] = None) -> np.ndarray:
+        """Windowed means, shape (h, w, c)."""
+        count, sums, _ = self.window(kw, kh)
+        return (sums / count).astype(np.float32)
+
+    def variance(self, kw: int, kh: Optional[int] = None) -> np.ndarray:
+        """Windowed (population) variances, shape (h, w, c)."""
+        count, sums, sqsums = self.window(kw, kh)
+        mean = sums / count
+        return np.maximum(sqsums / count - mean * mean, 0).astype(np.float32)
+
+    def std(self, kw: int, kh: Optional[int] = None) -> np.ndarray:
+        """Windowed standard deviations, shape (h, w, c)."""
+        return np.sqrt(self.variance(kw, kh))
+
+
+@fn.NodeDecorator(
+    node_id="cv2.integral",
+    name="Integral",
+    outputs=[{"name": "sum"}, {"name": "sqsum"}],
+    description="Calculates the integral and squared integral images.",
+)
+def integral(img: ImageFormat) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculates the integral images with cv2.integral2. They are cached per image, so
+    nodes that need windowed sums of the same image share them.
+
+    Args:
+        img: ImageFormat: The image.
+    Returns:
+        np.ndarray: The integral image of shape (h + 1, w + 1, c).
+        np.ndarray: The squared integral image of shape (h + 1, w + 1, c).
+    """
+    return integral_images(img)
+
+
+@fn.NodeDecorator(
+    node_id="cv2.local_statistics",
+    name="Local Statistics",
+    outputs=[
+        {"name": "mean"},
+        {"name": "std"},
+        {"name": "variance"},
+        {"name": "count"},
+    ],
+    default_io_options={
+        "kw": {"value_options": {"min": 1}},
+    },
+    default_render_options={"data": {"src": "mean"}},
+    description="Calculates windowed mean, standard deviation, variance and count.",
+)
+def local_statistics(
+    img: ImageFormat,
+    kw: int = 15,
+    kh: int = 0,
+) -> Tuple[OpenCVImageFormat, OpenCVImageFormat, np.ndarray, np.ndarray]:
+    """
+    Calculates the windowed statistics of an image in O(1) per pixel from its
+    (cached) integral images. Windows are clipped at the image borders.
+
+    Args:
+        img: ImageFormat: The image.
+        kw: int: The window width.
+        kh: int: The window height, defaults to the width.
+    Returns:
+        OpenCVImageFormat: The windowed means.
+        OpenCVImageFormat: The windowed standard deviations.
+        np.ndarray: The windowed variances.
+        np.ndarray: The number of pixels in each window.
+    """
+    stats = LocalStatistics.of(img)
+    return (
+        OpenCVImageFormat(np.clip(stats.mean(kw, kh), 0, 1)),
+        OpenCVImageFormat(np.clip(stats.std(kw, kh), 0, 1)),
+        stats.variance(kw, kh),
+        stats.count(kw, kh)[..., 0].astype(np.int32),
+    )
+
+
+NODE_SHELF = fn.Shelf(
+    nodes=[integral, local_statistics],
+    subshelves=[],
+    name="Local Statistics",
+    description="Integral images and windowed statistics.",
+)
@@ -1,9 +1,146 @@
-from typing import Optional, Union
+from typing import Optional, Tuple, Union
 import cv2
 import numpy as np
 import funcnodes as fn
 from ..imageformat import OpenCVImageFormat, ImageFormat
-from ..utils import assert_opencvdata
+from ..utils import RoiWindow
+from .kernels import resolve_kernel
+
+
+def _kernel_radius(kernel: Optional[np.ndarray]) -> int:
+    # cv2 uses a 3x3 rectangle for an empty kernel
+    return 1 if kernel is None else max(kernel.shape) // 2
+
+
+# below this window length cv2's own (separable for rectangles) passes are faster
+_VHGW_MIN_SIZE = 256
+
+
+def rect_offsets(
+    kernel: Optional[np.ndarray], iterations: int = 1
+) -> Optional[Tuple[int, int, int, int]]:
+    """
+    The window (x0, x1, y0, y1), relative to the pixel, of a structuring element
+    applied iterations times, if it is a filled rectangle (including lines along
+    the axes, anywhere in the kernel), else None.
+    """
+    if kernel is None:
+        x0, x1, y0, y1 = -1, 1, -1, 1
+    else:
+        kernel = np.asarray(kernel)
+        if kernel.ndim != 2:
+            return None
+        ys, xs = np.nonzero(kernel)
+        if len(ys) == 0:
+            return None
+        if not kernel[ys.min() : ys.max() + 1, xs.min() : xs.max() + 1].all():
+            return None
+        cy, cx = kernel.shape[0] // 2, kernel.shape[1] // 2
+        x0, x1, y0, y1 = xs.min() - cx, xs.max() - cx, ys.min() - cy, ys.max() - cy
+    n = max(int(iterations), 1)
+    return int(x0) * n, int(x1) * n, int(y0) * n, int(y1) * n
+
+
+def _running_extreme(
+    data: np.ndarray, lo: int, hi: int, axis: int, dilate: bool
+) -> np.ndarray:
+    # van Herk/Gil-Werman: the max (min) over [x + lo, x + hi] along axis is the
+    # max of a suffix and a prefix of blocks of the window length, 3 ops per pixel
+    op = np.maximum if dilate else np.minimum
+    # cv2's default border value, saturated to the data type
+    info = (
+        np.finfo(data.dtype)
+        if np.issubdtype(data.dtype, np.floating)
+        else np.iinfo(data.dtype)
+    )
+    fill = info.min if dilate else info.max
+    k = hi - lo + 1
+    n = data.shape[axis]
+    front = max(-lo, 0)
+    blocks = -(-(front + n + max(hi, 0)) // k)
+    shape = list(data.shape)
+    shape[axis] = blocks * k
+    padded = np.full(shape, fill, dtype=data.dtype)
+    padded[(slice(None),) * axis + (slice(front, front + n),)] = data
+    split = padded.reshape(shape[:axis] + [blocks, k] + shape[axis + 1 :])
+    reverse = (slice(None),) * (axis + 1) + (slice(None, None, -1),)
+    prefix = op.accumulate(split, axis=axis + 1).reshape(shape)
+    suffix = op.accumulate(split[reverse], axis=axis + 1)[reverse].reshape(shape)
+    start = front + lo
+    return op(
+        suffix[(slice(None),) * axis + (slice(start, start + n),)],
+        prefix[(slice(None),) * axis + (slice(start + k - 1, start + k - 1 + n),)],
+    )
+
+
+def rect_morphology(
+    data: np.ndarray, offsets: Tuple[int, int, int, int], dilate: bool
+) -> np.ndarray:
+    """
+    Dilates (erodes) the float data (h, w, c) with the rectangle window
+    (x0, x1, y0, y1) as two 1D passes. Long passes use the van Herk/Gil-Werman
+    running max (min), whose cost per pixel does not depend on the length.
+    Pixels outside the image are ignored, like the cv2 default border.
+    """
+    x0, x1, y0, y1 = offsets
+    for axis, lo, hi in ((1, x0, x1), (0, y0, y1)):
+        if lo == hi == 0:
+            continue
+        k = hi - lo + 1
+        if k >= _VHGW_MIN_SIZE or not lo <= 0 <= hi:
+            data = _running_extreme(data, lo, hi, axis, dilate)
+            continue
+        kernel = np.ones((1, k) if axis == 1 else (k, 1), dtype=np.uint8)
+        anchor = (-lo, 0) if axis == 1 else (0, -lo)
+        func = cv2.dilate if dilate else cv2.erode
+        data = func(data, kernel, anchor=anchor).reshape(data.shape)
+    return data
+
+
+def apply_morphology(
+    data: np.ndarray,
+    op: int,
+    kernel: Optional[np.ndarray] = None,
+    iterations: int = 1,
+) -> np.ndarray:
+    """
+    cv2.morphologyEx (op is a cv2.MORPH_* flag) on float data (h, w, c), running
+    large rectangle and line structuring elements with rect_morphology, in O(1) per
+    pixel for any size. The iterations of a rectangle are merged into one larger
+    rectangle.
+    """
+    offsets = None if op == cv2.MORPH_HITMISS else rect_offsets(kernel, iterations)
+    if (
+        offsets is None
+        or max(offsets[1] - offsets[0], offsets[3] - offsets[2]) + 1 < _VHGW_MIN_SIZE
+    ):
+        return cv2.morphologyEx(data, op=op, kernel=kernel, iterations=iterations)
+
+    def _dilate(x):
+        return rect_morphology(x, offsets, True)
+
+    def _erode(x):
+        return rect_morphology(x, offsets, False)
+
+    def _subtract(a, b):
+        # saturating like cv2.morphologyEx for integer data
+        return cv2.subtract(a, b).reshape(data.shape)
+
+    if op == cv2.MORPH_DILATE:
+        return _dilate(data)
+    if op == cv2.MORPH_ERODE:
+        return _erode(data)
+    if op == cv2.MORPH_OPEN:
+        return _dilate(_erode(data))
+    if op == cv2.MORPH_CLOSE:
+        return _erode(_dilate(data))
+    if op == cv2.MORPH_GRADIENT:
+        return _subtract(_dilate(data), _erode(data))
+    if op == cv2.MORPH_TOPHAT:
+        return _subtract(data, _dilate(_erode(data)))
+    if op == cv2.MORPH_BLACKHAT:
+        return _subtract(_erode(_dilate(data)), data)
+    raise ValueError(f"Unknown morphological operation {op}")
 
 
 @fn.NodeDecorator(
@@ -13,11 +150,14 @@ from ..utils import assert_opencvdata
 )
 def dilate(
     img: ImageFormat,
-    kernel: Optional[np.ndarray] = None,
+    kernel: Optional[Union[int, str, np.ndarray]] = None,
     iterations: int = 1,
+    roi: Optional[Tuple[int, int, int, int]] = None,
 ) -> OpenCVImageFormat:
+    kernel = resolve_kernel(kernel)
+    window = RoiWindow(img, roi, _kernel_radius(kernel) * iterations)
     return OpenCVImageFormat(
-        cv2.dilate(assert_opencvdata(img), kernel=kernel, iterations=iterations)
+        window.crop(apply_morphology(window.data, cv2.MORPH_DILATE, kernel, iterations))
     )
 
 
@@ -28,11 +168,14 @@ def dilate(
 )
 def erode(
     img: ImageFormat,
-    kernel: Optional[np.ndarray] = None,
+    kernel: Optional[Union[int, str, np.ndarray]] = None,
     iterations: int = 1,
+    roi: Optional[Tuple[int, int, int, int]] = None,
 ) -> OpenCVImageFormat:
+    kernel = resolve_kernel(kernel)
+    window = RoiWindow(img, roi, _kernel_radius(kernel) * iterations)
     return OpenCVImageFormat(
-        cv2.erode(assert_opencvdata(img), kernel=kernel, iterations=iterations)
+        window.crop(apply_morphology(window.data, cv2.MORPH_ERODE, kernel, iterations))
     )
 
 
@@ -70,26 +213,25 @@ class MorphologicalOperations(fn.DataEnum):
 def morphologyEx(
     img: ImageFormat,
     op: MorphologicalOperations = MorphologicalOperations.ERODE,
-    kernel: Optional[Union[int, np.ndarray]] = None,
+    kernel: Optional[Union[int, str, np.ndarray]] = None,
     iterations: int = 1,
+    roi: Optional[Tuple[int, int, int, int]] = None,
 ) -> OpenCVImageFormat:
     op = MorphologicalOperations.v(op)
 
-    if kernel is not None and isinstance(kernel, (int, float)):
-        kernel = np.ones((int(kernel), int(kernel)), np.uint8)
+    kernel = resolve_kernel(kernel)
+    # compound operations chain an erosion and a dilation
+    margin = 2 * _kernel_radius(kernel) * iterations
     if op == cv2.MORPH_HITMISS:
-        data = (assert_opencvdata(img, channel=1) * 255).astype(np.uint8)
+        window = RoiWindow(img, roi, margin, channel=1)
+        data = (window.data * 255).astype(np.uint8)
     else:
-        data = assert_opencvdata(img)
+        window = RoiWindow(img, roi, margin)
+        data = window.data
 
-    res = cv2.morphologyEx(
-        data,
-        op=op,
-        kernel=kernel,
-        iterations=iterations,
-    )
+    res = apply_morphology(data, op, kernel, iterations)
 
-    return OpenCVImageFormat(res)
+    return OpenCVImageFormat(window.crop(res))
 
 
 NODE_SHELF = fn.Shelf(
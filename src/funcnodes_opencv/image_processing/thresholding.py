@@ -1,9 +1,15 @@
-from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import os
+from typing import List, Optional, Tuple, Union
 import cv2
 import numpy as np
 import funcnodes as fn
-from ..imageformat import OpenCVImageFormat, ImageFormat
+from ..imageformat import OpenCVImageFormat, ImageFormat, conv_colorspace
 from ..utils import assert_opencvdata
+from ..colornodes import ColorCodes
+from ..image_operations.normalization_equalization import image_histogram
+from .local_statistics import LocalStatistics
 
 
 class ThresholdTypes(fn.DataEnum):
@@ -50,21 +56,187 @@ def threshold(
 
 class AutoThresholdTypes(fn.DataEnum):
     """
-    OTSU = cv2.THRESH_OTSU : Otsu's thresholding
-    TRIANGLE = cv2.THRESH_TRIANGLE: Triangle thresholding
+    Automatic threshold methods, all selecting the threshold from the histogram.
+
+    Attributes:
+        OTSU: Otsu's method, maximizes the between-class variance
+        TRIANGLE: Triangle method, for histograms with one dominant peak
+        LI: Li's iterative minimum cross entropy method
+        YEN: Yen's maximum correlation criterion
+    """
+
+    OTSU = "otsu"
+    TRIANGLE = "triangle"
+    LI = "li"
+    YEN = "yen"
+
+
+def _as_histogram(hist: np.ndarray) -> np.ndarray:
+    hist = np.asarray(hist, dtype=np.float64)
+    hist = hist.reshape(len(hist), -1)
+    if hist.shape[1] != 1:
+        raise ValueError("The threshold needs a single channel histogram")
+    if len(hist) < 2:
+        raise ValueError(f"A histogram needs at least 2 bins, got {len(hist)}")
+    if hist.sum() <= 0:
+        raise ValueError("The histogram is empty")
+    return hist[:, 0]
+
+
+def _bin_threshold(index: int, bins: int) -> float:
+    # the upper edge of the bin, so x > thresh separates bins <= index from the rest
+    return (index + 0.5) / (bins - 1)
+
+
+def _otsu(hist: np.ndarray) -> float:
+    bins = len(hist)
+    p = hist / hist.sum()
+    omega = np.cumsum(p)
+    mu = np.cumsum(p * np.arange(bins))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma_b = (mu[-1] * omega - mu) ** 2 / (omega * (1 - omega))
+    sigma_b[~np.isfinite(sigma_b)] = -1
+    return _bin_threshold(int(np.argmax(sigma_b[:-1])), bins)
+
+
+def _triangle(hist: np.ndarray) -> float:
+    # the histogram version of cv2.THRESH_TRIANGLE
+    bins = len(hist)
+    nonzero = np.flatnonzero(hist)
+    left, right = max(nonzero[0] - 1, 0), min(nonzero[-1] + 1, bins - 1)
+    peak = int(np.argmax(hist))
+    flip = peak - left < right - peak
+    if flip:
+        hist = hist[::-1]
+        left, peak = bins - 1 - right, bins - 1 - peak
+    thresh = left
+    if peak > left:
+        i = np.arange(left + 1, peak + 1)
+        # distance of (i, hist[i]) to the line from (left, 0) to the peak
+        dist = hist[peak] * i + (left - peak) * hist[i]
+        best = int(np.argmax(dist))
+        if dist[best] > 0:
+            thresh = int(i[best])
+    thresh -= 1
+    if flip:
+        thresh = bins - 1 - thresh
+    return _bin_threshold(min(max(thresh, 0), bins - 1), bins)
+
+
+def _li(hist: np.ndarray) -> float:
+    bins = len(hist)
+    nonzero = np.flatnonzero(hist)
+    if len(nonzero) == 1:
+        return _bin_threshold(int(nonzero[0]), bins)
+    # shift the values to start at 0, the cross entropy needs positive means
+    x = (np.arange(bins) - nonzero[0]) / (bins - 1)
+    counts = np.cumsum(hist)
+    sums = np.cumsum(hist * x)
+    tolerance = 0.5 / (bins - 1)
+    t_next, t_curr = sums[-1] / counts[-1], -1.0
+    for _ in range(1000):
+        if abs(t_next - t_curr) <= tolerance:
+            break
+        t_curr = t_next
+        # the last bin at or below t_curr
+        k = min(int(np.floor(t_curr * (bins - 1))) + nonzero[0], bins - 2)
+        mean_back = sums[k] / counts[k] if counts[k] > 0 else 0
+        mean_fore = (sums[-1] - sums[k]) / (counts[-1] - counts[k])
+        if mean_back <= 0:
+            break
+        t_next = (mean_back - mean_fore) / (np.log(mean_back) - np.log(mean_fore))
+    return float(t_next + nonzero[0] / (bins - 1))
+
+
+def _yen(hist: np.ndarray) -> float:
+    p = hist / hist.sum()
+    p1 = np.cumsum(p)
+    p1_sq = np.cumsum(p**2)
+    p2_sq = np.cumsum(p[::-1] ** 2)[::-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crit = np.log((p1[:-1] * (1 - p1[:-1])) ** 2 / (p1_sq[:-1] * p2_sq[1:]))
+    crit[~np.isfinite(crit)] = -np.inf
+    return _bin_threshold(int(np.argmax(crit)), len(hist))
+
+
+_HISTOGRAM_THRESHOLDS = {
+    AutoThresholdTypes.OTSU.value: _otsu,
+    AutoThresholdTypes.TRIANGLE.value: _triangle,
+    AutoThresholdTypes.LI.value: _li,
+    AutoThresholdTypes.YEN.value: _yen,
+}
+
+
+def histogram_threshold(
+    hist: np.ndarray, type: AutoThresholdTypes = AutoThresholdTypes.OTSU
+) -> float:
+    """
+    Selects a threshold in [0, 1] from a single channel histogram (see calcHist,
+    bin i centered at i / (bins - 1)) in O(bins). The foreground is x > thresh.
     """
+    return _HISTOGRAM_THRESHOLDS[AutoThresholdTypes.v(type)](_as_histogram(hist))
+
+
+def multi_otsu_thresholds(hist: np.ndarray, classes: int = 3) -> List[float]:
+    """
+    The classes - 1 increasing thresholds in [0, 1] that maximize the between-class
+    variance of a single channel histogram. Solved by dynamic programming over the
+    bins in O(classes * bins^2), instead of trying all bin combinations.
+    """
+    hist = _as_histogram(hist)
+    bins = len(hist)
+    if classes < 2 or classes > bins:
+        raise ValueError(f"Cannot split {bins} bins into {classes} classes")
+    weight = np.concatenate([[0], np.cumsum(hist)])
+    moment = np.concatenate([[0], np.cumsum(hist * np.arange(bins))])
+
+    def score(start: np.ndarray, end: int) -> np.ndarray:
+        # sum^2 / count of the bins start..end, the between-class variance part
+        w = weight[end + 1] - weight[start]
+        m = moment[end + 1] - moment[start]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(w > 0, m**2 / w, 0)
+
+    # best[j]: the best score of the bins 0..j split into k + 1 classes
+    best = score(np.zeros(bins, dtype=int), np.arange(bins))
+    splits = []
+    for k in range(1, classes):
+        new_best = np.full(bins, -np.inf)
+        split = np.zeros(bins, dtype=int)
+        for j in range(k, bins):
+            # the last class starts at i
+            i = np.arange(k, j + 1)
+            candidates = best[i - 1] + score(i, j)
+            arg = int(np.argmax(candidates))
+            new_best[j], split[j] = candidates[arg], i[arg]
+        best = new_best
+        splits.append(split)
+    end, thresholds = bins - 1, []
+    for split in reversed(splits):
+        start = split[end]
+        thresholds.append(_bin_threshold(start - 1, bins))
+        end = start - 1
+    return thresholds[::-1]
 
-    OTSU = cv2.THRESH_BINARY + cv2.THRESH_OTSU
-    TRIANGLE = cv2.THRESH_BINARY + cv2.THRESH_TRIANGLE
+
+def _gray_histogram(
+    img: ImageFormat, bins: int, hist: Optional[np.ndarray]
+) -> np.ndarray:
+    if hist is not None:
+        return hist
+    return image_histogram(img, int(bins), channel=1)
 
 
 @fn.NodeDecorator(
     node_id="cv2.auto_threshold",
     outputs=[
         {"name": "out", "type": OpenCVImageFormat},
-        {"name": "thresh", "type": int},
+        {"name": "thresh", "type": float},
     ],
-    default_io_options={"maxval": {"value_options": {"min": 0.0, "max": 1.0}}},
+    default_io_options={
+        "maxval": {"value_options": {"min": 0.0, "max": 1.0}},
+        "bins": {"value_options": {"min": 2, "max": 65536}},
+    },
     default_render_options={"data": {"src": "out"}},
     description="Apply an automatic threshold to an image.",
 )
@@ -72,20 +244,70 @@ def auto_threshold(
     img: ImageFormat,
     maxval: float = 1,
     type: AutoThresholdTypes = AutoThresholdTypes.OTSU,
-) -> Tuple[OpenCVImageFormat, int]:
-    type = AutoThresholdTypes.v(type)
+    bins: int = 256,
+    hist: Optional[np.ndarray] = None,
+) -> Tuple[OpenCVImageFormat, float]:
+    """
+    Thresholds the grayscale image at a threshold selected from its histogram. The
+    float data is binned directly, without requantizing the image, and the
+    histogram is cached on the image, so trying several methods scans it once.
 
-    img = assert_opencvdata(img, 1)
+    Args:
+        img: ImageFormat: The image.
+        maxval: float: The value of the foreground (x > thresh).
+        type: AutoThresholdTypes: The threshold method.
+        bins: int: The number of histogram bins, i.e. the threshold precision.
+        hist: np.ndarray: A precomputed histogram of the grayscale image (e.g. from
+            calcHist), the threshold selection then costs O(bins).
+    Returns:
+        OpenCVImageFormat: The thresholded image.
+        float: The threshold in [0, 1].
+    """
+    thresh = histogram_threshold(_gray_histogram(img, bins, hist), type)
+    data = assert_opencvdata(img, 1)
+    out = cv2.threshold(data, thresh, maxval, cv2.THRESH_BINARY)[1]
+    return OpenCVImageFormat(out), thresh
 
-    if type == AutoThresholdTypes.OTSU.value:
-        img = (img * 65535).astype(np.uint16)
-        maxval = int(maxval * 65535)
-    elif type == AutoThresholdTypes.TRIANGLE.value:
-        img = (img * 255).astype(np.uint8)
-        maxval = int(maxval * 255)
 
-    thresh, img = cv2.threshold(img, 0, maxval, type)
-    return OpenCVImageFormat(img), thresh
+@fn.NodeDecorator(
+    node_id="cv2.multi_otsu_threshold",
+    name="Multi Otsu Threshold",
+    outputs=[
+        {"name": "out", "type": OpenCVImageFormat},
+        {"name": "thresholds", "description": "The increasing thresholds."},
+    ],
+    default_io_options={
+        "classes": {"value_options": {"min": 2, "max": 8}},
+        "bins": {"value_options": {"min": 2, "max": 4096}},
+    },
+    default_render_options={"data": {"src": "out"}},
+    description="Quantizes an image into classes with multi level Otsu thresholds.",
+)
+def multi_otsu_threshold(
+    img: ImageFormat,
+    classes: int = 3,
+    bins: int = 256,
+    hist: Optional[np.ndarray] = None,
+) -> Tuple[OpenCVImageFormat, List[float]]:
+    """
+    Splits the grayscale image into classes at the thresholds that maximize the
+    between-class variance of its histogram (multi level Otsu).
+
+    Args:
+        img: ImageFormat: The image.
+        classes: int: The number of classes.
+        bins: int: The number of histogram bins.
+        hist: np.ndarray: A precomputed histogram of the grayscale image.
+    Returns:
+        OpenCVImageFormat: The classes, equally spaced in [0, 1].
+        List[float]: The classes - 1 thresholds.
+    """
+    thresholds = multi_otsu_thresholds(_gray_histogram(img, bins, hist), int(classes))
+    data = assert_opencvdata(img, 1)
+    labels = np.zeros(data.shape, dtype=np.float32)
+    for t in thresholds:
+        labels += data > t
+    return OpenCVImageFormat(labels / len(thresholds)), thresholds
 
 
 class AdaptiveThresholdMethods(fn.DataEnum):
@@ -140,6 +362,122 @@ def adaptive_threshold(
     )
 
 
+class LocalThresholdMethods(fn.DataEnum):
+    """
+    Local threshold methods, from the windowed mean m and standard deviation s.
+
+    Attributes:
+        MEAN: m - c, like ADAPTIVE_THRESH_MEAN_C
+        NIBLACK: m + k * s - c
+        SAUVOLA: m * (1 + k * (s / r - 1)) - c, for documents with uneven lighting
+        BRADLEY: m * (1 - k) - c, pixels darker than the mean by k are background
+    """
+
+    MEAN = "mean"
+    NIBLACK = "niblack"
+    SAUVOLA = "sauvola"
+    BRADLEY = "bradley"
+
+
+_LOCAL_THRESHOLD_TILE_ROWS = 256
+
+
+def local_threshold_map(
+    stats: LocalStatistics,
+    block_size: int,
+    method: LocalThresholdMethods = LocalThresholdMethods.SAUVOLA,
+    k: float = 0.2,
+    r: float = 0.5,
+    c: float = 0,
+    rows: Optional[slice] = None,
+) -> np.ndarray:
+    """
+    The local thresholds (of the rows) of an image from its windowed statistics, in
+    O(1) per pixel for any block_size.
+    """
+    method = LocalThresholdMethods.v(method)
+    count, sums, sqsums = stats.window(block_size, block_size, rows)
+    mean = sums / count
+    if method == LocalThresholdMethods.MEAN.value:
+        thresh = mean
+    elif method == LocalThresholdMethods.BRADLEY.value:
+        thresh = mean * (1 - k)
+    else:
+        std = np.sqrt(np.maximum(sqsums / count - mean * mean, 0))
+        if method == LocalThresholdMethods.NIBLACK.value:
+            thresh = mean + k * std
+        else:
+            thresh = mean * (1 + k * (std / r - 1))
+    return (thresh - c).astype(np.float32)
+
+
+@fn.NodeDecorator(
+    node_id="cv2.local_threshold",
+    name="Local Threshold",
+    outputs=[
+        {"name": "out", "type": OpenCVImageFormat},
+    ],
+    default_io_options={
+        "maxval": {"value_options": {"min": 0.0, "max": 1.0}},
+        "block_size": {"value_options": {"min": 1}},
+        "max_workers": {"value_options": {"min": 1}},
+    },
+    default_render_options={"data": {"src": "out"}},
+    description="Apply a local (Sauvola, Niblack, Bradley) threshold to an image.",
+)
+def local_threshold(
+    img: ImageFormat,
+    maxval: float = 1,
+    method: LocalThresholdMethods = LocalThresholdMethods.SAUVOLA,
+    block_size: int = 31,
+    k: float = 0.2,
+    r: float = 0.5,
+    c: float = 0,
+    invert: bool = False,
+    max_workers: Optional[int] = None,
+) -> OpenCVImageFormat:
+    """
+    Thresholds the float grayscale image against thresholds computed from the
+    windowed mean and standard deviation, read from the (cached) integral images,
+    so the cost does not depend on block_size. Row tiles are processed in
+    parallel. Windows are clipped at the image borders.
+
+    Args:
+        img: ImageFormat: The image.
+        maxval: float: The value of the foreground (x > thresh).
+        method: LocalThresholdMethods: The threshold method.
+        block_size: int: The window size.
+        k: float: The weight of the standard deviation (NIBLACK, SAUVOLA) or the
+            fraction below the mean (BRADLEY).
+        r: float: The dynamic range of the standard deviation (SAUVOLA).
+        c: float: Subtracted from the thresholds.
+        invert: bool: Sets the pixels at or below the threshold to maxval instead.
+        max_workers: int: The number of threads, defaults to the number of CPUs.
+    Returns:
+        OpenCVImageFormat: The thresholded image.
+    """
+    data = assert_opencvdata(img, 1)
+    stats = LocalStatistics.of(img, channel=1)
+    block_size = max(int(block_size), 1)
+    tiles = [
+        slice(y, y + _LOCAL_THRESHOLD_TILE_ROWS)
+        for y in range(0, data.shape[0], _LOCAL_THRESHOLD_TILE_ROWS)
+    ]
+
+    def _tile(rows: slice) -> np.ndarray:
+        thresh = local_threshold_map(stats, block_size, method, k, r, c, rows)
+        inside = data[rows] > thresh
+        return np.where(inside != invert, np.float32(maxval), np.float32(0))
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(tiles))
+    if max_workers <= 1:
+        res = np.concatenate([_tile(rows) for rows in tiles])
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            res = np.concatenate(list(executor.map(_tile, tiles)))
+    return OpenCVImageFormat(res)
+
+
 @fn.NodeDecorator(
     node_id="cv2.in_range_sc",
     node_name=" In Range Single Channel",
@@ -200,6 +538,246 @@ def in_range(
     return OpenCVImageFormat(arr)
 
 
+RangeTable = Union[str, List[List[float]], np.ndarray]
+
+
+def _parse_ranges(ranges: RangeTable) -> Tuple[Tuple[float, ...], ...]:
+    if isinstance(ranges, str):
+        ranges = [_parse_floats(row) for row in ranges.split(";") if row.strip()]
+    return tuple(tuple(float(v) for v in row) for row in np.atleast_2d(ranges))
+
+
+@lru_cache(maxsize=4)
+def _range_luts(
+    ranges: Tuple[Tuple[float, ...], ...], space: str, levels: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    # the centers of the quantized BGR cells, indexed by b * levels^2 + g * levels + r
+    centers = (((np.arange(levels) + 0.5) * (256 / levels) - 0.5) / 255).astype(
+        np.float32
+    )
+    g, r = np.meshgrid(centers, centers, indexing="ij")
+    labels = np.zeros((levels, levels * levels), dtype=np.uint8)
+    bits = np.zeros((levels, levels * levels), dtype=np.uint32)
+    # one blue plane at a time, to bound the memory of the conversion
+    for b in range(levels):
+        cells = np.stack([np.full_like(g, centers[b]), g, r], axis=-1)
+        colors = conv_colorspace(cells.reshape(-1, 1, 3), "BGR", space)
+        colors = colors.reshape(levels * levels, -1)
+        channels = colors.shape[1]
+        for i, row in enumerate(ranges):
+            if len(row) != 2 * channels:
+                raise ValueError(
+                    f"A range in {space} needs {2 * channels} values "
+                    f"(lower, upper per channel), got {len(row)}"
+                )
+            inside = np.ones(len(colors), dtype=bool)
+            for c in range(channels):
+                lower, upper = row[2 * c], row[2 * c + 1]
+                if c == 0 and space in ("HSV", "HLS") and lower > upper:
+                    # hue ranges wrap around, e.g. red from 0.95 to 0.05
+                    inside &= (colors[:, c] >= lower) | (colors[:, c] <= upper)
+                else:
+                    inside &= (colors[:, c] >= lower) & (colors[:, c] <= upper)
+            bits[b, inside] |= np.uint32(1 << i)
+            labels[b, inside & (labels[b] == 0)] = i + 1
+    labels, bits = labels.ravel(), bits.ravel()
+    bits.setflags(write=False)
+    labels.setflags(write=False)
+    return labels, bits
+
+
+def color_range_luts(
+    ranges: RangeTable, space: ColorCodes = ColorCodes.BGR, levels: int = 256
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the (cached, read-only) lookup tables of in_ranges over the levels^3
+    cells of the quantized BGR cube: the label (index + 1 of the first range
+    containing the cell center, 0 for none) and the bit mask of all containing
+    ranges, indexed by b * levels^2 + g * levels + r of the quantized color.
+    """
+    ranges = _parse_ranges(ranges)
+    if not 0 < len(ranges) <= 32:
+        raise ValueError(f"Expected 1 to 32 ranges, got {len(ranges)}")
+    levels = int(levels)
+    if levels < 2 or levels > 256 or levels & (levels - 1):
+        raise ValueError(f"levels must be a power of 2 in [2, 256], got {levels}")
+    return _range_luts(ranges, ColorCodes.v(space), levels)
+
+
+@fn.NodeDecorator(
+    node_id="cv2.in_ranges",
+    name="In Ranges",
+    outputs=[
+        {"name": "labels", "description": "The index + 1 of the first range, or 0."},
+        {"name": "masks", "description": "The (n, h, w) masks of the n ranges."},
+    ],
+    default_io_options={"levels": {"value_options": {"min": 2, "max": 256}}},
+    description="Segments an image into several color ranges in one pass.",
+)
+def in_ranges(
+    img: ImageFormat,
+    ranges: RangeTable = "0,0.5,0,1,0,1;0.5,1,0,1,0,1",
+    space: ColorCodes = ColorCodes.HSV,
+    levels: int = 256,
+    with_masks: bool = False,
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Checks the pixels against a table of color ranges at once, instead of
+    converting the color space and calling in_range once per range. The ranges
+    are evaluated once per cell of the BGR cube quantized to levels per channel
+    (cached by the parameters), after which each pixel costs a single lookup.
+
+    Args:
+        img: ImageFormat: The BGR image.
+        ranges: RangeTable: One range per row as lower_c1, upper_c1, lower_c2,
+            upper_c2, ... in [0, 1] in the given color space, as nested list or
+            as string with rows separated by ";". Hue ranges with lower > upper
+            wrap around (HSV, HLS).
+        space: ColorCodes: The color space of the ranges.
+        levels: int: The quantization of each BGR channel, a power of 2. 256 is
+            exact for 8 bit images, lower levels build the table faster.
+        with_masks: bool: Also returns one mask per range, ranges may overlap.
+    Returns:
+        np.ndarray: The int32 label map.
+        np.ndarray: The boolean masks, if with_masks.
+    """
+    ranges = _parse_ranges(ranges)
+    labels_lut, bits_lut = color_range_luts(ranges, space, levels)
+    levels = int(levels)
+    shift = 9 - levels.bit_length()
+    data = cv2.convertScaleAbs(assert_opencvdata(img, 3), alpha=255) >> shift
+    index = data[..., 0].astype(np.int32) * (levels * levels)
+    index += data[..., 1].astype(np.int32) * levels
+    index += data[..., 2]
+    labels = labels_lut[index].astype(np.int32)
+    if not with_masks:
+        return labels, None
+    bits = bits_lut[index]
+    masks = np.stack([(bits & np.uint32(1 << i)) > 0 for i in range(len(ranges))])
+    return labels, masks
+
+
+class LUTModes(fn.DataEnum):
+    """
+    Intensity mappings of intensity_lut.
+
+    Attributes:
+        LEVELS: quantizes into len(points) + 1 classes, x > points[i] raises the class
+            by one, the classes map to values (default: equally spaced in [0, 1])
+        CURVE: piecewise linear curve through the control points (points[i],
+            values[i]), constant beyond the first and last point
+    """
+
+    LEVELS = "levels"
+    CURVE = "curve"
+
+
+class LUTDepths(fn.DataEnum):
+    """
+    Sizes of the lookup table, the image is quantized to this precision.
+
+    Attributes:
+        UINT8: 256 entries, applied with cv2.LUT
+        UINT16: 65536 entries, for 12/16 bit data
+    """
+
+    UINT8 = 256
+    UINT16 = 65536
+
+
+def _parse_floats(values: Union[str, List[float], None]) -> Optional[Tuple[float, ...]]:
+    if values is None:
+        return None
+    if isinstance(values, str):
+        values = [v for v in values.split(",") if v.strip()]
+    return tuple(float(v) for v in values)
+
+
+@lru_cache(maxsize=64)
+def _cached_lut(
+    mode: str, points: Tuple[float, ...], values: Tuple[float, ...], size: int
+) -> np.ndarray:
+    x = np.arange(size, dtype=np.float64) / (size - 1)
+    if mode == LUTModes.LEVELS.value:
+        # the number of points below x is the class of x
+        table = np.asarray(values)[np.searchsorted(points, x, side="left")]
+    else:
+        table = np.interp(x, points, values)
+    table = table.astype(np.float32)
+    table.setflags(write=False)
+    return table
+
+
+def lookup_table(
+    points: Union[str, List[float]],
+    values: Union[str, List[float], None] = None,
+    mode: LUTModes = LUTModes.LEVELS,
+    depth: LUTDepths = LUTDepths.UINT8,
+) -> np.ndarray:
+    """
+    Returns the (cached, read-only) float32 lookup table of a multi-level threshold
+    or piecewise linear curve for images in [0, 1], see LUTModes.
+    """
+    mode = LUTModes.v(mode)
+    points = _parse_floats(points)
+    values = _parse_floats(values)
+    if len(points) == 0 or any(b <= a for a, b in zip(points, points[1:])):
+        raise ValueError(f"The points {points} must be increasing")
+    if mode == LUTModes.LEVELS.value:
+        if values is None:
+            values = tuple(np.linspace(0, 1, len(points) + 1))
+        if len(values) != len(points) + 1:
+            raise ValueError(f"{len(points)} thresholds need {len(points) + 1} values")
+    elif values is None or len(values) != len(points):
+        raise ValueError("A curve needs one value per control point")
+    return _cached_lut(mode, points, values, LUTDepths.v(depth))
+
+
+@fn.NodeDecorator(
+    node_id="cv2.intensity_lut",
+    name="Intensity LUT",
+    outputs=[
+        {"name": "out", "type": OpenCVImageFormat},
+    ],
+    default_render_options={"data": {"src": "out"}},
+    description="Multi-level threshold or intensity curve via a lookup table.",
+)
+def intensity_lut(
+    img: ImageFormat,
+    points: Union[str, List[float]] = "0.33,0.66",
+    values: Optional[Union[str, List[float]]] = None,
+    mode: LUTModes = LUTModes.LEVELS,
+    depth: LUTDepths = LUTDepths.UINT8,
+) -> OpenCVImageFormat:
+    """
+    Maps the intensities through a lookup table, either quantizing them into
+    classes at the threshold points or along a piecewise linear curve. The image
+    is quantized to 8 (cv2.LUT) or 16 bit and mapped in a single pass, so the
+    cost does not depend on the number of levels. Tables are cached by their
+    parameters.
+
+    Args:
+        img: ImageFormat: The image.
+        points: Union[str, List[float]]: The increasing thresholds (LEVELS) or
+            curve control points (CURVE) in [0, 1], as list or comma separated.
+        values: Union[str, List[float]]: The class values (one more than points) or
+            the curve values at the control points.
+        mode: LUTModes: The kind of mapping.
+        depth: LUTDepths: The size of the lookup table.
+    Returns:
+        OpenCVImageFormat: The mapped image.
+    """
+    depth = LUTDepths.v(depth)
+    table = lookup_table(points, values, mode, depth)
+    data = assert_opencvdata(img)
+    if depth == LUTDepths.UINT8.value:
+        res = cv2.LUT((data * 255 + 0.5).astype(np.uint8), table)
+    else:
+        res = table[(data * 65535 + 0.5).astype(np.uint16)]
+    # values outside of [0, 1] would rescale the whole image
+    return OpenCVImageFormat(np.clip(res, 0, 1))
+
+
 NODE_SHELF = fn.Shelf(
     name="Masking and Thresholding",
     description="OpenCV image masking and thresholding nodes.",
@@ -207,8 +785,12 @@ NODE_SHELF = fn.Shelf(
     nodes=[
         threshold,
         auto_threshold,
+        multi_otsu_threshold,
         adaptive_threshold,
+        local_threshold,
+        intensity_lut,
         in_range_singel_channel,
         in_range,
+        in_ranges,
     ],
 )
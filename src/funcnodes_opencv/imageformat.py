@@ -1,5 +1,7 @@
 from __future__ import annotations
-from typing import Literal, Tuple
+from dataclasses import dataclass
+import struct
+from typing import Any, Callable, Hashable, Literal, Optional, Tuple, Union
 import cv2
 import numpy as np
 from funcnodes_images.imagecontainer import register_imageformat, ImageFormat  # noqa: F401
@@ -154,6 +156,54 @@ class OpenCVImageFormat(NumpyImageFormat):
 
         super().__init__(_assert_opencvdata(arr))
 
+    @classmethod
+    def _from_view(cls, arr: np.ndarray) -> "OpenCVImageFormat":
+        # wraps float32 data of shape (h, w, c) in [0, 1] without conversion or copy
+        img = cls.__new__(cls)
+        NumpyImageFormat.__init__(img, arr)
+        return img
+
+    @property
+    def roi(self) -> Optional[Tuple["OpenCVImageFormat", int, int]]:
+        """(parent, x, y) if the image is a crop of a parent image, else None."""
+        return self.__dict__.get("_roi")
+
+    def crop(self, x: int, y: int, w: int, h: int) -> "OpenCVImageFormat":
+        """
+        Returns the region (x, y, w, h), clipped to the image, as image sharing the
+        pixel buffer of this image (no copy). The crop remembers its position in the
+        (outermost) parent, so neighborhood filters can read their border from the
+        surrounding pixels, like cv2 does for sub-matrices.
+        """
+        x0, y0 = max(int(x), 0), max(int(y), 0)
+        x1, y1 = min(int(x) + int(w), self.width()), min(int(y) + int(h), self.height())
+        if x1 <= x0 or y1 <= y0:
+            raise ValueError(
+                f"The region {(x, y, w, h)} is outside of the "
+                f"{self.width()}x{self.height()} image"
+            )
+        view = self._data[y0:y1, x0:x1]
+        view.setflags(write=False)
+        crop = OpenCVImageFormat._from_view(view)
+        parent, ox, oy = self.roi or (self, 0, 0)
+        crop.__dict__["_roi"] = (parent, ox + x0, oy + y0)
+        return crop
+
+    def derived(self, key: Hashable, factory: Callable[[np.ndarray], Any]) -> Any:
+        """
+        Returns data derived from the pixels (e.g. integral images), computed once per
+        image as factory(pixels). The factory gets the internal array and must not
+        modify it. Derived arrays are read-only, since they are shared.
+        """
+        cache = self.__dict__.setdefault("_derived", {})
+        if key not in cache:
+            value = factory(self._data)
+            for arr in value if isinstance(value, tuple) else (value,):
+                if isinstance(arr, np.ndarray):
+                    arr.setflags(write=False)
+            cache[key] = value
+        return cache[key]
+
     def to_jpeg(self, quality=0.75) -> bytes:
         return cv2.imencode(
             ".jpg",
@@ -222,3 +272,274 @@ def pil_to_cv2(pil_img: PillowImageFormat) -> OpenCVImageFormat:
 
 OpenCVImageFormat.add_to_converter(PillowImageFormat, cv2_to_pil)
 PillowImageFormat.add_to_converter(OpenCVImageFormat, pil_to_cv2)
+
+
+@dataclass(frozen=True)
+class ImageHeader:
+    """Image metadata as read from the header of an encoded image."""
+
+    format: str
+    width: int
+    height: int
+    channels: int
+    depth: int  # bits per sample
+
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# png color type -> number of channels
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+# jpeg start of frame markers, excluding DHT (C4), JPG (C8) and DAC (CC)
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _parse_png_header(buf: bytes) -> Optional[ImageHeader]:
+    if len(buf) < 29 or buf[12:16] != b"IHDR":
+        return None
+    width, height, bitdepth, colortype = struct.unpack(">IIBB", buf[16:26])
+    if colortype not in _PNG_CHANNELS:
+        return None
+    return ImageHeader(
+        "png", width, height, _PNG_CHANNELS[colortype], 16 if bitdepth == 16 else 8
+    )
+
+
+def _parse_jpeg_header(buf: bytes) -> Optional[ImageHeader]:
+    pos = 2
+    n = len(buf)
+    while pos + 4 <= n:
+        if buf[pos] != 0xFF:
+            return None
+        marker = buf[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:  # markers without payload
+            pos += 2
+            continue
+        (length,) = struct.unpack(">H", buf[pos + 2 : pos + 4])
+        if marker in _JPEG_SOF_MARKERS:
+            if pos + 10 > n:
+                return None
+            precision, height, width, ncomp = struct.unpack(
+                ">BHHB", buf[pos + 4 : pos + 10]
+            )
+            return ImageHeader("jpeg", width, height, ncomp, precision)
+        pos += 2 + length
+    return None
+
+
+def parse_image_header(buf: bytes) -> Optional[ImageHeader]:
+    """Reads the image metadata from the header of PNG and JPEG encoded images
+    without decoding them. Returns None for other or malformed formats.
+    """
+    if buf[:8] == _PNG_SIGNATURE:
+        return _parse_png_header(buf)
+    if buf[:2] == b"\xff\xd8":
+        return _parse_jpeg_header(buf)
+    return None
+
+
+class EncodedImageFormat(ImageFormat[bytes]):
+    """Holds an image in its encoded (compressed) form, e.g. as JPEG or PNG bytes.
+
+    Size, channels and depth are read from the header, the pixels are only decoded
+    (once) when a conversion to another image format is requested.
+    """
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview, np.ndarray]):
+        if isinstance(data, np.ndarray):
+            data = data.tobytes()
+        data = bytes(data)
+        if len(data) == 0:
+            raise ValueError("Encoded image data is empty")
+        super().__init__(data)
+        self.header: Optional[ImageHeader] = parse_image_header(data)
+        self._decoded: Optional[OpenCVImageFormat] = None
+
+    @property
+    def is_decoded(self) -> bool:
+        return self._decoded is not None
+
+    @property
+    def format(self) -> Optional[str]:
+        return self.header.format if self.header is not None else None
+
+    def get_data_copy(self) -> bytes:
+        # bytes are immutable, no need to copy
+        return self._data
+
+    def decode(self) -> OpenCVImageFormat:
+        if self._decoded is None:
+            data = cv2.imdecode(
+                np.frombuffer(self._data, dtype=np.uint8), cv2.IMREAD_UNCHANGED
+            )
+            if data is None:
+                raise ValueError("Could not decode image data")
+            self._decoded = OpenCVImageFormat(data)
+        return self._decoded
+
+    def width(self) -> int:
+        if self.header is not None:
+            return self.header.width
+        return self.decode().width()
+
+    def height(self) -> int:
+        if self.header is not None:
+            return self.header.height
+        return self.decode().height()
+
+    def channels(self) -> int:
+        if self.header is not None:
+            return self.header.channels
+        return self.decode()._data.shape[2]
+
+    def depth(self) -> int:
+        if self.header is not None:
+            return self.header.depth
+        return 32  # decoded data is float32
+
+    def to_jpeg(self, quality=0.75) -> bytes:
+        if self.format == "jpeg":
+            return self._data
+        return self.decode().to_jpeg(quality=quality)
+
+    def to_png(self) -> bytes:
+        if self.format == "png":
+            return self._data
+        return cv2_encode(self.decode(), ".png")
+
+    def to_thumbnail(self, size: tuple) -> "OpenCVImageFormat":
+        return self.decode().to_thumbnail(size)
+
+    def resize(
+        self,
+        w: int = None,
+        h: int = None,
+        keep_ratio: bool = True,
+    ) -> "OpenCVImageFormat":
+        return self.decode().resize(w=w, h=h, keep_ratio=keep_ratio)
+
+
+register_imageformat(EncodedImageFormat, "encoded")
+
+
+def cv2_encode(cv2_img: OpenCVImageFormat, ext: str = ".png", params=None) -> bytes:
+    """Encodes the image, PNG and TIFF keep 16 bit precision, all other formats use 8 bit."""
+    data = np.clip(cv2_img._data, 0, 1)
+    if ext.lower() in (".png", ".tif", ".tiff"):
+        data = (data * 65535 + 0.5).astype(np.uint16)
+    else:
+        data = (data * 255 + 0.5).astype(np.uint8)
+    ok, buf = cv2.imencode(ext, data, params or [])
+    if not ok:
+        raise ValueError(f"Could not encode image as {ext}")
+    return buf.tobytes()
+
+
+def encoded_to_cv2(enc_img: EncodedImageFormat) -> OpenCVImageFormat:
+    return enc_img.decode()
+
+
+def cv2_to_encoded(cv2_img: OpenCVImageFormat) -> EncodedImageFormat:
+    return EncodedImageFormat(cv2_encode(cv2_img, ".png"))
+
+
+EncodedImageFormat.add_to_converter(OpenCVImageFormat, encoded_to_cv2)
+OpenCVImageFormat.add_to_converter(EncodedImageFormat, cv2_to_encoded)
+EncodedImageFormat.add_to_converter(
+    NumpyImageFormat, lambda enc_img: cv2_to_np(enc_img.decode())
+)
+EncodedImageFormat.add_to_converter(
+    PillowImageFormat, lambda enc_img: cv2_to_pil(enc_img.decode())
+)
+
+
+class PackedMaskFormat(ImageFormat[np.ndarray]):
+    """Holds a binary mask with one bit per pixel, 32x smaller than a float32 image.
+
+    Each row is packed (np.packbits, little bit order) into uint64 words, pixel x
+    is bit x % 64 of word x // 64 and the bits beyond the width are zero, so logic
+    operations, counting and rectangle morphology run on whole words.
+    """
+
+    def __init__(self, words: np.ndarray, width: int):
+        words = np.asarray(words, dtype=np.uint64)
+        if words.ndim != 2 or words.shape[1] != -(-int(width) // 64):
+            raise ValueError(f"{words.shape} words do not hold a mask of width {width}")
+        super().__init__(words)
+        self._width = int(width)
+
+    @classmethod
+    def pack(cls, mask: np.ndarray) -> "PackedMaskFormat":
+        """Packs a 2D array, non-zero pixels are set."""
+        mask = np.asarray(mask)
+        if mask.ndim == 3 and mask.shape[2] == 1:
+            mask = mask[..., 0]
+        if mask.ndim != 2:
+            raise ValueError(f"Expected a single channel mask, got {mask.shape}")
+        h, w = mask.shape
+        packed = np.packbits(mask != 0, axis=1, bitorder="little")
+        words = np.zeros((h, -(-w // 64) * 8), dtype=np.uint8)
+        words[:, : packed.shape[1]] = packed
+        return cls(words.view("<u8"), w)
+
+    def unpack(self) -> np.ndarray:
+        """The mask as boolean array of shape (h, w)."""
+        return np.unpackbits(
+            self._data.view(np.uint8), axis=1, count=self._width, bitorder="little"
+        ).view(bool)
+
+    def count(self) -> int:
+        """The number of set pixels."""
+        if hasattr(np, "bitwise_count"):
+            return int(np.bitwise_count(self._data).sum(dtype=np.int64))
+        return int(_POPCOUNT8[self._data.view(np.uint8)].sum(dtype=np.int64))
+
+    def get_data_copy(self) -> np.ndarray:
+        return self._data.copy()
+
+    def width(self) -> int:
+        return self._width
+
+    def height(self) -> int:
+        return self._data.shape[0]
+
+    def to_jpeg(self, quality=0.75) -> bytes:
+        return self.to_cv2().to_jpeg(quality=quality)
+
+    def to_thumbnail(self, size: tuple) -> "OpenCVImageFormat":
+        return self.to_cv2().to_thumbnail(size)
+
+    def resize(
+        self,
+        w: int = None,
+        h: int = None,
+        keep_ratio: bool = True,
+    ) -> "OpenCVImageFormat":
+        return self.to_cv2().resize(w=w, h=h, keep_ratio=keep_ratio)
+
+
+_POPCOUNT8 = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+register_imageformat(PackedMaskFormat, "packed_mask")
+
+
+def cv2_to_packed(cv2_img: OpenCVImageFormat) -> PackedMaskFormat:
+    return PackedMaskFormat.pack(_assert_image_channels(cv2_img._data, 1))
+
+
+def packed_to_cv2(mask: PackedMaskFormat) -> OpenCVImageFormat:
+    return OpenCVImageFormat._from_view(mask.unpack().astype(np.float32)[..., None])
+
+
+PackedMaskFormat.add_to_converter(OpenCVImageFormat, packed_to_cv2)
+OpenCVImageFormat.add_to_converter(PackedMaskFormat, cv2_to_packed)
+PackedMaskFormat.add_to_converter(
+    NumpyImageFormat, lambda mask: cv2_to_np(packed_to_cv2(mask))
+)
+NumpyImageFormat.add_to_converter(
+    PackedMaskFormat, lambda np_img: cv2_to_packed(np_to_cv2(np_img))
+)
+PackedMaskFormat.add_to_converter(
+    PillowImageFormat, lambda mask: cv2_to_pil(packed_to_cv2(mask))
+)
@@ -4,6 +4,8 @@ import funcnodes as fn
 from typing import Literal
 from .imageformat import OpenCVImageFormat, ImageFormat
 from .utils import assert_opencvdata
+from .image_processing.kernels import get_kernel, KernelTypes
+from .image_processing.morphological_operations import apply_morphology
 
 
 @fn.NodeDecorator(
@@ -44,9 +46,9 @@ def minmax_lcn(
     img: ImageFormat, ksize: int = 8, mincontrast: int = 0, clip: bool = True
 ) -> OpenCVImageFormat:
     img = assert_opencvdata(img, channel=3)
-    kernel = np.ones((ksize, ksize), np.uint8)
-    upp = cv2.dilate(img, kernel)
-    low = cv2.erode(img, kernel)
+    kernel = get_kernel(KernelTypes.RECT.value, ksize, ksize)
+    upp = apply_morphology(img, cv2.MORPH_DILATE, kernel)
+    low = apply_morphology(img, cv2.MORPH_ERODE, kernel)
     upp = cv2.blur(upp, ksize=(ksize, ksize))  # faster
     low = cv2.blur(low, ksize=(ksize, ksize))
     contrast = np.maximum(upp - low, mincontrast)
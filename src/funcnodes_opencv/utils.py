@@ -1,5 +1,7 @@
+import threading
+from collections import OrderedDict
 import numpy as np
-from typing import Literal, List
+from typing import Any, Callable, Hashable, Literal, List, Optional, Tuple
 from .imageformat import (
     OpenCVImageFormat,
     NumpyImageFormat,
@@ -34,6 +36,55 @@ def assert_opencvdata(img, channel: Literal[1, 3, None] = None) -> np.ndarray:
     return data
 
 
+class RoiWindow:
+    """
+    The pixels a neighborhood filter needs to compute the region roi = (x, y, w, h)
+    of an image: the region grown by `margin` pixels on each side, clipped to the
+    image. Filtering `data` and cropping the result with `crop` gives the region of
+    the filtered full image, as the border is read from the surrounding pixels
+    like cv2 does for sub-matrices, while only the region is processed.
+    Crops (OpenCVImageFormat.crop) are processed within their parent the same way,
+    roi is then relative to the crop. Without roi and crop, data is the image.
+    """
+
+    def __init__(
+        self,
+        img,
+        roi: Optional[Tuple[int, int, int, int]] = None,
+        margin: int = 0,
+        channel: Literal[1, 3, None] = None,
+    ):
+        img = assert_opencvimg(img)
+        self._inner = None
+        if img.roi is None and roi is None:
+            self.data = assert_opencvdata(img, channel=channel)
+            return
+
+        w, h = img.width(), img.height()
+        x, y, rw, rh = roi if roi is not None else (0, 0, w, h)
+        x0, y0 = max(int(x), 0), max(int(y), 0)
+        x1, y1 = min(int(x) + int(rw), w), min(int(y) + int(rh), h)
+        if x1 <= x0 or y1 <= y0:
+            raise ValueError(f"The region {roi} is outside of the {w}x{h} image")
+        if img.roi is not None:
+            img, ox, oy = img.roi
+            x0, x1, y0, y1 = x0 + ox, x1 + ox, y0 + oy, y1 + oy
+
+        margin = max(int(margin), 0)
+        gx0, gy0 = max(x0 - margin, 0), max(y0 - margin, 0)
+        gx1 = min(x1 + margin, img.width())
+        gy1 = min(y1 + margin, img.height())
+        window = img.crop(gx0, gy0, gx1 - gx0, gy1 - gy0)
+        self.data = assert_opencvdata(window, channel=channel)
+        self._inner = (slice(y0 - gy0, y1 - gy0), slice(x0 - gx0, x1 - gx0))
+
+    def crop(self, res: np.ndarray) -> np.ndarray:
+        """Crops the region from the result of filtering data."""
+        if self._inner is None:
+            return res
+        return res[self._inner]
+
+
 def assert_similar_opencvdata(*arr) -> List[np.ndarray]:
     if len(arr) == 0:
         return arr
@@ -116,3 +167,51 @@ def match_channels(*arr):
         arr[i] = _assert_image_channels(a, channel=target_channels)
 
     return tuple(arr)
+
+
+class LRUCache:
+    """
+    A small thread-safe least-recently-used cache, used to keep derived data such as
+    kernel spectra or remap tables across calls with the same parameters.
+    Cached numpy arrays are made read-only, since they are shared between calls.
+    """
+
+    def __init__(self, maxsize: int = 16):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+
+        # the factory runs outside of the lock, so concurrent misses of the same key
+        # may compute the value twice, which is harmless
+        value = factory()
+        for arr in value if isinstance(value, tuple) else (value,):
+            if isinstance(arr, np.ndarray):
+                arr.setflags(write=False)
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+
+def array_key(arr: np.ndarray) -> Tuple:
+    """Hashable key of an array's content, e.g. for LRUCache."""
+    arr = np.asarray(arr)
+    return (arr.shape, arr.dtype.str, arr.tobytes())
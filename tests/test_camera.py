@@ -0,0 +1,60 @@
+import numpy as np
+import cv2
+import pytest_funcnodes
+from funcnodes_opencv.image_processing.camera import (
+    undistort,
+    stereo_rectify,
+    undistort_rectify_maps,
+)
+from funcnodes_opencv.utils import assert_opencvdata
+
+K = np.array([[500.0, 0, 320], [0, 500, 400], [0, 0, 1]])
+D = np.array([-0.2, 0.05, 0.001, -0.001, 0])
+
+
+@pytest_funcnodes.nodetest(undistort)
+async def test_undistort(image1):
+    data = assert_opencvdata(image1)
+    res = assert_opencvdata(cv2.undistort(data, K, D))
+    fnout, newK = await undistort.inti_call(img=image1, cameraMatrix=K, distCoeffs=D)
+    np.testing.assert_array_equal(newK, K)
+    assert newK is not K
+    assert fnout.data.shape == res.shape
+    # the fixed-point maps round the coordinates to 1/32 pixel
+    assert np.abs(fnout.data - res).mean() < 1e-3
+
+    size = (data.shape[1], data.shape[0])
+    maps = undistort_rectify_maps(K, D, size)
+    assert undistort_rectify_maps(K.copy(), D.copy(), size) is maps
+
+    fnout, newK = await undistort.inti_call(
+        img=image1, cameraMatrix=K, distCoeffs=D, alpha=1
+    )
+    expK, _ = cv2.getOptimalNewCameraMatrix(K, D, size, 1)
+    np.testing.assert_allclose(newK, expK)
+
+
+@pytest_funcnodes.nodetest(stereo_rectify)
+async def test_stereo_rectify(image1):
+    data = assert_opencvdata(image1)
+    size = (data.shape[1], data.shape[0])
+    R = cv2.Rodrigues(np.array([0.0, 0.02, 0.01]))[0]
+    T = np.array([-0.1, 0.002, 0.0])
+    out1, out2, Q = await stereo_rectify.inti_call(
+        img1=image1,
+        img2=image1,
+        cameraMatrix1=K,
+        distCoeffs1=D,
+        cameraMatrix2=K,
+        distCoeffs2=D,
+        R=R,
+        T=T,
+    )
+    R1, R2, P1, P2, expQ = cv2.stereoRectify(K, D, K, D, size, R, T)[:5]
+    np.testing.assert_allclose(Q, expQ)
+    assert Q.flags.writeable
+    for out, Rn, P in ((out1, R1, P1), (out2, R2, P2)):
+        maps = cv2.initUndistortRectifyMap(K, D, Rn, P, size, cv2.CV_16SC2)
+        np.testing.assert_array_equal(
+            out.data, assert_opencvdata(cv2.remap(data, *maps, cv2.INTER_LINEAR))
+        )
@@ -0,0 +1,64 @@
+import numpy as np
+import cv2
+import pytest
+import pytest_funcnodes
+from funcnodes_opencv.image_processing.filter_bank import (
+    filter_bank,
+    parse_filter_specs,
+    FilterSpec,
+)
+from funcnodes_opencv.utils import assert_opencvdata
+
+
+def test_parse_filter_specs():
+    specs = parse_filter_specs("gaussian:2, dog:1:2.5,identity")
+    assert specs == [
+        FilterSpec("gaussian", 2),
+        FilterSpec("dog", 1, 2.5),
+        FilterSpec("identity"),
+    ]
+    assert [s.name for s in specs] == ["gaussian:2", "dog:1:2.5", "identity"]
+    invalid_specs = ["blur:2", "dog:2", "dog:2:1", "dog:0:1", "gaussian:1:2"]
+    invalid_specs += ["gaussian:x", "gaussian:0", "gaussian", "dx:-1", "identity:1"]
+    for invalid in invalid_specs:
+        with pytest.raises(ValueError):
+            FilterSpec.parse(invalid)
+
+
+@pytest_funcnodes.nodetest(filter_bank)
+async def test_filter_bank(image1):
+    data = assert_opencvdata(image1)
+    filters = ["identity", "gaussian:4", "gaussian:1", "dx:1", "dyy:2"]
+    filters += ["dxy:2", "gradient:2", "log:4", "dog:1:4"]
+    features, names = await filter_bank.inti_call(
+        img=image1, filters=filters, max_workers=3
+    )
+    c = data.shape[2]
+    assert features.shape == data.shape[:2] + (len(filters) * c,)
+    assert names == filters
+
+    def g(sigma):
+        return cv2.GaussianBlur(data, (0, 0), sigma).reshape(data.shape)
+
+    def d(img, dx, dy):
+        scale = 0.5 if dx + dy == 1 else 1
+        res = cv2.Sobel(img, cv2.CV_32F, dx, dy, ksize=1, scale=scale)
+        return res.reshape(data.shape)
+
+    dx2, dy2 = d(g(2), 1, 0), d(g(2), 0, 1)
+    expected = [
+        data,
+        g(4),
+        g(1),
+        d(g(1), 1, 0),
+        d(g(2), 0, 2),
+        d(dx2, 0, 1),
+        np.sqrt(dx2**2 + dy2**2),
+        cv2.Laplacian(g(4), cv2.CV_32F, ksize=1).reshape(data.shape),
+        g(4) - g(1),
+    ]
+    for i, exp in enumerate(expected):
+        # successive Gaussians are computed from each other
+        np.testing.assert_allclose(
+            features[..., i * c : (i + 1) * c], exp, atol=1e-3, err_msg=filters[i]
+        )
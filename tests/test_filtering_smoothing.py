@@ -7,11 +7,23 @@ from funcnodes_opencv.image_processing.filtering_smoothing import (
     gaussianBlur,
     medianBlur,
     bilateralFilter,
+    guidedFilter,
+    bilateralGrid,
     stackBlur,
     boxFilter,
     filter2D,
+    sepFilter2D,
+    separable_decomposition,
+    kernel_spectrum,
+    Filter2DModes,
+    GaussianModes,
+    MedianModes,
+    median_blur_u16,
+    box_widths,
+    BorderTypes,
 )
 from funcnodes_opencv.utils import assert_opencvdata
+from funcnodes_opencv.imageformat import OpenCVImageFormat
 
 
 @pytest.mark.parametrize(
@@ -61,6 +73,49 @@ async def test_gaussianBlur(image1, kw, kh):
     np.testing.assert_allclose(fnout, res, rtol=1e-1, atol=5e-3)
 
 
+@pytest.mark.parametrize("sigma", [5, 12, 40])
+def test_box_widths(sigma):
+    widths = np.array(box_widths(sigma))
+    assert np.all(widths % 2 == 1)
+    np.testing.assert_allclose(np.sqrt(((widths**2 - 1) / 12).sum()), sigma, rtol=0.05)
+
+
+@pytest.mark.parametrize(
+    "mode, atol",
+    [(GaussianModes.PYRAMID, 1e-3), (GaussianModes.BOX, 2e-2)],
+)
+@pytest.mark.parametrize("sigma", [4, 15, 30])
+@pytest_funcnodes.nodetest(gaussianBlur)
+async def test_gaussianBlur_large_sigma(image1, mode, atol, sigma):
+    ksize = int(2 * np.ceil(4 * sigma) + 1)
+    res = assert_opencvdata(cv2.GaussianBlur(image1.data, (ksize, ksize), sigma))
+    fnout = (await gaussianBlur.inti_call(img=image1, sigmaX=sigma, mode=mode)).data
+    assert fnout.shape == res.shape
+    np.testing.assert_allclose(fnout, res, atol=atol)
+
+
+@pytest_funcnodes.nodetest(gaussianBlur)
+async def test_gaussianBlur_auto(image1):
+    exact = (await gaussianBlur.inti_call(img=image1, kw=7)).data
+    auto = (
+        await gaussianBlur.inti_call(img=image1, kw=7, mode=GaussianModes.AUTO)
+    ).data
+    np.testing.assert_array_equal(auto, exact)
+
+    res = assert_opencvdata(
+        cv2.GaussianBlur(image1.data, (0, 0), 20, borderType=cv2.BORDER_REPLICATE)
+    )
+    auto = (
+        await gaussianBlur.inti_call(
+            img=image1,
+            sigmaX=20,
+            borderType=BorderTypes.REPLICATE,
+            mode=GaussianModes.AUTO,
+        )
+    ).data
+    np.testing.assert_allclose(auto, res, atol=1e-3)
+
+
 @pytest.mark.parametrize(
     "ksize",
     np.arange(1, 51, 10),
@@ -75,6 +130,41 @@ async def test_medianBlur(image1, ksize):
     np.testing.assert_allclose(fnout, res, rtol=1e-6, atol=1e-5)
 
 
+@pytest.mark.parametrize("ksize", [7, 15, 41])
+@pytest.mark.parametrize("smooth", [True, False])
+def test_median_blur_u16(ksize, smooth):
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    rng = np.random.default_rng(0)
+    data = (rng.random((300, 200)) * 65535).astype(np.uint16)
+    if smooth:
+        data = cv2.GaussianBlur(data, (0, 0), 3) + (rng.random((300, 200)) * 50).astype(
+            np.uint16
+        )
+    r = ksize // 2
+    windows = sliding_window_view(np.pad(data, r, mode="edge"), (ksize, ksize))
+    res = np.median(windows, axis=(-2, -1)).astype(np.uint16)
+    np.testing.assert_array_equal(median_blur_u16(data, ksize, max_workers=2), res)
+
+
+@pytest_funcnodes.nodetest(medianBlur)
+async def test_medianBlur_16bit():
+    data = (np.arange(120 * 90, dtype=np.uint16) * 6).reshape(120, 90)
+    img = assert_opencvdata(data)
+
+    exact = (
+        await medianBlur.inti_call(img=data, ksize=9, mode=MedianModes.UINT16)
+    ).data
+    assert len(np.unique(exact)) > 256
+    quantized = (
+        await medianBlur.inti_call(img=img, ksize=9, mode=MedianModes.UINT8)
+    ).data
+    assert len(np.unique(quantized)) <= 256
+    # the 16 bit median is opt-in, AUTO keeps the 8 bit median
+    auto = (await medianBlur.inti_call(img=data, ksize=9)).data
+    np.testing.assert_array_equal(auto, quantized)
+
+
 @pytest.mark.parametrize(
     "d",
     np.arange(1, 22, 5),
@@ -187,3 +277,186 @@ async def test_filter2D(image1):
     # showdat([image1], res, fnout)
 
     np.testing.assert_allclose(fnout, res, rtol=1e-6, atol=1e-5)
+
+
+@pytest.mark.parametrize(
+    "mode",
+    list(Filter2DModes),
+)
+@pytest_funcnodes.nodetest(filter2D)
+async def test_filter2D_separable(image1, mode):
+    g = cv2.getGaussianKernel(9, 2)
+    sobel = cv2.getDerivKernels(1, 0, 9, normalize=True)
+    # rank 2 kernel
+    kernel = g @ g.T + np.outer(sobel[1], sobel[0])
+
+    res = cv2.filter2D(image1.raw_transformed.astype(np.float32) / 255, -1, kernel)
+    res = assert_opencvdata(np.clip(res, 0, 1))
+
+    fnout = (await filter2D.inti_call(img=image1, kernel=kernel, mode=mode)).data
+
+    np.testing.assert_allclose(fnout, res, rtol=1e-5, atol=1e-5)
+
+
+def test_separable_decomposition():
+    g = cv2.getGaussianKernel(7, 1.5)
+    terms = separable_decomposition(g @ g.T)
+    assert len(terms) == 1
+    kx, ky = terms[0]
+    np.testing.assert_allclose(np.outer(ky, kx), g @ g.T, atol=1e-12)
+
+    kernel = np.random.rand(5, 7)
+    terms = separable_decomposition(kernel)
+    assert len(terms) == 5
+    np.testing.assert_allclose(
+        sum(np.outer(ky, kx) for kx, ky in terms), kernel, atol=1e-12
+    )
+    # low-rank approximation within the tolerance
+    kernel = g @ g.T + 1e-4 * np.random.rand(7, 7)
+    assert len(separable_decomposition(kernel, tolerance=1e-2)) == 1
+
+
+@pytest_funcnodes.nodetest(sepFilter2D)
+async def test_sepFilter2D(image1):
+    kx = cv2.getGaussianKernel(7, 0).ravel()
+    ky = np.array([-1, 0, 1], dtype=np.float64)
+
+    res = cv2.sepFilter2D(image1.raw_transformed.astype(np.float32) / 255, -1, kx, ky)
+    res = assert_opencvdata(np.clip(res, 0, 1))
+
+    fnout = (await sepFilter2D.inti_call(img=image1, kernelX=kx, kernelY=ky)).data
+
+    np.testing.assert_allclose(fnout, res, rtol=1e-6, atol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "borderType",
+    [
+        BorderTypes.DEFAULT,
+        BorderTypes.CONSTANT,
+        BorderTypes.REPLICATE,
+        BorderTypes.WRAP,
+    ],
+)
+@pytest_funcnodes.nodetest(filter2D)
+async def test_filter2D_fft(image1, borderType):
+    rng = np.random.default_rng(0)
+    kernel = rng.random((61, 55)).astype(np.float32)
+    kernel /= kernel.sum()
+
+    # explicit border + valid correlation as reference, cv2.filter2D itself deviates
+    # from its border definition for off-center anchors in its own DFT path
+    data = image1.raw_transformed.astype(np.float32) / 255
+    padded = cv2.copyMakeBorder(
+        data, 30, 61 - 1 - 30, 10, 55 - 1 - 10, borderType.value
+    )
+    res = cv2.filter2D(
+        padded, -1, kernel, anchor=(0, 0), borderType=cv2.BORDER_CONSTANT
+    )[: data.shape[0], : data.shape[1]]
+    res = assert_opencvdata(np.clip(res, 0, 1))
+
+    for mode in [Filter2DModes.FFT, Filter2DModes.AUTO]:
+        fnout = (
+            await filter2D.inti_call(
+                img=image1,
+                kernel=kernel,
+                anchor=(10, 30),
+                borderType=borderType,
+                mode=mode,
+            )
+        ).data
+        np.testing.assert_allclose(fnout, res, rtol=1e-5, atol=1e-5)
+
+
+def test_kernel_spectrum_cached():
+    kernel = np.ones((61, 61), dtype=np.float32) / 61**2
+    spec = kernel_spectrum(kernel, 256, 256)
+    assert kernel_spectrum(kernel.copy(), 256, 256) is spec
+    assert kernel_spectrum(kernel, 256, 270) is not spec
+    assert not spec.flags.writeable
+
+
+@pytest.fixture
+def noisy_step():
+    rng = np.random.default_rng(0)
+    data = np.full((120, 160), 0.2, dtype=np.float32)
+    data[:, 80:] = 0.8
+    return np.clip(data + rng.normal(0, 0.03, data.shape), 0, 1).astype(np.float32)
+
+
+def _check_edge_preserving(res, noisy_step):
+    res = res[..., 0]
+    # noise is smoothed in the flat areas ...
+    assert res[:, 10:70].std() < noisy_step[:, 10:70].std() / 3
+    assert res[:, 90:150].std() < noisy_step[:, 90:150].std() / 3
+    # ... while the edge is kept
+    assert res[:, 78].mean() < 0.3
+    assert res[:, 81].mean() > 0.7
+
+
+@pytest_funcnodes.nodetest(guidedFilter)
+async def test_guidedFilter(image1, noisy_step):
+    res = (await guidedFilter.inti_call(img=noisy_step, sigmaSpace=8)).data
+    _check_edge_preserving(res, noisy_step)
+
+    fnout = (await guidedFilter.inti_call(img=image1, guide=image1)).data
+    assert fnout.shape == image1.data.shape
+
+    with pytest.raises(Exception, match="does not match"):
+        await guidedFilter.inti_call(img=noisy_step, guide=noisy_step[:, :100])
+
+
+@pytest_funcnodes.nodetest(bilateralGrid)
+async def test_bilateralGrid(image1, noisy_step):
+    res = (await bilateralGrid.inti_call(img=noisy_step, sigmaSpace=8)).data
+    _check_edge_preserving(res, noisy_step)
+
+    fnout = (
+        await bilateralGrid.inti_call(img=image1, sigmaColor=0.1, sigmaSpace=8)
+    ).data
+    ref = assert_opencvdata(cv2.bilateralFilter(image1.data, -1, 0.1, 8))
+    assert fnout.shape == ref.shape
+    assert np.abs(fnout - ref).mean() < 0.03
+
+    # grids larger than the image fall back to the exact filter
+    fnout = (
+        await bilateralGrid.inti_call(img=image1, sigmaColor=0.01, sigmaSpace=3)
+    ).data
+    ref = assert_opencvdata(cv2.bilateralFilter(image1.data, -1, 0.01, 3))
+    np.testing.assert_allclose(fnout, ref, atol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "node, kwargs",
+    [
+        (blur, {"kw": 7}),
+        (gaussianBlur, {"kw": 9, "sigmaX": 2}),
+        (medianBlur, {"ksize": 9}),
+        (bilateralFilter, {"d": 7, "sigmaColor": 0.2, "sigmaSpace": 3}),
+        (boxFilter, {"kw": 4, "kh": 6}),
+        (filter2D, {"kernel": "gaussian:7:2", "anchor": (1, 5)}),
+        (stackBlur, {"kw": 11}),
+    ],
+)
+@pytest_funcnodes.nodetest(
+    [blur, gaussianBlur, medianBlur, bilateralFilter, boxFilter, filter2D, stackBlur]
+)
+async def test_filter_roi(image1, node, kwargs):
+    # running sums (e.g. of stackBlur) depend slightly on the processed width
+    atol = 5e-5
+    full = (await node.inti_call(img=image1, **kwargs)).data
+    # regions at the image border and in the interior
+    for roi in [(0, 0, 64, 48), (300, 200, 90, 70), (560, 750, 200, 200)]:
+        x, y, w, h = roi
+        fnout = (await node.inti_call(img=image1, roi=roi, **kwargs)).data
+        np.testing.assert_allclose(fnout, full[y : y + h, x : x + w], atol=atol)
+
+        # filtering a crop reads the border from the parent image
+        region = image1.crop(*roi)
+        fnout = (await node.inti_call(img=region, **kwargs)).data
+        np.testing.assert_allclose(fnout, full[y : y + h, x : x + w], atol=atol)
+
+    # without a parent the crop border is extrapolated
+    isolated = OpenCVImageFormat(image1.data[200:270, 300:390])
+    fnout = (await node.inti_call(img=isolated, **kwargs)).data
+    assert fnout.shape == (70, 90, image1.testchannels)
@@ -5,13 +5,23 @@ import pytest_funcnodes
 from funcnodes_opencv.image_processing.geometric_transformations import (
     flip,
     rotate,
+    crop,
     resize,
+    resize_multi,
+    ResizeModes,
     warpAffine,
     perpectiveTransform,
     freeRotation,
     pyrDown,
     pyrUp,
+    pyramid,
+    pyramid_level,
+    ImagePyramid,
+    PyramidTypes,
     FreeRotationCropMode,
+    WarpModes,
+    warp_maps,
+    remap_tiled,
 )
 from funcnodes_opencv.utils import assert_opencvdata
 
@@ -44,6 +54,23 @@ async def test_rotate(image1):
     )
 
 
+@pytest_funcnodes.nodetest(crop)
+async def test_crop(image1):
+    fnout = await crop.inti_call(img=image1, x=100, y=50, w=200, h=120)
+    np.testing.assert_array_equal(fnout.data, image1.data[50:170, 100:300])
+    # the crop is a view of the image buffer
+    assert np.shares_memory(fnout._data, image1._data)
+    assert fnout.roi == (image1, 100, 50)
+
+    # nested crops refer to the outermost image, regions are clipped to the image
+    inner = await crop.inti_call(img=fnout, x=150, y=100, w=100, h=100)
+    assert inner.roi == (image1, 250, 150)
+    assert (inner.width(), inner.height()) == (50, 20)
+
+    with pytest.raises(Exception):
+        await crop.inti_call(img=image1, x=5000, y=0, w=10, h=10)
+
+
 @pytest_funcnodes.nodetest(resize)
 async def test_resize(image1):
     res = cv2.resize(image1.raw_transformed, (100, 200))
@@ -60,6 +87,51 @@ async def test_resize(image1):
     )
 
 
+@pytest_funcnodes.nodetest(resize)
+async def test_resize_auto(image1):
+    data = image1.data
+    h, w = data.shape[:2]
+    # factor 4: two pyrDown steps, remaining factor handled by AREA
+    fnout = (
+        await resize.inti_call(img=image1, h=h // 4, w=w // 4, mode=ResizeModes.AUTO)
+    ).data
+    res = assert_opencvdata(
+        cv2.resize(
+            image1.raw_transformed, (w // 4, h // 4), interpolation=cv2.INTER_AREA
+        )
+    )
+    assert fnout.shape == res.shape
+    # the Gaussian pyramid smooths slightly more than the box average of AREA
+    assert np.abs(fnout - res).mean() < 4e-2
+    level = cv2.pyrDown(cv2.pyrDown(data))
+    res = cv2.resize(level, (w // 4, h // 4), interpolation=cv2.INTER_AREA)
+    np.testing.assert_allclose(fnout, res.reshape(fnout.shape), atol=1e-6)
+
+    fnout = (
+        await resize.inti_call(img=image1, fh=0.5, fw=0.5, mode=ResizeModes.AUTO)
+    ).data
+    assert fnout.shape[:2] == (round(h / 2), round(w / 2))
+
+    fnout = (
+        await resize.inti_call(img=image1, fh=1.5, fw=1.5, mode=ResizeModes.AUTO)
+    ).data
+    res = assert_opencvdata(
+        cv2.resize(image1.raw_transformed, (round(w * 1.5), round(h * 1.5)))
+    )
+    np.testing.assert_allclose(fnout, res, atol=1e-2)
+
+
+@pytest_funcnodes.nodetest(resize_multi)
+async def test_resize_multi(image1):
+    sizes = "200x100, 64x64,1000x900"
+    out = await resize_multi.inti_call(img=image1, sizes=sizes)
+    assert [(o.width(), o.height()) for o in out] == [(200, 100), (64, 64), (1000, 900)]
+    # the pyramid levels are shared with other nodes working on the image
+    assert ImagePyramid.of(image1).levels >= 2
+    with pytest.raises(Exception):
+        await resize_multi.inti_call(img=image1, sizes="64")
+
+
 @pytest_funcnodes.nodetest(warpAffine)
 async def test_warpAffine(image1):
     M = cv2.getRotationMatrix2D((50, 50), 45, 1)
@@ -78,6 +150,40 @@ async def test_warpAffine(image1):
     )
 
 
+@pytest_funcnodes.nodetest(warpAffine)
+async def test_warpAffine_cached(image1):
+    M = cv2.getRotationMatrix2D((300, 400), 17, 1.1)
+    res = (await warpAffine.inti_call(img=image1, M=M)).data
+    fnout = (await warpAffine.inti_call(img=image1, M=M, mode=WarpModes.CACHED)).data
+    assert fnout.shape == res.shape
+    # remap and warpAffine round the fixed-point coordinates slightly differently
+    assert np.abs(fnout - res).mean() < 1e-3
+
+    size = (image1.width(), image1.height())
+    maps = warp_maps(M, size, size)
+    assert warp_maps(M.copy(), size, size) is maps
+    np.testing.assert_array_equal(
+        remap_tiled(image1.data, *maps, max_workers=3),
+        remap_tiled(image1.data, *maps),
+    )
+
+
+@pytest_funcnodes.nodetest(perpectiveTransform)
+async def test_perpectiveTransform_cached(image1):
+    M = cv2.getPerspectiveTransform(
+        np.array([[0, 0], [0, 100], [100, 0], [100, 100]], dtype=np.float32),
+        np.array([[5, 3], [0, 110], [90, 0], [100, 105]], dtype=np.float32),
+    )
+    res = (await perpectiveTransform.inti_call(img=image1, M=M, w=300, h=200)).data
+    fnout = (
+        await perpectiveTransform.inti_call(
+            img=image1, M=M, w=300, h=200, mode=WarpModes.CACHED, max_workers=2
+        )
+    ).data
+    assert fnout.shape == res.shape
+    assert np.abs(fnout - res).mean() < 1e-3
+
+
 @pytest_funcnodes.nodetest(perpectiveTransform)
 async def test_perpectiveTransform(image1):
     M = cv2.getPerspectiveTransform(
@@ -148,6 +254,21 @@ async def test_freeRotation(image1, crop_mode):
     )
 
 
+@pytest_funcnodes.nodetest(freeRotation)
+async def test_freeRotation_roi(image1):
+    full, M = await freeRotation.inti_call(img=image1, angle=30)
+    roi = (200, 300, 150, 100)
+    out, roiM = await freeRotation.inti_call(img=image1, angle=30, roi=roi)
+    np.testing.assert_allclose(out.data, full.data[300:400, 200:350], atol=1e-6)
+    np.testing.assert_allclose(roiM[:, 2], M[:, 2] - (200, 300))
+
+    cached, _ = await freeRotation.inti_call(
+        img=image1, angle=30, roi=roi, warp_mode=WarpModes.CACHED
+    )
+    # the fixed-point remap tables round the coordinates to 1/32 pixel
+    assert np.abs(cached.data - out.data).mean() < 2e-3
+
+
 @pytest_funcnodes.nodetest(pyrDown)
 async def test_pyrDown(image1):
     res = cv2.pyrDown(image1.raw_transformed)
@@ -176,3 +297,34 @@ async def test_pyrUp(image1):
         rtol=1e-6,
         atol=3e-3,
     )
+
+
+@pytest_funcnodes.nodetest(pyramid)
+async def test_pyramid(image1):
+    data = image1.data
+    pyr, levels = await pyramid.inti_call(img=image1, levels=3)
+    assert len(levels) == 4
+    exp = data
+    for level in levels:
+        np.testing.assert_allclose(level, exp.reshape(level.shape), atol=1e-6)
+        assert not level.flags.writeable
+        exp = cv2.pyrDown(exp)
+
+    # cached on the image and extended on demand
+    assert ImagePyramid.of(image1) is pyr
+    more = pyr.gaussian(5)
+    assert pyr.levels == 5
+    assert all(a is b for a, b in zip(levels, more))
+
+    _, bands = await pyramid.inti_call(
+        img=image1, levels=3, kind=PyramidTypes.LAPLACIAN
+    )
+    assert len(bands) == 4
+    np.testing.assert_allclose(ImagePyramid.collapse(bands), data, atol=1e-5)
+
+
+@pytest_funcnodes.nodetest(pyramid_level)
+async def test_pyramid_level(image1):
+    pyr = ImagePyramid.of(image1, 2)
+    out = await pyramid_level.inti_call(pyramid=pyr, level=2)
+    np.testing.assert_array_equal(out.data, pyr.gaussian(2)[2])
@@ -0,0 +1,163 @@
+import numpy as np
+import cv2
+import pytest
+import pytest_funcnodes
+import funcnodes as fn
+from funcnodes_opencv.image_io import (
+    load_images,
+    read_pages,
+    encoded_image,
+    imencode,
+    image_info,
+    DecodeReductions,
+    EncodeFormats,
+    Prefetcher,
+)
+from funcnodes_opencv.imageformat import EncodedImageFormat
+from funcnodes_opencv.utils import assert_opencvdata
+
+
+@pytest.fixture
+def image_dir(tmp_path, image1_raw):
+    for i in range(5):
+        img = np.roll(image1_raw, i * 20, axis=1)
+        cv2.imwrite(str(tmp_path / f"img_{i}.png"), img)
+    return tmp_path
+
+
+def test_prefetcher_keeps_order():
+    def _slow_square(i):
+        return i * i
+
+    res = list(Prefetcher(range(20), _slow_square, prefetch=3, max_workers=4))
+    assert res == [(i, i * i) for i in range(20)]
+
+
+@pytest_funcnodes.nodetest(load_images)
+async def test_load_images(image_dir, image1_raw):
+    node = load_images()
+    emitted = []
+
+    @fn.NodeDecorator(node_id="test.collect_images")
+    def collect(img: np.ndarray) -> int:
+        emitted.append(assert_opencvdata(img))
+        return len(emitted)
+
+    collector = collect()
+    node.outputs["out"].connect(collector.inputs["img"])
+    node.inputs["pattern"].value = str(image_dir / "*.png")
+    node.inputs["prefetch"].value = 2
+    await fn.run_until_complete(node, collector)
+
+    paths = node.outputs["paths"].value
+    assert [p.split("img_")[-1] for p in paths] == [f"{i}.png" for i in range(5)]
+    assert len(emitted) == 5
+    for i, data in enumerate(emitted):
+        res = assert_opencvdata(np.roll(image1_raw, i * 20, axis=1))
+        np.testing.assert_allclose(data, res, atol=1e-6)
+
+
+@pytest_funcnodes.nodetest(load_images)
+async def test_load_images_reduced_roi(image_dir, image1_raw):
+    img, path, paths = await load_images.inti_call(
+        pattern=str(image_dir / "*.png"),
+        reduction=DecodeReductions.HALF,
+        grayscale=True,
+        roi=(100, 50, 200, 100),
+    )
+    assert len(paths) == 5
+    assert path == paths[-1]
+    assert img.data.shape == (50, 100, 1)
+
+
+@pytest.fixture
+def stack_file(tmp_path, image1_raw):
+    gray = cv2.cvtColor(image1_raw, cv2.COLOR_BGR2GRAY).astype(np.uint16) * 257
+    pages = [np.roll(gray, i * 10, axis=1) + i for i in range(6)]
+    path = str(tmp_path / "stack.tiff")
+    assert cv2.imwritemulti(path, pages)
+    return path, pages
+
+
+@pytest_funcnodes.nodetest(read_pages)
+async def test_read_pages(stack_file):
+    path, pages = stack_file
+    node = read_pages()
+    emitted = []
+
+    @fn.NodeDecorator(node_id="test.collect_pages")
+    def collect(img: np.ndarray) -> int:
+        emitted.append(assert_opencvdata(img))
+        return len(emitted)
+
+    collector = collect()
+    node.outputs["out"].connect(collector.inputs["img"])
+    node.inputs["path"].value = path
+    node.inputs["start"].value = 1
+    node.inputs["step"].value = 2
+    await fn.run_until_complete(node, collector)
+
+    assert node.outputs["count"].value == 6
+    assert node.outputs["page"].value == 5
+    assert len(emitted) == 3
+    for data, i in zip(emitted, [1, 3, 5]):
+        # 16 bit precision is kept
+        np.testing.assert_allclose(data, assert_opencvdata(pages[i]), atol=1e-7)
+
+
+@pytest_funcnodes.nodetest(read_pages)
+async def test_read_pages_reduced_roi(stack_file):
+    path, pages = stack_file
+    img, page, count = await read_pages.inti_call(
+        path=path,
+        start=-2,
+        reduction=DecodeReductions.QUARTER,
+        roi=(40, 80, 200, 120),
+    )
+    assert (page, count) == (5, 6)
+    assert img.data.shape == (30, 50, 1)
+
+
+@pytest_funcnodes.nodetest(encoded_image)
+async def test_encoded_image(image1_raw):
+    buf = cv2.imencode(".png", image1_raw)[1].tobytes()
+    img = await encoded_image.inti_call(data=buf)
+    assert isinstance(img, EncodedImageFormat)
+    assert img.to_png() is buf
+    np.testing.assert_allclose(img.to_cv2().data, assert_opencvdata(image1_raw))
+
+
+@pytest_funcnodes.nodetest(imencode)
+@pytest.mark.parametrize("format", list(EncodeFormats))
+async def test_imencode(image1, format):
+    enc = await imencode.inti_call(img=image1, format=format, quality=0.9)
+    assert isinstance(enc, EncodedImageFormat)
+    assert (enc.width(), enc.height()) == (image1.width(), image1.height())
+    diff = np.abs(enc.to_cv2().data - image1.data)
+    if format in (EncodeFormats.PNG, EncodeFormats.TIFF):
+        assert diff.max() < 1e-4
+    else:
+        assert diff.mean() < 2e-2
+    # encoding into the same format again keeps the bytes
+    if format in (EncodeFormats.PNG, EncodeFormats.JPEG):
+        assert (await imencode.inti_call(img=enc, format=format)) is enc
+
+
+@pytest_funcnodes.nodetest(imencode)
+@pytest.mark.parametrize("format", [EncodeFormats.WEBP, EncodeFormats.TIFF])
+async def test_imencode_reencodes_unknown_header(image1_raw, format):
+    bmp = EncodedImageFormat(cv2.imencode(".bmp", image1_raw)[1])
+    enc = await imencode.inti_call(img=bmp, format=format)
+    assert enc is not bmp
+    assert not enc.data.startswith(b"BM")
+    assert enc.to_cv2().data.shape == bmp.to_cv2().data.shape
+
+
+@pytest_funcnodes.nodetest(image_info)
+async def test_image_info(image1):
+    w, h, c, d = await image_info.inti_call(img=image1)
+    assert (w, h, c, d) == (image1.width(), image1.height(), image1.testchannels, 32)
+
+    enc = EncodedImageFormat(cv2.imencode(".jpg", image1.raw_transformed)[1])
+    assert await image_info.inti_call(img=enc) == (w, h, image1.testchannels, 8)
+    assert not enc.is_decoded
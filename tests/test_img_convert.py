@@ -55,3 +55,39 @@ def test_prep(
     )
     np.testing.assert_allclose(i1.astype(float), d1.astype(float))
     np.testing.assert_allclose(i2.astype(float), d2.astype(float))
+
+
+def test_encoded_image_header(image1_raw):
+    from funcnodes_opencv.imageformat import EncodedImageFormat
+
+    for ext, fmt in [(".jpg", "jpeg"), (".png", "png")]:
+        buf = cv2.imencode(ext, image1_raw)[1].tobytes()
+        img = EncodedImageFormat(buf)
+        assert img.format == fmt
+        assert img.width() == image1_raw.shape[1]
+        assert img.height() == image1_raw.shape[0]
+        assert img.channels() == 3
+        assert img.depth() == 8
+        assert not img.is_decoded
+
+    gray16 = (cv2.cvtColor(image1_raw, cv2.COLOR_BGR2GRAY).astype(np.uint16)) * 257
+    img = EncodedImageFormat(cv2.imencode(".png", gray16)[1])
+    assert (img.channels(), img.depth()) == (1, 16)
+
+
+def test_encoded_image_lazy_decode(image1_raw):
+    from funcnodes_opencv.imageformat import EncodedImageFormat
+
+    buf = cv2.imencode(".jpg", image1_raw)[1].tobytes()
+    img = EncodedImageFormat(buf)
+    # unchanged jpeg data is passed through without decoding
+    assert img.to_jpeg() is buf
+    assert not img.is_decoded
+
+    data = assert_opencvdata(img)
+    assert img.is_decoded
+    np.testing.assert_allclose(
+        data, assert_opencvdata(cv2.imdecode(np.frombuffer(buf, np.uint8), 1))
+    )
+    assert img.to_cv2() is img.to_cv2()
+    assert img.to_np().data.shape == image1_raw.shape
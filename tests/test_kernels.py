@@ -0,0 +1,53 @@
+import numpy as np
+import cv2
+import pytest
+import pytest_funcnodes
+
+from funcnodes_opencv.image_processing.kernels import (
+    kernel,
+    get_kernel,
+    parse_kernel_spec,
+    resolve_kernel,
+    KernelTypes,
+)
+
+
+@pytest_funcnodes.nodetest(kernel)
+@pytest.mark.parametrize(
+    "kernel_type, ref",
+    [
+        (KernelTypes.RECT, cv2.getStructuringElement(cv2.MORPH_RECT, (7, 5))),
+        (KernelTypes.ELLIPSE, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (7, 5))),
+        (KernelTypes.CROSS, cv2.getStructuringElement(cv2.MORPH_CROSS, (7, 5))),
+        (KernelTypes.BOX, np.ones((5, 7)) / 35),
+        (
+            KernelTypes.GAUSSIAN,
+            cv2.getGaussianKernel(5, 1.5) @ cv2.getGaussianKernel(7, 1.5).T,
+        ),
+        (KernelTypes.DERIV_X, None),
+    ],
+)
+async def test_kernel(kernel_type, ref):
+    if kernel_type == KernelTypes.DERIV_X:
+        res = await kernel.inti_call(kernel_type=kernel_type, kw=7)
+        ref = np.outer(*cv2.getDerivKernels(1, 0, 7, normalize=True)[::-1])
+    else:
+        res = await kernel.inti_call(kernel_type=kernel_type, kw=7, kh=5, sigma=1.5)
+    np.testing.assert_allclose(res, ref, rtol=1e-6, atol=1e-7)
+    assert not res.flags.writeable
+
+
+def test_kernel_cache():
+    k1 = get_kernel("ellipse", 9)
+    assert get_kernel("ellipse", 9, 9) is k1
+    assert parse_kernel_spec("ellipse:9") is k1
+    assert parse_kernel_spec("Ellipse:9x9") is k1
+    assert resolve_kernel(5) is get_kernel("rect", 5, 5)
+    assert resolve_kernel("gaussian:9:2").shape == (9, 9)
+    assert resolve_kernel(None) is None
+    with pytest.raises(ValueError):
+        parse_kernel_spec("ellipse")
+    with pytest.raises(ValueError):
+        parse_kernel_spec("unknown:3")
+    with pytest.raises(ValueError):
+        parse_kernel_spec("deriv_x:3x5")
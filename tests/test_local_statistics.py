@@ -0,0 +1,55 @@
+import numpy as np
+import cv2
+import pytest
+import pytest_funcnodes
+from funcnodes_opencv.image_processing.local_statistics import (
+    integral,
+    local_statistics,
+    integral_images,
+    LocalStatistics,
+)
+from funcnodes_opencv.utils import assert_opencvdata
+
+
+def _clipped_window_sum(data, kw, kh):
+    # zero padding makes the unnormalized box filter a sum over the clipped window
+    return cv2.boxFilter(
+        data, cv2.CV_64F, (kw, kh), normalize=False, borderType=cv2.BORDER_CONSTANT
+    ).reshape(data.shape[0], data.shape[1], -1)
+
+
+@pytest_funcnodes.nodetest(integral)
+async def test_integral(image1):
+    data = image1.data
+    s, sq = await integral.inti_call(img=image1)
+    ref_s, ref_sq = cv2.integral2(data, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+    np.testing.assert_allclose(s.reshape(ref_s.shape), ref_s)
+    np.testing.assert_allclose(sq.reshape(ref_sq.shape), ref_sq)
+
+    # cached per image
+    s2, _ = await integral.inti_call(img=image1)
+    assert s2 is s
+    assert not s.flags.writeable
+
+
+@pytest.mark.parametrize("kw, kh", [(1, 0), (15, 0), (31, 7), (8, 8)])
+@pytest_funcnodes.nodetest(local_statistics)
+async def test_local_statistics(image1, kw, kh):
+    data = assert_opencvdata(image1).astype(np.float64)
+    _kh = kh if kh > 0 else kw
+    count = _clipped_window_sum(np.ones(data.shape[:2]), kw, _kh)
+    mean = _clipped_window_sum(data, kw, _kh) / count
+    var = _clipped_window_sum(data * data, kw, _kh) / count - mean**2
+
+    m, s, v, c = await local_statistics.inti_call(img=image1, kw=kw, kh=kh)
+    np.testing.assert_array_equal(c, count[..., 0])
+    np.testing.assert_allclose(m.data, mean, atol=1e-6)
+    np.testing.assert_allclose(v, np.maximum(var, 0), atol=1e-6)
+    np.testing.assert_allclose(s.data, np.sqrt(np.maximum(var, 0)), atol=1e-3)
+
+
+def test_local_statistics_cached(image1):
+    stats = LocalStatistics.of(image1)
+    assert LocalStatistics.of(image1) is stats
+    assert stats.sums is integral_images(image1)[0]
+    assert stats.sum(9) is stats.sum(9, 9)
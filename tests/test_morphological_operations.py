@@ -8,7 +8,10 @@ from funcnodes_opencv.image_processing.morphological_operations import (
     erode,
     morphologyEx,
     MorphologicalOperations,
+    apply_morphology,
+    rect_offsets,
 )
+from funcnodes_opencv.image_processing import morphological_operations
 from funcnodes_opencv.utils import assert_opencvdata
 
 
@@ -82,3 +85,86 @@ async def test_morphologyEx(image1, operation):
         rtol=1e-6,
         atol=2e-1 if operation == MorphologicalOperations.HITMISS else 2e-7,
     )
+
+
+@pytest.mark.parametrize(
+    "spec, shape",
+    [("ellipse:7", cv2.MORPH_ELLIPSE), ("cross:5x3", cv2.MORPH_CROSS)],
+)
+@pytest_funcnodes.nodetest([dilate, erode, morphologyEx])
+async def test_kernel_specs(image1, spec, shape):
+    size = tuple(int(v) for v in spec.split(":")[1].split("x"))
+    size = size * 2 if len(size) == 1 else size
+    ref_kernel = cv2.getStructuringElement(shape, size)
+
+    res = assert_opencvdata(cv2.dilate(image1.raw_transformed, ref_kernel))
+    fnout = (await dilate.inti_call(img=image1, kernel=spec)).data
+    np.testing.assert_allclose(fnout, res, rtol=1e-6, atol=2e-7)
+
+    res = assert_opencvdata(cv2.erode(image1.raw_transformed, ref_kernel))
+    fnout = (await erode.inti_call(img=image1, kernel=spec)).data
+    np.testing.assert_allclose(fnout, res, rtol=1e-6, atol=2e-7)
+
+    res = assert_opencvdata(
+        cv2.morphologyEx(image1.raw_transformed, cv2.MORPH_OPEN, ref_kernel)
+    )
+    fnout = (
+        await morphologyEx.inti_call(
+            img=image1, op=MorphologicalOperations.OPEN, kernel=spec
+        )
+    ).data
+    np.testing.assert_allclose(fnout, res, rtol=1e-6, atol=2e-7)
+
+
+@pytest_funcnodes.nodetest([dilate, erode, morphologyEx])
+async def test_morphology_roi(image1):
+    roi = (300, 200, 90, 70)
+    x, y, w, h = roi
+    for node, kwargs in [
+        (dilate, {"kernel": "ellipse:7", "iterations": 2}),
+        (erode, {"kernel": 5}),
+        (morphologyEx, {"op": MorphologicalOperations.CLOSE, "kernel": 5}),
+    ]:
+        full = (await node.inti_call(img=image1, **kwargs)).data
+        fnout = (await node.inti_call(img=image1, roi=roi, **kwargs)).data
+        np.testing.assert_array_equal(fnout, full[y : y + h, x : x + w])
+        fnout = (await node.inti_call(img=image1.crop(*roi), **kwargs)).data
+        np.testing.assert_array_equal(fnout, full[y : y + h, x : x + w])
+
+
+@pytest.mark.parametrize(
+    "kernel",
+    [
+        np.ones((7, 9), np.uint8),
+        np.pad(np.ones((1, 7), np.uint8), ((3, 3), (0, 0))),
+        np.pad(np.ones((3, 4), np.uint8), ((0, 4), (5, 0))),
+        None,
+    ],
+)
+@pytest.mark.parametrize("iterations", [1, 2])
+@pytest.mark.parametrize("operation", list(MorphologicalOperations))
+def test_rect_morphology(image1, kernel, iterations, operation, monkeypatch):
+    # run every rectangle through the van Herk/Gil-Werman passes
+    monkeypatch.setattr(morphological_operations, "_VHGW_MIN_SIZE", 1)
+    data = assert_opencvdata(image1)
+    op = MorphologicalOperations.v(operation)
+    if op == cv2.MORPH_HITMISS:
+        data = (data[..., :1] * 255).astype(np.uint8)
+    res = cv2.morphologyEx(data, op, kernel, iterations=iterations)
+    out = apply_morphology(data, op, kernel, iterations)
+    np.testing.assert_array_equal(out.reshape(res.shape), res)
+
+
+def test_rect_offsets():
+    assert rect_offsets(None) == (-1, 1, -1, 1)
+    assert rect_offsets(np.ones((5, 3)), 2) == (-2, 2, -4, 4)
+    assert rect_offsets(np.eye(5)) is None
+    assert rect_offsets(np.pad(np.ones((1, 4)), ((0, 2), (3, 0)))) == (0, 3, -1, -1)
+
+
+@pytest_funcnodes.nodetest(dilate)
+async def test_dilate_large_rect(image1):
+    kernel = np.ones((1, 301), np.uint8)
+    res = cv2.dilate(assert_opencvdata(image1), kernel)
+    fnout = (await dilate.inti_call(img=image1, kernel=kernel)).data
+    np.testing.assert_array_equal(fnout.reshape(res.shape), res)
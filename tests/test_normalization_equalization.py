@@ -7,6 +7,8 @@ from funcnodes_opencv.image_operations.normalization_equalization import (
     normalize,
     equalizeHist,
     CLAHE,
+    calcHist,
+    image_histogram,
 )
 from funcnodes_opencv.utils import assert_opencvdata
 
@@ -53,3 +55,42 @@ async def test_CLAHE(image1, clipLimit):
 
     # showdat([image1], res, fnout, title=f"clipLimit={clipLimit}")
     np.testing.assert_allclose(fnout, res, rtol=1e-6, atol=5e-2)
+
+
+@pytest_funcnodes.nodetest(calcHist)
+async def test_calcHist(image1):
+    img = image1.raw_transformed.reshape(image1.height(), image1.width(), -1)
+    hist = await calcHist.inti_call(img=image1)
+    assert hist.shape == (256, image1.testchannels)
+    for i in range(image1.testchannels):
+        res = cv2.calcHist([img], [i], None, [256], [0, 256])[:, 0]
+        np.testing.assert_array_equal(hist[:, i], res)
+    # the histogram is cached on the image
+    assert image_histogram(image1) is hist
+
+    coarse = await calcHist.inti_call(img=image1, bins=16)
+    assert coarse.shape == (16, image1.testchannels)
+    assert coarse.sum() == hist.sum()
+
+    mask = np.zeros(img.shape[:2], dtype=np.uint8)
+    mask[100:200, 50:150] = 255
+    masked = await calcHist.inti_call(img=image1, mask=mask)
+    assert masked.sum() == 100 * 100 * image1.testchannels
+
+    running = await calcHist.inti_call(img=image1, accumulate=hist, decay=0.5)
+    np.testing.assert_allclose(running, 1.5 * hist)
+    with pytest.raises(Exception):
+        await calcHist.inti_call(img=image1, accumulate=coarse)
+
+
+@pytest_funcnodes.nodetest(equalizeHist)
+async def test_equalizeHist_hist(image1):
+    gray = (assert_opencvdata(image1, channel=1) * 255 + 0.5).astype(np.uint8)
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256])
+    fnout = (await equalizeHist.inti_call(img=image1, hist=hist)).data
+    res = assert_opencvdata(cv2.equalizeHist(gray))
+    np.testing.assert_allclose(fnout, res, atol=1e-6)
+
+    # a coarser histogram maps the image onto fewer levels
+    fnout = (await equalizeHist.inti_call(img=image1, hist=hist[::4] * 4)).data
+    assert len(np.unique(fnout)) <= 64
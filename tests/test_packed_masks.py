@@ -0,0 +1,113 @@
+import numpy as np
+import cv2
+import pytest
+import pytest_funcnodes
+
+from funcnodes_opencv.imageformat import PackedMaskFormat, OpenCVImageFormat
+from funcnodes_opencv.image_operations.packed_masks import (
+    pack_mask,
+    mask_and,
+    mask_or,
+    mask_xor,
+    mask_not,
+    mask_count,
+    mask_morphology,
+    packed_morphology,
+)
+from funcnodes_opencv.image_processing.morphological_operations import (
+    MorphologicalOperations,
+)
+from funcnodes_opencv.utils import assert_opencvdata
+
+
+def random_mask(h, w, seed=0):
+    return np.random.default_rng(seed).random((h, w)) > 0.7
+
+
+@pytest.mark.parametrize("w", [1, 63, 64, 130])
+def test_packed_mask_format(w):
+    mask = random_mask(20, w)
+    packed = PackedMaskFormat.pack(mask)
+    assert packed.width() == w and packed.height() == 20
+    assert packed._data.shape == (20, -(-w // 64))
+    np.testing.assert_array_equal(packed.unpack(), mask)
+    assert packed.count() == mask.sum()
+
+    img = packed.to_cv2()
+    assert isinstance(img, OpenCVImageFormat)
+    np.testing.assert_array_equal(img.data[..., 0], mask)
+    np.testing.assert_array_equal(img.to_packed_mask().unpack(), mask)
+    np.testing.assert_array_equal(packed.to_np().data[..., 0], mask)
+
+    with pytest.raises(ValueError):
+        PackedMaskFormat(packed._data, w + 64)
+
+
+@pytest_funcnodes.nodetest(pack_mask)
+async def test_pack_mask(image1):
+    gray = assert_opencvdata(image1, channel=1)[..., 0]
+    packed = await pack_mask.inti_call(img=image1, thresh=0.5)
+    assert isinstance(packed, PackedMaskFormat)
+    np.testing.assert_array_equal(packed.unpack(), gray > 0.5)
+
+
+@pytest_funcnodes.nodetest([mask_and, mask_or, mask_xor, mask_not, mask_count])
+async def test_mask_logic():
+    a, b = random_mask(50, 100, 1), random_mask(50, 100, 2)
+    pa, pb = PackedMaskFormat.pack(a), PackedMaskFormat.pack(b)
+
+    np.testing.assert_array_equal(
+        (await mask_and.inti_call(mask1=pa, mask2=pb)).unpack(), a & b
+    )
+    np.testing.assert_array_equal(
+        (await mask_or.inti_call(mask1=pa, mask2=pb)).unpack(), a | b
+    )
+    np.testing.assert_array_equal(
+        (await mask_xor.inti_call(mask1=pa, mask2=pb)).unpack(), a ^ b
+    )
+    inverted = await mask_not.inti_call(mask=pa)
+    np.testing.assert_array_equal(inverted.unpack(), ~a)
+    assert await mask_count.inti_call(mask=inverted) == (~a).sum()
+
+    # float images are packed on the fly
+    img = OpenCVImageFormat(b.astype(np.float32))
+    np.testing.assert_array_equal(
+        (await mask_and.inti_call(mask1=pa, mask2=img)).unpack(), a & b
+    )
+
+    with pytest.raises(Exception, match="different sizes"):
+        await mask_or.inti_call(mask1=pa, mask2=PackedMaskFormat.pack(a[:, :60]))
+
+
+@pytest.mark.parametrize(
+    "kernel",
+    [
+        None,
+        np.ones((7, 9), np.uint8),
+        np.ones((1, 131), np.uint8),
+        np.ones((70, 1), np.uint8),
+        np.pad(np.ones((3, 1), np.uint8), ((0, 2), (2, 2))),
+        cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5)),
+    ],
+)
+@pytest.mark.parametrize("iterations", [1, 2])
+@pytest.mark.parametrize("w", [63, 130])
+@pytest.mark.parametrize("operation", list(MorphologicalOperations))
+def test_packed_morphology(kernel, iterations, w, operation):
+    op = MorphologicalOperations.v(operation)
+    if op == cv2.MORPH_HITMISS and kernel is None:
+        return
+    mask = random_mask(90, w).astype(np.uint8)
+    res = cv2.morphologyEx(mask, op, kernel, iterations=iterations) > 0
+    out = packed_morphology(PackedMaskFormat.pack(mask), op, kernel, iterations)
+    np.testing.assert_array_equal(out.unpack(), res)
+
+
+@pytest_funcnodes.nodetest(mask_morphology)
+async def test_mask_morphology(image1):
+    mask = (assert_opencvdata(image1, channel=1)[..., 0] > 0.5).astype(np.uint8)
+    res = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((15, 15), np.uint8))
+    out = await mask_morphology.inti_call(
+        mask=PackedMaskFormat.pack(mask), op=MorphologicalOperations.OPEN, kernel=15
+    )
+    np.testing.assert_array_equal(out.unpack(), res > 0)
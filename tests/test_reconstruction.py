@@ -0,0 +1,150 @@
+import numpy as np
+import cv2
+import pytest
+import pytest_funcnodes
+
+from funcnodes_opencv.imageformat import OpenCVImageFormat
+from funcnodes_opencv.image_processing.reconstruction import (
+    reconstruct,
+    fill_holes,
+    clear_border,
+    h_maxima,
+    regional_maxima,
+    reconstruct_by_dilation,
+    ReconstructionMethods,
+)
+from funcnodes_opencv.utils import assert_opencvdata
+
+
+def iterated_reconstruction(marker, mask, connectivity=8):
+    # the definition: geodesic dilations until stable
+    shape = cv2.MORPH_CROSS if connectivity == 4 else cv2.MORPH_RECT
+    kernel = cv2.getStructuringElement(shape, (3, 3))
+    res = np.minimum(marker, mask).astype(np.float32)
+    while True:
+        new = np.minimum(cv2.dilate(res, kernel), mask)
+        if np.array_equal(new, res):
+            return res
+        res = new
+
+
+def maze(n=101):
+    # a serpentine path, the reconstruction has to turn at every row
+    mask = np.zeros((n, n), np.float32)
+    mask[::4] = 1
+    for i in range(0, n - 1, 8):
+        mask[i + 1 : i + 4, -1] = 1
+        mask[i + 5 : i + 8, 0] = 1
+    return mask
+
+
+@pytest.mark.parametrize("connectivity", [4, 8])
+@pytest.mark.parametrize("seed", range(5))
+def test_reconstruct_by_dilation(connectivity, seed):
+    rng = np.random.default_rng(seed)
+    h, w = rng.integers(1, 60, 2)
+    mask = rng.random((h, w)).astype(np.float32)
+    if seed % 2:
+        mask = cv2.GaussianBlur(mask, (5, 5), 0)
+    marker = np.where(rng.random((h, w)) > 0.95, mask, 0).astype(np.float32)
+    np.testing.assert_array_equal(
+        reconstruct_by_dilation(marker, mask, connectivity),
+        iterated_reconstruction(marker, mask, connectivity),
+    )
+
+
+def test_reconstruct_by_dilation_maze():
+    mask = maze()
+    marker = np.zeros_like(mask)
+    marker[0, 0] = 1
+    np.testing.assert_array_equal(reconstruct_by_dilation(marker, mask, 4), mask)
+
+
+@pytest_funcnodes.nodetest(reconstruct)
+async def test_reconstruct(image1):
+    data = assert_opencvdata(image1)
+    res = await reconstruct.inti_call(marker=np.clip(data - 0.2, 0, 1), mask=image1)
+    assert isinstance(res, OpenCVImageFormat)
+    for c in range(data.shape[2]):
+        np.testing.assert_array_equal(
+            res.data[..., c],
+            iterated_reconstruction(np.clip(data[..., c] - 0.2, 0, 1), data[..., c]),
+        )
+
+    eroded = await reconstruct.inti_call(
+        marker=np.clip(data + 0.2, 0, 1),
+        mask=image1,
+        method=ReconstructionMethods.EROSION,
+    )
+    assert (eroded.data >= data - 1e-6).all()
+    assert (eroded.data <= np.clip(data + 0.2, 0, 1) + 1e-6).all()
+
+    with pytest.raises(Exception, match="not matchable"):
+        await reconstruct.inti_call(marker=data[:10], mask=image1)
+
+
+@pytest_funcnodes.nodetest(fill_holes)
+async def test_fill_holes():
+    img = np.zeros((60, 60), np.float32)
+    cv2.rectangle(img, (5, 5), (30, 30), 1, 2)
+    cv2.circle(img, (45, 45), 8, 1, 2)
+    # open to the border, not a hole
+    cv2.rectangle(img, (40, -5), (55, 20), 1, 2)
+    expected = img.copy()
+    cv2.rectangle(expected, (5, 5), (30, 30), 1, -1)
+    cv2.circle(expected, (45, 45), 8, 1, -1)
+
+    res = await fill_holes.inti_call(img=OpenCVImageFormat(img))
+    np.testing.assert_array_equal(res.data[..., 0], expected)
+
+
+@pytest_funcnodes.nodetest(clear_border)
+async def test_clear_border():
+    img = np.zeros((60, 60), np.float32)
+    cv2.circle(img, (30, 30), 8, 1, -1)
+    cv2.circle(img, (0, 30), 8, 1, -1)
+    cv2.rectangle(img, (50, 50), (70, 70), 0.5, -1)
+    expected = np.zeros_like(img)
+    cv2.circle(expected, (30, 30), 8, 1, -1)
+
+    res = await clear_border.inti_call(img=OpenCVImageFormat(img))
+    np.testing.assert_array_equal(res.data[..., 0], expected)
+
+
+@pytest_funcnodes.nodetest(h_maxima)
+async def test_h_maxima():
+    img = np.full((50, 50), 0.2, np.float32)
+    img[10:15, 10:15] = 0.8  # height 0.6
+    img[30:35, 30:35] = 0.3  # height 0.1
+    img[10:15, 35:40] = 0.05  # depth 0.15
+
+    out, suppressed = await h_maxima.inti_call(img=OpenCVImageFormat(img), h=0.2)
+    expected = np.zeros_like(img)
+    expected[10:15, 10:15] = 1
+    np.testing.assert_array_equal(out.data[..., 0], expected)
+    np.testing.assert_allclose(suppressed.data[10:15, 10:15, 0], 0.6, atol=1e-6)
+    np.testing.assert_allclose(suppressed.data[30:35, 30:35, 0], 0.2, atol=1e-6)
+
+    out, _ = await h_maxima.inti_call(img=OpenCVImageFormat(img), h=0.1, minima=True)
+    expected = np.zeros_like(img)
+    expected[10:15, 35:40] = 1
+    np.testing.assert_array_equal(out.data[..., 0], expected)
+
+
+@pytest_funcnodes.nodetest(regional_maxima)
+async def test_regional_maxima(image1):
+    data = assert_opencvdata(image1)
+    res = await regional_maxima.inti_call(img=image1)
+    for c in range(data.shape[2]):
+        plane = data[..., c]
+        # the reconstruction of plane - eps removes exactly the regional maxima
+        eps = 1e-3
+        rec = iterated_reconstruction(plane - eps, plane)
+        np.testing.assert_array_equal(res.data[..., c] > 0, plane - rec > eps / 2)
+
+    plateau = np.full((20, 20), 0.5, np.float32)
+    plateau[5:8, 5:8] = 0.2
+    minima = await regional_maxima.inti_call(
+        img=OpenCVImageFormat(plateau), minima=True
+    )
+    np.testing.assert_array_equal(minima.data[..., 0], plateau < 0.5)
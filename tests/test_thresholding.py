@@ -9,10 +9,27 @@ from funcnodes_opencv.image_processing.thresholding import (
     adaptive_threshold,
     in_range_singel_channel,
     in_range,
+    in_ranges,
+    color_range_luts,
+    intensity_lut,
+    lookup_table,
+    LUTModes,
+    LUTDepths,
     AutoThresholdTypes,
+    histogram_threshold,
+    multi_otsu_thresholds,
+    multi_otsu_threshold,
     AdaptiveThresholdMethods,
+    local_threshold,
+    local_threshold_map,
+    LocalThresholdMethods,
 )
+from funcnodes_opencv.image_processing.local_statistics import LocalStatistics
 from funcnodes_opencv.utils import assert_opencvdata
+from funcnodes_opencv.imageformat import conv_colorspace
+from funcnodes_opencv.image_operations.normalization_equalization import (
+    calc_histogram,
+)
 
 
 @pytest_funcnodes.nodetest(threshold)
@@ -33,15 +50,18 @@ async def test_threshold(image1, thresh):
 
 @pytest_funcnodes.nodetest(auto_threshold)
 @pytest.mark.parametrize(
-    "type",
-    list(AutoThresholdTypes),
+    "type,flag",
+    [
+        (AutoThresholdTypes.OTSU, cv2.THRESH_OTSU),
+        (AutoThresholdTypes.TRIANGLE, cv2.THRESH_TRIANGLE),
+    ],
 )
-async def test_auto_threshold(image1, type):
+async def test_auto_threshold(image1, type, flag):
     img = image1.raw_transformed
     if image1.testchannels == 3:
         img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-    res = cv2.threshold(img, 0, 255, type.value)[1]
+    res = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + flag)[1]
     res = assert_opencvdata(res)
     fnout = (
         await auto_threshold.inti_call(
@@ -55,6 +75,61 @@ async def test_auto_threshold(image1, type):
     assert diff.mean() < 5e-3
 
 
+@pytest_funcnodes.nodetest(auto_threshold)
+@pytest.mark.parametrize("type", list(AutoThresholdTypes))
+async def test_auto_threshold_hist(image1, type):
+    gray = assert_opencvdata(image1, channel=1)
+    hist = calc_histogram(gray, 1024)
+    thresh = histogram_threshold(hist, type)
+    assert 0 < thresh < 1
+
+    out, fnthresh = await auto_threshold.inti_call(
+        img=image1, type=type, bins=1024, maxval=0.5
+    )
+    assert fnthresh == pytest.approx(thresh)
+    np.testing.assert_array_equal(out.data, np.where(gray > thresh, 0.5, 0))
+
+    out, fnthresh = await auto_threshold.inti_call(img=image1, type=type, hist=hist)
+    assert fnthresh == pytest.approx(thresh)
+
+
+def test_histogram_threshold_invalid():
+    with pytest.raises(ValueError):
+        histogram_threshold(np.zeros(256))
+    with pytest.raises(ValueError):
+        histogram_threshold(np.ones((256, 3)))
+
+
+@pytest_funcnodes.nodetest(multi_otsu_threshold)
+async def test_multi_otsu_threshold(image1):
+    gray = assert_opencvdata(image1, channel=1)
+    hist = calc_histogram(gray, 64)[:, 0]
+    # brute force over all splits into 3 classes
+    weight = np.concatenate([[0], np.cumsum(hist)])
+    moment = np.concatenate([[0], np.cumsum(hist * np.arange(64))])
+
+    def score(a, b):
+        w = weight[b + 1] - weight[a]
+        return (moment[b + 1] - moment[a]) ** 2 / w if w > 0 else 0
+
+    best = max(
+        (score(0, i) + score(i + 1, j) + score(j + 1, 63), (i, j))
+        for i in range(63)
+        for j in range(i + 1, 63)
+    )[1]
+    expected = [(i + 0.5) / 63 for i in best]
+    np.testing.assert_allclose(multi_otsu_thresholds(hist, 3), expected)
+
+    out, thresholds = await multi_otsu_threshold.inti_call(img=image1, bins=64)
+    np.testing.assert_allclose(thresholds, expected)
+    labels = (gray > expected[0]).astype(np.float32) + (gray > expected[1])
+    np.testing.assert_allclose(out.data, labels / 2)
+
+    assert len(multi_otsu_thresholds(hist, 5)) == 4
+    with pytest.raises(ValueError):
+        multi_otsu_thresholds(hist, 1)
+
+
 @pytest_funcnodes.nodetest(adaptive_threshold)
 @pytest.mark.parametrize(
     "type",
@@ -83,6 +158,61 @@ async def test_adaptive_threshold(image1, type):
     assert diff.mean() < 5e-2
 
 
+@pytest_funcnodes.nodetest(local_threshold)
+@pytest.mark.parametrize("method", list(LocalThresholdMethods))
+async def test_local_threshold(image1, method):
+    gray = assert_opencvdata(image1, channel=1)[..., 0].astype(np.float64)
+    size = 51
+
+    def box(x):
+        return cv2.boxFilter(
+            x, -1, (size, size), normalize=False, borderType=cv2.BORDER_CONSTANT
+        )
+
+    count = box(np.ones_like(gray))
+    mean = box(gray) / count
+    std = np.sqrt(np.maximum(box(gray * gray) / count - mean**2, 0))
+    k, r, c = 0.3, 0.4, 0.01
+    expected = {
+        LocalThresholdMethods.MEAN: mean,
+        LocalThresholdMethods.NIBLACK: mean + k * std,
+        LocalThresholdMethods.SAUVOLA: mean * (1 + k * (std / r - 1)),
+        LocalThresholdMethods.BRADLEY: mean * (1 - k),
+    }[method] - c
+
+    stats = LocalStatistics.of(image1, channel=1)
+    thresh = local_threshold_map(stats, size, method, k, r, c)
+    np.testing.assert_allclose(thresh[..., 0], expected, atol=1e-5)
+    np.testing.assert_allclose(
+        local_threshold_map(stats, size, method, k, r, c, slice(100, 300)),
+        thresh[100:300],
+    )
+
+    for max_workers in [1, 3]:
+        fnout = (
+            await local_threshold.inti_call(
+                img=image1,
+                method=method,
+                block_size=size,
+                k=k,
+                r=r,
+                c=c,
+                maxval=0.5,
+                max_workers=max_workers,
+            )
+        ).data
+        np.testing.assert_array_equal(
+            fnout[..., 0], np.where(gray > thresh[..., 0], 0.5, 0)
+        )
+
+    fnout = (
+        await local_threshold.inti_call(
+            img=image1, method=method, block_size=size, k=k, r=r, c=c, invert=True
+        )
+    ).data
+    np.testing.assert_array_equal(fnout[..., 0], gray <= thresh[..., 0])
+
+
 @pytest_funcnodes.nodetest(in_range_singel_channel)
 async def test_in_range_singel_channel(image1):
     img = image1.raw_transformed.copy()
@@ -132,3 +262,94 @@ async def test_in_range(image1):
     # showdat([image1], res, fnout)
     diff = np.abs(fnout - res)
     assert diff.mean() < 6e-3
+
+
+@pytest_funcnodes.nodetest(in_ranges)
+async def test_in_ranges(image1):
+    ranges = [[0.9, 0.1, 0.2, 1, 0.1, 1], [0.05, 0.2, 0, 1, 0, 1], [0, 1, 0, 0.1, 0, 1]]
+    hsv = conv_colorspace(assert_opencvdata(image1, 3), "BGR", "HSV")
+    hue = hsv[..., 0]
+    expected = np.stack(
+        [
+            ((hue >= 0.9) | (hue <= 0.1)) & (hsv[..., 1] >= 0.2) & (hsv[..., 2] >= 0.1),
+            (hue >= 0.05) & (hue <= 0.2),
+            hsv[..., 1] <= 0.1,
+        ]
+    )
+
+    labels, masks = await in_ranges.inti_call(
+        img=image1, ranges=ranges, with_masks=True
+    )
+    assert masks.shape == (3,) + hue.shape
+    # 256 levels are exact for 8 bit colors, up to float rounding at the borders
+    assert (masks != expected).mean() < 1e-3
+    first = np.where(masks.any(axis=0), np.argmax(masks, axis=0) + 1, 0)
+    np.testing.assert_array_equal(labels, first)
+
+    labels_str, masks = await in_ranges.inti_call(
+        img=image1, ranges=";".join(",".join(map(str, r)) for r in ranges)
+    )
+    assert masks is None
+    np.testing.assert_array_equal(labels_str, labels)
+
+    # coarser tables only differ close to the range borders
+    coarse = (await in_ranges.inti_call(img=image1, ranges=ranges, levels=64))[0]
+    assert (coarse != labels).mean() < 0.15
+
+
+def test_color_range_luts():
+    labels, bits = color_range_luts("0,0.5,0,1,0,1", "HSV", 16)
+    assert labels.shape == bits.shape == (16**3,)
+    assert color_range_luts([[0, 0.5, 0, 1, 0, 1]], "HSV", 16)[0] is labels
+    assert not labels.flags.writeable
+    assert color_range_luts("0,0.5", "GRAY", 16)[0].max() == 1
+    for ranges, space, levels in [
+        ("0,0.5,0,1", "HSV", 16),
+        ("0,0.5,0,1,0,1", "HSV", 24),
+        ("0,0.5,0,1,0,1", "HSV", 512),
+    ]:
+        with pytest.raises(ValueError):
+            color_range_luts(ranges, space, levels)
+
+
+@pytest_funcnodes.nodetest(intensity_lut)
+@pytest.mark.parametrize("depth", list(LUTDepths))
+async def test_intensity_lut(image1, depth):
+    data = image1.data
+    size = LUTDepths.v(depth) - 1
+    quantized = np.round(data.astype(np.float64) * size) / size
+
+    fnout = (
+        await intensity_lut.inti_call(img=image1, points="0.2,0.5,0.8", depth=depth)
+    ).data
+    classes = np.digitize(quantized, [0.2, 0.5, 0.8], right=True)
+    np.testing.assert_allclose(fnout, classes / 3, atol=1e-6)
+    assert len(np.unique(fnout)) == 4
+
+    fnout = (
+        await intensity_lut.inti_call(
+            img=image1,
+            points=[0.1, 0.4, 0.9],
+            values=[0, 0.8, 1],
+            mode=LUTModes.CURVE,
+            depth=depth,
+        )
+    ).data
+    expected = np.interp(quantized, [0.1, 0.4, 0.9], [0, 0.8, 1])
+    np.testing.assert_allclose(fnout, expected, atol=1e-5)
+
+
+def test_lookup_table():
+    table = lookup_table("0.5", "0.2,0.7")
+    assert table.shape == (256,)
+    assert lookup_table([0.5], [0.2, 0.7]) is table
+    assert not table.flags.writeable
+    assert table[127] == np.float32(0.2) and table[128] == np.float32(0.7)
+    for points, values, mode in [
+        ("0.5,0.2", None, LUTModes.LEVELS),
+        ("0.5", "1", LUTModes.LEVELS),
+        ("0.2,0.5", None, LUTModes.CURVE),
+        ("", None, LUTModes.LEVELS),
+    ]:
+        with pytest.raises(ValueError):
+            lookup_table(points, values, mode)